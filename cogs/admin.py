@@ -17,6 +17,7 @@ from database.services import (
 )
 from josix import Josix
 from pkg.bot_utils import JosixCog, josix_slash
+from pkg.send_queue import Priority
 
 
 class Admin(JosixCog):
@@ -163,7 +164,7 @@ class Admin(JosixCog):
     async def delete_couple(self, ctx: ApplicationContext, msg_id: str, emoji: str, role: discord.Role):
         testMsg = await ctx.respond("Testing...")
         if not isinstance(testMsg, discord.Interaction):
-            await ctx.send("Error")
+            await self.bot.sender.post(ctx.channel, Priority.COMMAND, content="Error")
             return
 
         og: discord.InteractionMessage = await testMsg.original_response()
@@ -393,7 +394,7 @@ class Admin(JosixCog):
             duration
         )
         if groups is None:
-            await ctx.send("Invalid input for the duration")
+            await ctx.respond("Invalid input for the duration")
             return
 
         total = 0
@@ -406,7 +407,7 @@ class Admin(JosixCog):
             try:
                 value = int(value)
             except ValueError:
-                await ctx.send("Got a wrong value as an input")
+                await ctx.respond("Got a wrong value as an input")
                 return
 
             match unit:
@@ -420,7 +421,7 @@ class Admin(JosixCog):
                     total += 60
 
         if total < 0 or total / 86400 > 31:
-            await ctx.send("A temporary season must be between 1 day and 1 months")
+            await ctx.respond("A temporary season must be between 1 day and 1 months")
             return
 
         handler = self.bot.get_handler()
@@ -428,11 +429,11 @@ class Admin(JosixCog):
         if not guild:
             guild = discord_service.add_guild(handler, ctx.guild_id)
             if not guild:
-                await ctx.send("Internal error, please retry")
+                await ctx.respond("Internal error, please retry")
                 return
 
         if guild.tempSeasonActive:
-            await ctx.send("This server is still under a temporary season. Please wait for the current one to finish.")
+            await ctx.respond("This server is still under a temporary season. Please wait for the current one to finish.")
             return
 
         end = datetime.now() + timedelta(seconds=total)
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 from json import JSONDecodeError
@@ -25,7 +26,9 @@ from discord.utils import get as discordGet
 import pkg.logwrite as log
 from database.services import discord_service
 from josix import Josix
+from pkg import event_context
 from pkg.bot_utils import JosixCog
+from pkg.send_queue import Priority
 
 
 class Events(JosixCog):
@@ -52,6 +55,10 @@ class Events(JosixCog):
         self.close = ""
         self.open = ""
 
+    async def startup(self) -> None:
+        await asyncio.to_thread(self._loadTags)
+
+    def _loadTags(self) -> None:
         try:
             with open(Events._FILE_PATH, "r") as f:
                 data = json.load(f)
@@ -94,17 +101,17 @@ class Events(JosixCog):
 
     @commands.Cog.listener()
     async def on_ready(self):
-        log.writeLog(f"==> Bot ready : py-cord v{discord.__version__}\n")
+        log.writeLog(
+            f"==> Bot ready : py-cord v{discord.__version__}, "
+            f"shards {self.bot.shard_label} of {self.bot.shard_count}, {len(self.bot.guilds)} guilds\n"
+        )
 
     @commands.Cog.listener()
     async def on_thread_create(self, thread: discord.Thread):
         if not isinstance(thread.parent, discord.ForumChannel):
             return
 
-        try:
-            await thread.send("This thread is now open. You can close it automatically by using `/close`")
-        except Exception as e:
-            log.writeError(log.formatError(e))
+        self.bot.sender.post(thread, Priority.NOTIFICATION, content="This thread is now open. You can close it automatically by using `/close`")
 
         result = await Events.getTags(thread, self.close, self.open)
         if result is None or result[1] is None:
@@ -122,7 +129,7 @@ class Events(JosixCog):
 
     @commands.Cog.listener()
     async def on_raw_thread_update(self, payload: RawThreadUpdateEvent):
-        if not (guild := self.bot.get_guild(payload.guild_id)) or not (guild := await self.bot.fetch_guild(payload.guild_id)):
+        if not (guild := await self.bot.resolver.guild(payload.guild_id)):
             return
 
         if not payload.thread:
@@ -181,7 +188,8 @@ class Events(JosixCog):
             return
 
         handler = self.bot.get_handler()
-        dbGuild = discord_service.get_guild(handler, member.guild.id)
+        idGuild = member.guild.id
+        dbGuild = event_context.memo(("guild", idGuild), lambda: discord_service.get_guild(handler, idGuild))
         if not dbGuild:
             return
 
@@ -211,7 +219,7 @@ class Events(JosixCog):
                 )
             else:
                 text = f"Welcome on the server **{member.guild.name}** {member.mention}"
-            await chan.send(text)
+            self.bot.sender.post(chan, Priority.NOTIFICATION, content=text)
 
     @commands.Cog.listener()
     async def on_application_command_error(self, ctx: ApplicationContext, error: DiscordException):
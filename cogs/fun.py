@@ -1,3 +1,4 @@
+import asyncio
 import datetime as dt
 import json
 import os
@@ -6,16 +7,17 @@ from asyncio import TimeoutError
 from json import JSONDecodeError
 
 import discord
-from aiohttp import ClientResponseError
-from blagues_api import BlaguesAPI  # type: ignore
+from aiohttp import ClientError, ClientResponseError
 from discord import ApplicationContext, Interaction, WebhookMessage, option
 from discord.ext import commands
-from dotenv import load_dotenv
 
+import pkg.logwrite as log
 from cogs.xp_system import XP
-from database.services import discord_service, xp_service
+from database.services import askip_service, discord_service, xp_service
 from josix import Josix
 from pkg.bot_utils import JosixCog, josix_slash
+from pkg.joke_pool import JokePool
+from pkg.send_queue import Priority
 
 
 class Fun(JosixCog):
@@ -26,11 +28,10 @@ class Fun(JosixCog):
     ----------
     bot : Josix
         The bot that loaded this extension
-    jokes : BlaguesAPI
-        Instance to perform requests on a french jokes generator API
+    jokes : JokePool | None
+        Jokes prefetched from a french jokes generator API, None without token
     """
 
-    load_dotenv(".env.dev")
     _KEY = os.getenv("JOKES")
     _SCRIPT_DIR = os.path.dirname(__file__)
     _FILE_PATH = os.path.join(_SCRIPT_DIR, '../askip.json')
@@ -38,10 +39,43 @@ class Fun(JosixCog):
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp)
         self.bot = bot
-        self.jokes = BlaguesAPI(Fun._KEY)
+        self.jokes = JokePool(Fun._KEY) if Fun._KEY else None
 
-    def checkJson(self, file: dict) -> bool:
-        return bool(file.keys()) or (len(file.keys()) > 0)
+    def cog_unload(self) -> None:
+        if self.jokes is not None:
+            self.bot.loop.create_task(self.jokes.close())
+
+    async def startup(self) -> None:
+        if self.jokes is not None:
+            self.jokes.refill_all()
+
+        # One-time import of the askips of the json file, while the table is empty
+        handler = self.bot.get_handler()
+        if not self.bot.runs_singletons or askip_service.get_askip_users(handler):
+            return
+
+        askips = await asyncio.to_thread(self._readAskipFile)
+        if askips:
+            count = askip_service.import_askips(handler, askips)
+            log.writeLog(f"{count} askips imported from {Fun._FILE_PATH}")
+
+    def _readAskipFile(self) -> list[tuple[str, str, str]]:
+        try:
+            with open(Fun._FILE_PATH, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, JSONDecodeError):
+            return []
+
+        askips = []
+        for username, jokes in data.items():
+            if not isinstance(jokes, dict):
+                continue
+            for name, content in jokes.items():
+                if len(username) > 64 or len(name) > 64 or not isinstance(content, str):
+                    log.writeError(f"Askip {username}/{name} not imported, invalid name or content")
+                    continue
+                askips.append((username.lower(), name, content))
+        return askips
 
     @josix_slash(description="The bot greets you")
     async def hello(self, ctx: ApplicationContext):
@@ -68,7 +102,9 @@ class Fun(JosixCog):
     )
     @discord.default_permissions(manage_messages=True)
     async def say(self, ctx: ApplicationContext, text: str):
-        await ctx.send(text)
+        # Acknowledged first, the message can wait in the queue of the channel
+        await ctx.defer(ephemeral=True)
+        self.bot.sender.post(ctx.channel, Priority.COMMAND, content=text)
         await ctx.delete()
 
     @josix_slash(description="Send a random joke")
@@ -93,7 +129,7 @@ class Fun(JosixCog):
         # To prevent some jokes in a category, put the ID of the category here
         is_in_public = ctx.channel.category_id == 751114303314329704 
         disallowCat = []
-        types = ["global", "dev", "beauf", "blondes", "dark", "limit"]
+        types = list(JokePool.TYPES)
         blg = None
 
         if (is_in_public):
@@ -104,19 +140,22 @@ class Fun(JosixCog):
                 await ctx.respond("You are not permitted to use this type of joke here")
                 return
 
-        if joke_type is None or joke_type == -1:
-            try:
-                blg = await self.jokes.random(disallow=disallowCat)
-            except ClientResponseError:
-                await ctx.respond("Token error")
-                return
+        if self.jokes is None:
+            await ctx.respond("Token error")
+            return
 
-        else:
-            try:
-                blg = await self.jokes.random_categorized(types[joke_type])
-            except ClientResponseError:
-                await ctx.respond("Token error")
-                return
+        try:
+            blg = await self.jokes.get(None if joke_type is None or joke_type == -1 else types[joke_type], disallowCat)
+        except ClientResponseError:
+            await ctx.respond("Token error")
+            return
+        except (ClientError, TimeoutError):
+            await ctx.respond("The jokes are not available right now")
+            return
+
+        if blg is None:
+            await ctx.respond("Unexpected error during process")
+            return
 
         embed = discord.Embed(title=blg.joke, description=f"||{blg.answer}||", color=0x0089FF)
         embed.set_author(name=ctx.author, icon_url=ctx.author.display_avatar)
@@ -133,40 +172,20 @@ class Fun(JosixCog):
     )
     @commands.guild_only()
     async def list_askip(self, ctx: ApplicationContext, username: str):
-        data = None
-
-        try:
-            if username:
-                username = username.lower()
-
-                with open(Fun._FILE_PATH, 'r') as askip:
-                    lst = json.load(askip)
-                    try:
-                        if not self.checkJson(lst[username]):
-                            await ctx.respond("Empty value")
-                            return
-
-                        data = lst[username].keys()
-                    except KeyError:
-                        cmd = self.bot.get_application_command(
-                            "list_askip",
-                            type=discord.commands.core.ApplicationCommand
-                        )
-                        if cmd is None:
-                            await ctx.respond("Error encountered on the listing")
-                            return
-                        await ctx.invoke(cmd, user=None)
-                        return
-
-            else:
-                with open(Fun._FILE_PATH, 'r') as askip:
-                    data = json.load(askip).keys()
-            await ctx.respond("Available names : `" + "`, `".join(data) + "`")
-
-        except JSONDecodeError:
-            await ctx.respond("Empty json file")
+        handler = self.bot.get_handler()
+        users = askip_service.get_askip_users(handler)
+        if not users:
+            await ctx.respond("No askip registered")
             return
 
+        if username:
+            names = askip_service.get_askip_names(handler, username.lower())
+            if names:
+                await ctx.respond("Available names : `" + "`, `".join(names) + "`")
+                return
+
+        await ctx.respond("Available names : `" + "`, `".join(users) + "`")
+
     @josix_slash(
         description="Get a private joke from your group",
         options=[
@@ -186,49 +205,42 @@ class Fun(JosixCog):
     )
     @commands.guild_only()
     async def askip(self, ctx: ApplicationContext, username: str, askip_name: str):
-        try:
-            with open(Fun._FILE_PATH, 'r') as askip:
-                credentials = json.load(askip)
-                if not self.checkJson(credentials):
-                    await ctx.respond("Empty value or json file")
-                    return 
-
-        except JSONDecodeError:
-            await ctx.respond("Empty json file")
-            return
-
         if askip_name and not username:
             await ctx.respond("To choose a specific askip you need to specify the user")
             return
-        
+
+        handler = self.bot.get_handler()
         userParam = False
         if username:
             username = username.lower()
             userParam = True
         else:
-            username = random.choice(list(credentials.keys()))
-        
-        try:
-            if not self.checkJson(credentials[username]):
-                await ctx.respond("Empty value or json file")
+            users = askip_service.get_askip_users(handler)
+            if not users:
+                await ctx.respond("No askip registered")
                 return
-                
-            if askip_name:
-                blg = askip_name
-            else:
-                blg = random.choice(list(credentials[username].keys()))
-
-            res = f"**{username}** : " if not userParam else ""
-            res += credentials[username][blg]
-            await ctx.respond(res)
-        except KeyError:
-            await ctx.respond("Unknown member or askip\nAvailable names : `" + "`, `".join(credentials.keys()) + "`")
+            username = random.choice(users)
+
+        content = None
+        if askip_name:
+            content = askip_service.get_askip(handler, username, askip_name)
+        elif names := askip_service.get_askip_names(handler, username):
+            content = askip_service.get_askip(handler, username, random.choice(names))
+
+        if content is None:
+            users = askip_service.get_askip_users(handler)
+            await ctx.respond("Unknown member or askip\nAvailable names : `" + "`, `".join(users) + "`")
+            return
+
+        res = f"**{username}** : " if not userParam else ""
+        res += content
+        await ctx.respond(res)
     
     async def vote_askip(self, ctx: ApplicationContext, ask_aut: str, ask_name: str, ask_text: str) -> bool | None:
         """
         NOT A BOT COMMAND
         process the decision of whether of not the message passed in parameters
-        should be saved in the askip json.
+        should be saved in the askips.
         !!! Add it only if 2 members agrees and none disagrees
         """
 
@@ -260,33 +272,26 @@ class Fun(JosixCog):
         noEmbed = askEmbed.copy()
         noEmbed.colour = discord.Colour(noColor)
 
-        reacts = []
         msg: Interaction | WebhookMessage = await ctx.respond(embed=askEmbed)
         if isinstance(msg, WebhookMessage):
-            await ctx.send("Unexpected error during process")
+            await self.bot.sender.post(ctx.channel, Priority.COMMAND, content="Unexpected error during process")
             return None
 
         og = await msg.original_response()
+        votes = self.bot.votes.open(og.id, ['✅', '❌'])
+        try:
+            # add reaction choices
+            for reaction in ['✅', '❌']:
+                await og.add_reaction(reaction)
 
-        # add reaction choices
-
-        for reaction in ['✅', '❌']:
-            await og.add_reaction(reaction)
-
-        # function that will be called whenever there is a reaction add.
-        def check(reaction: discord.Reaction, user: discord.User):
-            if user.bot:    # if the user is a bot
-                return False   # ignore
-            reacts.append(str(reaction))
-            return False
+            # Ends early as soon as someone disagrees
+            disagreed = await votes.wait(180, until=lambda collector: collector.count('❌') > 0)
+        finally:
+            self.bot.votes.close(og.id)
 
-        try:
-            # timeout = 15 minutes=900(it's ok for us, this is a coroutine)
-            await self.bot.wait_for('reaction_add', check=check, timeout=180)
-        
-        except TimeoutError:  # once we have waited for 5 minutes
+        if not disagreed:
             # if no one disagrees and at least 2 ppl aggree
-            if(reacts.count('❌') < 1 and reacts.count('✅') > 1):
+            if votes.count('✅') > 1:
                 await og.edit(embed=yesEmbed)  # send fin, return true
                 return True
 
@@ -323,43 +328,26 @@ class Fun(JosixCog):
     )
     async def add_askip(self, ctx: ApplicationContext, username: str, askip_name: str, askip_text: str):
         """
-            saves askip joke in askip.json
+            saves askip joke in the database
             ...but proceeds to nicely ask to us before
         """
 
         username = username.lower()
         askip_name = askip_name.lower()
-        credentials = {}
         handler = self.bot.get_handler()
-    
-        try:
-            with open("askip.json", 'r') as askipfile:
-                credentials = json.load(askipfile)
-        except JSONDecodeError:
-            await ctx.respond("Empty json file")
-            return
 
-        try:
-            if askip_name in credentials[username].keys():
-                await ctx.respond("This askip already exists")
-                return
-        except KeyError:
-            pass
+        if askip_service.get_askip(handler, username, askip_name) is not None:
+            await ctx.respond("This askip already exists")
+            return
 
         should_add = await self.vote_askip(ctx, username, askip_name, askip_text)  # nicely asks everyone before.
         if not should_add:
             return
 
-        # append askip to the credentials json object
-        
-        if(username not in credentials.keys()):  # if the member is not registered in the json file
-            credentials[username] = {}  # create a new pair for it
-
-        credentials[username][askip_name] = askip_text  # add joke
-
-        # update the json file
-        with open("askip.json", "w") as askipfile:
-            askipfile.write(json.dumps(credentials, indent=4))  # write new askip file
+        # The same askip may have been added during the vote
+        if not askip_service.add_askip(handler, username, askip_name, askip_text):
+            await ctx.respond("This askip already exists")
+            return
 
         guild = ctx.guild
         idAuth = ctx.author.id
@@ -29,6 +29,8 @@ class Games(JosixCog):
         super().__init__(isGame=True)
         self.bot = bot
         self.description = "games : Base"
+
+    async def startup(self) -> None:
         self._cleanGames()
 
     def _cleanGames(self):
@@ -61,6 +63,7 @@ class BaseGame(JosixCog):
         self.name = gameName
         self._db = db
 
+    async def startup(self) -> None:
         if not self.checkGame():
             games_service.add_game_type(self._db, self.name)
 
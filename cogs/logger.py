@@ -25,7 +25,9 @@ import pkg.logwrite as log
 from database.database import DatabaseHandler
 from database.services import discord_service, logger_service
 from josix import Josix
-from pkg.bot_utils import JosixCog
+from pkg import event_context
+from pkg.bot_utils import JosixCog, JosixDatabaseUnavailable
+from pkg.send_queue import Priority
 
 
 class Logs(IntEnum):
@@ -189,6 +191,8 @@ class Logger(JosixCog):
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp)
         self.bot = bot
+
+    async def startup(self) -> None:
         self._updateLogs()
 
     def _updateLogs(self):
@@ -200,7 +204,8 @@ class Logger(JosixCog):
         Check if the guild has enabled this log
 
         Retrieves the logs of the guild and check if this log is obtained.
-        Then returns the channel where the logs are displayed
+        Then returns the channel where the logs are displayed.
+        The guild is shared with the other handlers of the event
 
         Parameters
         ----------
@@ -215,13 +220,20 @@ class Logger(JosixCog):
             The text channel that displays the logs
         """
         handler = self.bot.get_handler()
-        guildLogs = logger_service.get_logs_selection(handler, idGuild)
-        dbGuild = discord_service.get_guild(handler, idGuild)
-        
-        if (not guildLogs or not dbGuild) or (idLog not in guildLogs.logs):
+        try:
+            dbGuild = event_context.memo(("guild", idGuild), lambda: discord_service.get_guild(handler, idGuild))
+            if not dbGuild or not dbGuild.logNews:
+                return None
+
+            selection = logger_service.get_logs_selection(handler, idGuild)
+        except JosixDatabaseUnavailable:
             return None
-        
-        chan = self.bot.get_channel(dbGuild.logNews) or await self.bot.fetch_channel(dbGuild.logNews)
+
+        if not selection or idLog not in selection.logs:
+            return None
+
+        idChan = dbGuild.logNews
+        chan = await self.bot.resolver.channel(idChan)
         if chan is None or isinstance(chan, TextChannel):
             return chan
         return None
@@ -248,7 +260,7 @@ class Logger(JosixCog):
         embed.add_field(name="Enabled", value=str(rule.enabled), inline=False)
         embed.add_field(name="Actions", value=", ".join([i.type.name for i in rule.actions]))
         embed.set_footer(text=f"ID : {rule.id} • {dt.strftime(dt.now(), '%d/%m/%Y %H:%M')}")
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_auto_moderation_rule_create(self, rule: AutoModRule):
@@ -268,7 +280,7 @@ class Logger(JosixCog):
         )
         if creator:
             embed.set_author(name=creator, icon_url=creator.display_avatar)
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_auto_moderation_rule_update(self, rule: AutoModRule):
@@ -295,7 +307,7 @@ class Logger(JosixCog):
         embed.add_field(name="Trigger", value=payload.matched_content)
         embed.add_field(name="Content", value=payload.content[:1024], inline=False)
         embed.set_footer(text=f"ID : {rule.id} • {dt.strftime(dt.now(), '%d/%m/%Y %H:%M')}")
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
 #
 # Channel logs
@@ -329,7 +341,7 @@ class Logger(JosixCog):
         embed = await self._channel_embed(channel, "Channel created", Logger.addColor)
         if embed is None:
             return
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: GuildChannel):
@@ -339,7 +351,7 @@ class Logger(JosixCog):
         embed = await self._channel_embed(channel, "Channel deleted", Logger.noColor)
         if embed is None:
             return
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_update(self, before: GuildChannel, after: GuildChannel):
@@ -414,7 +426,7 @@ class Logger(JosixCog):
                 )
             else:
                 embed.description = "Permissions deleted"
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
 #
 # Role logs
@@ -447,7 +459,7 @@ class Logger(JosixCog):
         embed = await self._role_embed(role, "Role created", Logger.addColor)
         if embed is None:
             return
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: Role):
@@ -457,7 +469,7 @@ class Logger(JosixCog):
         embed = await self._role_embed(role, "Role deleted", Logger.noColor)
         if embed is None:
             return
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_role_update(self, before: Role, after: Role):
@@ -487,7 +499,7 @@ class Logger(JosixCog):
                 inline=False
             )
         if len(embed.fields) > 0:
-            await chan.send(embed=embed)
+            self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
 #
 # Update logs
@@ -572,7 +584,7 @@ class Logger(JosixCog):
             embed.add_field(name="Verification level", value=f"{before.verification_level} **-->** {after.verification_level}", inline=False)
 
         if len(embed.fields) > 0:
-            await chan.send(embed=embed)
+            self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_emojis_update(self, guild: Guild, before: Sequence[Emoji], after: Sequence[Emoji]):
@@ -608,7 +620,7 @@ class Logger(JosixCog):
                 embed.add_field(name="Roles allowed before", value=", ".join(map(str, resB.roles)), inline=False)
                 embed.add_field(name="Roles allowed after", value=", ".join(map(str, resA.roles)), inline=False)
             if len(embed.fields) > 0:
-                await chan.send(embed=embed)
+                self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
         else:
             # before inferior then we chek which emoji has been added
@@ -628,7 +640,7 @@ class Logger(JosixCog):
             embed = self._emoji_embed(res, added)
             if not embed:
                 return
-            await chan.send(embed=embed)
+            self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_guild_stickers_update(self, guild: Guild, before: Sequence[GuildSticker], after: Sequence[GuildSticker]):
@@ -665,7 +677,7 @@ class Logger(JosixCog):
             if resB.name != resA.name:
                 embed.add_field(name="Name", value=f"{resB.name} **-->** {resA.name}", inline=False)
             if len(embed.fields) > 0:
-                await chan.send(embed=embed)
+                self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
         else:
             added = len(before) < len(after)
@@ -681,7 +693,7 @@ class Logger(JosixCog):
                 return
             if not (embed := self._sticker_embed(res, added)):
                 return
-            await chan.send(embed=embed)
+            self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_webhooks_update(self, channel: GuildChannel):
@@ -697,7 +709,7 @@ class Logger(JosixCog):
         embed.add_field(name="Name", value=channel.name)
         embed.add_field(name="Category", value=category_name)
         embed.set_footer(text=f"{channel.mention} • {dt.strftime(dt.now(), '%d/%m/%Y %H:%M')}")
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
 #
 # Member logs
@@ -731,7 +743,7 @@ class Logger(JosixCog):
                 if ban.reason:
                     embed.add_field(name="Reason", value=ban.reason[:1023], inline=False)
                 break
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_member_unban(self, guild: Guild, user: User):
@@ -749,7 +761,7 @@ class Logger(JosixCog):
                 if unban.reason:
                     embed.add_field(name="Reason", value=unban.reason[:1023])
                 break
-        await chan.send(embed=embed) 
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: Member):
@@ -759,7 +771,7 @@ class Logger(JosixCog):
 
         embed = self._join_embed(member, True)
         embed.description = member.mention
-        await chan.send(embed=embed)
+        self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_raw_member_remove(self, payload: RawMemberRemoveEvent):
@@ -767,7 +779,7 @@ class Logger(JosixCog):
         if not chan:
             return
 
-        await chan.send(embed=self._join_embed(payload.user, False)) # type: ignore
+        self.bot.sender.post(chan, Priority.LOG, embed=self._join_embed(payload.user, False)) # type: ignore
 
     @commands.Cog.listener()
     async def on_member_update(self, before: Member, after: Member):
@@ -795,7 +807,7 @@ class Logger(JosixCog):
                     inline=False
                 )
         if len(embed.fields) > 0:
-            await chan.send(embed=embed)
+            self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
     @commands.Cog.listener()
     async def on_user_update(self, before: User, after: User):
@@ -819,7 +831,7 @@ class Logger(JosixCog):
                 embed.add_field(name="Username", value=f"{before.name} **-->** {after.name}", inline=False)
             
             if len(embed.fields) > 0:
-                await chan.send(embed=embed)
+                self.bot.sender.post(chan, Priority.LOG, embed=embed)
 
 def setup(bot: Josix):
     bot.add_cog(Logger(bot, False))
@@ -1,28 +1,20 @@
-import datetime
 from dataclasses import dataclass
-from enum import Enum
+from operator import attrgetter
 from os import getenv
+from time import time
 
 import discord
 from discord import ApplicationContext, option
-from discord.ext import commands
-from dotenv import load_dotenv
-from requests import Session  # type: ignore
-from urllib3 import disable_warnings  # type: ignore
-from urllib3.exceptions import InsecureRequestWarning  # type: ignore
+from discord.ext import commands, tasks
 
+import pkg.logwrite as log
 from josix import Josix
+from pkg import ranking
 from pkg.bot_utils import JosixCog, josix_slash
-
-
-class HTTPMethod(Enum):
-    """Enumerator that represents HTTP method used for the bot"""
-    GET = "GET"
-    POST = "POST"
-
-
-class MonixAPIError(Exception):
-    """Exception for every Monix API errors"""
+from pkg.monix_client import MonixAPIError, MonixClient, ResponseCache
+from pkg.monix_history import HistoryStore
+from pkg.monix_stocks import StockAlert, StockWatcher
+from pkg.send_queue import Priority
 
 
 class Monix(JosixCog):
@@ -33,18 +25,19 @@ class Monix(JosixCog):
     ----------
     bot : Josix
         The bot that loaded this extension
-    base_url : str
-        The url of the Monix API
-    session : Session
-        The session for every request to the API
+    client : MonixClient
+        The asynchronous client of the API, its session is opened on the first request
+    cache : ResponseCache
+        The cache of the responses of the API, with a TTL by endpoint
+    history : HistoryStore
+        The consumption of the members and products, updated with the new records of the history
+    stocks : StockWatcher
+        The last stocks polled in the background and their history
 
     Methods
     -------
-    generate_token():
-        Generate the token for the session with the given username and password
-
-    request(target: str, method: HTTPMethod, json: str = None):
-        Execute a request to the target endpoint of the API and retrieves the result
+    request(ctx: ApplicationContext, target: str):
+        Get the response of an endpoint from the cache or the API, answers the command with the error if it failed
     """
 
     @dataclass()
@@ -60,113 +53,116 @@ class Monix(JosixCog):
         def __str__(self) -> str:
             return f"• {self.name} (**{self.value}**" + (" coins)" if self.isMember else ")") + "\n"
 
-    disable_warnings(InsecureRequestWarning)
-    load_dotenv(".env.dev")
     _JOSIX_LOGIN = getenv("MONIX_LOG", "")
     _JOSIX_PSSWD = getenv("MONIX_PASSWORD", "")
     _LOG_STOCK = getenv("HOME", "") + getenv("LOGS", "") + "stocks.txt"
+    _CLUBNIX_GUILD = 751012516477403176
+    _ALERT_CHANNEL = int(getenv("MONIX_ALERT_CHANNEL", "0"))
+    _STOCK_THRESHOLD = 50
+    # Interval of the stocks polling, doubled each time nothing changed
+    _POLL_MIN = 60.0
+    _POLL_MAX = 900.0
+    _LEADERBOARD_SIZE = 5
+    _RANKING_SIZE = 10
+    _PERIODS = [
+        discord.OptionChoice(name="Last 7 days", value=7),
+        discord.OptionChoice(name="Last 30 days", value=30),
+        discord.OptionChoice(name="All time", value=0)
+    ]
+    # Seconds during which a response is fresh, it is then revalidated in the background
+    _TTLS = {
+        "/products/": 60.0,
+        "/users/": 120.0,
+        "/history/": 30.0
+    }
+    # Raised by a body that does not have the expected format
+    _PAYLOAD_ERRORS = (KeyError, TypeError, ValueError, AttributeError)
 
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp)
         self.bot = bot
-        self.base_url = "https://monix.clubnix.fr/api"
-        self.session = Session()
-        self.session.verify = False
-        self.generate_token()
+        self.client = MonixClient(
+            getenv("MONIX_URL", "https://monix.clubnix.fr/api"),
+            Monix._JOSIX_LOGIN,
+            Monix._JOSIX_PSSWD,
+            timeout=float(getenv("MONIX_TIMEOUT", "10"))
+        )
+        self.history = HistoryStore()
+        self.cache = ResponseCache(self.client, Monix._TTLS, stale=float(getenv("MONIX_STALE", "300")))
+        self.stocks = StockWatcher(Monix._STOCK_THRESHOLD)
+
+        if Monix._JOSIX_LOGIN and self.bot.owns_guild(Monix._CLUBNIX_GUILD):
+            self.watch_stocks.start()
+
+    def cog_unload(self) -> None:
+        self.watch_stocks.cancel()
+        self.bot.loop.create_task(self.client.close())
 
     def cog_check(self, ctx: ApplicationContext):
         """
         An automatic check that disable the commands of this extension
         if they are not executed in the server of the Club*Nix
         """
-        return ctx.guild.id == 751012516477403176
+        return ctx.guild.id == Monix._CLUBNIX_GUILD
 
-    def generate_token(self) -> None:
-        """
-        Method to get the token of the bot and implements it in headers.
-        Check if the token is valid with a basic call to the API
+    async def request(self, ctx: ApplicationContext, target: str) -> dict | None:
         """
-        authentication = self.request(
-            target="/auth/login",
-            method=HTTPMethod.POST,
-            json=str({
-                "username": Monix._JOSIX_LOGIN,
-                "password": Monix._JOSIX_PSSWD
-            })
-        )
+        Get the response of an endpoint, from the cache when it is fresh enough
 
-        try:
-            self.session.headers = {
-                "accept": "application/json",
-                "Authorization": f"Bearer {authentication['data']['token']}"
-            }
-        except KeyError:
-            raise MonixAPIError("Error on Josix login")
+        Parameters
+        ----------
+        ctx : ApplicationContext
+            The context of the command, answered with the error if the request failed
+        target : str
+            The endpoint of the ressource
 
-        try:
-            checkToken = self.session.request(
-                HTTPMethod.GET.value,
-                self.base_url + "/users/1",
-                json=None,
-            )
-            if checkToken.status_code == 403:
-                raise MonixAPIError("Invalid token generated")
-        except Exception:
-            raise MonixAPIError("Unable to connect to the API")
-
-    def request(
-            self,
-            target: str,
-            method: HTTPMethod,
-            json: str | None = None,
-    ) -> dict:
-        """
-        Monix API function to create web requests originally created by Anemys.
-        Args:
-            target: The endpoint for accessing the ressources we aim for.
-            params: dictionary of parameters for the function
         Returns
-            A dictionary containing the function's results.
+        -------
+        dict | None
+            The JSON returned by the API, None if the request failed
         """
-
-        # Send the request
         try:
-            data = self.session.request(
-                method.value,
-                self.base_url + target,
-                json=json,
-            )
-        except Exception:
-            raise MonixAPIError(f"Unable to connect to {self.base_url}")
+            return await self.cache.get(target)
+        except MonixAPIError as error:
+            await ctx.respond(f"Monix is not available right now ({error})")
+            return None
 
-        # Check that the API key wasn't rejected
-        if data.status_code == 401:
-            try:
-                # Return the actual error message if the API returned valid JSON
-                raise MonixAPIError(data.json()["error"])
-            except Exception:
-                raise MonixAPIError(data.text)
-        elif data.status_code == 403:
-            if str.lower(data.text["message"]).startswith("token"):
-                self.generate_token()
-                return self.request(target, method, json)
-            else:
-                raise MonixAPIError("Access Forbidden check credentials")
-        elif data.status_code < 200 or data.status_code >= 300:
-            raise MonixAPIError(f"Wrong status code obtained : {data.status_code}")
-
-        # Parse the text into JSON
+    @tasks.loop(seconds=_POLL_MIN)
+    async def watch_stocks(self):
         try:
-            data = data.json()
-        except ValueError:
-            raise MonixAPIError(f"Unable to parse JSON response : {data.text}")
+            data = await self.cache.refresh("/products/")
+            changed, alerts = self.stocks.update(data["data"])
+        except MonixAPIError:
+            return
+        except Monix._PAYLOAD_ERRORS as e:
+            # Logged only, an exception would stop the loop for good
+            log.writeError("Unexpected response of /products/ : " + log.formatError(e))
+            return
 
-        # Raise an exception if an error occurred
-        if isinstance(data, dict) and "error" in data:
-            raise MonixAPIError(data["error"])
+        interval = Monix._POLL_MIN if changed else min(self.watch_stocks.seconds * 2, Monix._POLL_MAX)
+        if interval != self.watch_stocks.seconds:
+            self.watch_stocks.change_interval(seconds=interval)
 
-        # Return the data
-        return data
+        if alerts:
+            await self._sendAlerts(alerts)
+
+    async def _sendAlerts(self, alerts: list[StockAlert]) -> None:
+        log.writeLog("Monix stocks : " + ", ".join(alert.message for alert in alerts))
+        if not Monix._ALERT_CHANNEL or not self.bot.is_ready():
+            return
+
+        try:
+            if not (channel := await self.bot.resolver.channel(Monix._ALERT_CHANNEL)):
+                return
+
+            embed = discord.Embed(
+                title="Stocks",
+                description="\n".join(alert.message for alert in alerts),
+                color=0xFFCC00 if any(alert.low for alert in alerts) else 0x1cb82b
+            )
+            self.bot.sender.post(channel, Priority.NOTIFICATION, embed=embed)
+        except discord.HTTPException as e:
+            log.writeError(log.formatError(e))
 
     # -----------------------------
     #
@@ -188,24 +184,31 @@ class Monix(JosixCog):
             await ctx.respond("You don't have the required permissions to use this parameter")
             return
 
-        data = self.request(
-            target="/products/",
-            method=HTTPMethod.GET
-        )
-
-        nbStocks = 0
+        # Answered from the stocks polled in the background, the API is only called if they are too old
+        if time() - self.stocks.updated_at > Monix._POLL_MAX * 2:
+            data = await self.request(ctx, "/products/")
+            if data is None:
+                return
+            try:
+                _, alerts = self.stocks.update(data["data"])
+            except Monix._PAYLOAD_ERRORS as e:
+                log.writeError("Unexpected response of /products/ : " + log.formatError(e))
+                await ctx.respond("Monix is not available right now (unexpected response)")
+                return
+            if alerts:
+                await self._sendAlerts(alerts)
+
+        nbStocks = self.stocks.total
         if get_stocks:
             with open(Monix._LOG_STOCK, "w") as f:
-                for product in data["data"]:
-                    nbStocks += product["stock"]
-                    f.write(f"{product['name']} : {product['stock']}\n")
+                for name, stock in self.stocks.products.values():
+                    f.write(f"{name} : {stock}\n")
                 f.write(f"\n===== Total : {nbStocks} =====\n")
 
-        else:
-            for product in data["data"]:
-                nbStocks += product["stock"]
+        consumed = self.stocks.consumption(86400)
+        trend = f"\n**{consumed}** consumed during the last 24 hours" if consumed else ""
 
-        if nbStocks < 50:
+        if nbStocks < Monix._STOCK_THRESHOLD:
             # Mention disabled, to enable it uncomment the following lines and add content=text in the ctx.respond
             # roleT = ctx.guild.get_role(1017914272585629788)  # Role of the treasurer
             # text = roleT.mention if roleT else "Role not found"
@@ -213,7 +216,7 @@ class Monix(JosixCog):
             lowEmbed = discord.Embed(
                 title="Stocks",
                 description=f"The stocks are low : **{nbStocks}** remaining\nYou better go shopping or the members "
-                            f"will be hungry (and angry) !",
+                            f"will be hungry (and angry) !{trend}",
                 color=0xFFCC00
             )
             lowEmbed.set_author(name=ctx.author, icon_url=ctx.author.display_avatar)
@@ -222,74 +225,12 @@ class Monix(JosixCog):
         else:
             highEmbed = discord.Embed(
                 title="Stocks",
-                description=f"There is enough stocks : **{nbStocks}** remaining\nNo need to go shopping now !",
+                description=f"There is enough stocks : **{nbStocks}** remaining\nNo need to go shopping now !{trend}",
                 color=0x1cb82b
             )
             highEmbed.set_author(name=ctx.author, icon_url=ctx.author.display_avatar)
             await ctx.respond(embed=highEmbed)
 
-    def compareTop(self, top: list[Element], recordVal: int) -> int:
-        """
-        Compare a value to the top 5 elements
-
-        Parameters
-        ----------
-        top : list[Element]
-            The best elements
-        recordVal : int
-            The index of the value to compare 
-
-        Returns
-        -------
-        int
-            The index of the element in the top 5. Returns -1 if it does not fit in the top.
-        """
-        if len(top) >= 5:
-            if top[4].value >= recordVal:
-                return -1
-
-            for index, elmt in enumerate(top):
-                if recordVal > elmt.value:
-                    return index
-
-        else:
-            for index, elmt in enumerate(top):
-                if recordVal > elmt.value:
-                    return index
-            return len(top)
-        return -1
-
-    def compareBottom(self, bottom: list[Element], recordVal: int) -> int:
-        """
-        Compare a value to the bottom 5 elements
-
-        Parameters
-        ----------
-        bottom : list[Element]
-            The worst elements
-        recordVal : int
-            The index of the value to comapre
-
-        Returns
-        -------
-        int
-            The index of the element in the bottom 5. Returns -1 if it does not fit in the bottom.
-        """
-        if len(bottom) >= 5:
-            if bottom[4].value <= recordVal:
-                return -1
-
-            for index, elmt in enumerate(bottom):
-                if recordVal < elmt.value:
-                    return index
-
-        else:
-            for index, elmt in enumerate(bottom):
-                if recordVal < elmt.value:
-                    return index
-            return len(bottom)
-        return -1
-
     @josix_slash(description="Leaderboard of the most and least rich members in Monix")
     @commands.cooldown(1, 60, commands.BucketType.user)
     @option(
@@ -308,43 +249,27 @@ class Monix(JosixCog):
             await ctx.respond("Unknown value")
             return
 
-        data = self.request(
-            target="/users/" if value_type == 0 else "/products",
-            method=HTTPMethod.GET
-        )
+        data = await self.request(ctx, "/users/" if value_type == 0 else "/products/")
+        if data is None:
+            return
 
         name_type = "members" if value_type == 0 else "products"
         name_record = "username" if value_type == 0 else "name"
         name_data = "balance" if value_type == 0 else "stock"
-        top: list[Monix.Element] = []
-        bottom: list[Monix.Element] = []
-
-        for record in data["data"]:
-            recordVal = record[name_data]
-            recordName = record[name_record]
-
-            if recordName is None or recordVal is None:
-                continue
-
-            if record["id"] == 1 and value_type == 0:
-                continue
-
-            newElmt = Monix.Element(record[name_record], recordVal, value_type == 0)
-            checkT = self.compareTop(top, recordVal)
-            if checkT > -1:
-                top.insert(checkT, newElmt)
-                if len(top) > 5:
-                    top.pop()
-
-            # We pass this part for products because a lot of products are at 0 and can't be less
-            if value_type == 1:
-                continue
-
-            checkB = self.compareBottom(bottom, recordVal)
-            if checkB > -1:
-                bottom.insert(checkB, newElmt)
-                if len(bottom) > 5:
-                    bottom.pop()
+        try:
+            elements = [
+                Monix.Element(record[name_record], record[name_data], value_type == 0)
+                for record in data["data"]
+                if record[name_record] is not None and record[name_data] is not None
+                and not (record["id"] == 1 and value_type == 0)
+            ]
+        except Monix._PAYLOAD_ERRORS as e:
+            log.writeError(f"Unexpected response of the {name_type} : " + log.formatError(e))
+            await ctx.respond("Monix is not available right now (unexpected response)")
+            return
+        top = ranking.top_k(elements, Monix._LEADERBOARD_SIZE, key=attrgetter("value"))
+        # No bottom for products because a lot of products are at 0 and can't be less
+        bottom = ranking.bottom_k(elements, Monix._LEADERBOARD_SIZE, key=attrgetter("value")) if value_type == 0 else []
 
         embed = discord.Embed(
             title="Leaderboard",
@@ -357,111 +282,62 @@ class Monix(JosixCog):
             embed.add_field(name="Bottom " + name_type, value="".join(map(str, bottom)))
         await ctx.respond(embed=embed)
 
-    def getHistoryValues(self, isMember: bool) -> dict[int, Element]:
+    async def getHistoryValues(self, ctx: ApplicationContext, isMember: bool, days: int) -> dict[int, Element] | None:
         """
-        Get an historic of the transactions made during the last 7 days
+        Get an historic of the transactions made during the last days
+
+        Only the records added since the last call are read, the totals come from the history store
 
         Parameters
         ----------
+        ctx : ApplicationContext
+            The context of the command
         isMember : bool
             A boolean to specify if the historic checks the members (or else it's the products) 
+        days : int
+            The window in days (7 or 30), 0 for all the history
 
         Returns
         -------
-        dict[int, Element]
-            a dictionary containing all the elements found with their IDs as the key
+        dict[int, Element] | None
+            a dictionary containing all the elements found with their IDs as the key, None if the API failed
         """
-        data = self.request(
-            "/history/",
-            HTTPMethod.GET,
-        )
-
-        today = datetime.date.today()
-        records = data['data']
-        elements: dict[int, Monix.Element] = {}
-        idUser = 0
-        nameUser = ""
-        valTransac = 0
-
-        for record in records:
-            dateRecord = datetime.datetime.strptime(record['date'].split("T")[0], "%Y-%m-%d").date()
-            if (today - dateRecord).days > 7:
-                break
-
-            try:
-                if isMember:
-                    if record['User'] is None:
-                        continue
-                    idUser, nameUser, valTransac = record['User']['id'], record['User']['username'], record['movement']
-                else:
-                    if record['Product'] is None:
-                        continue
-                    idUser, nameUser = record['Product']['id'], record['Product']['name']
-                    valTransac = int(-(record['movement'] / record['Product']['price']))
-
-                # We want to look at how many credits a member lost or how many products have been sold
-                if (isMember and valTransac >= 0) or (not isMember and valTransac <= 0):
-                    continue
-
-                elmt = elements.get(idUser)
-                if elmt is None:
-                    elements[idUser] = Monix.Element(nameUser, valTransac, isMember)
-                else:
-                    elements[idUser].value += valTransac
-            except KeyError:
-                continue
-
-        return elements
-
-    def sortElements(self, elements: list[Element], isMember: bool) -> list[Element]:
-        """
-        Sort the elements
-        This sort is not made to be efficient
+        data = await self.request(ctx, "/history/")
+        if data is None:
+            return None
 
-        Parameters
-        ----------
-        elements : list[Element]
-            The elements to sort 
-        isMember : bool
-            Specify if the sort is made on members (or else it's on products)
-
-        Returns
-        -------
-        list[Element]
-            The sorted elements
-        """
-        n = len(elements)
-        if n == 1:
-            return elements
-
-        arraySorted = False
-        for i in range(n):
-            arraySorted = True
-            for j in range(n - 1 - i):
-                if isMember:
-                    if elements[j].value > elements[j + 1].value:
-                        elements[j], elements[j + 1] = elements[j + 1], elements[j]
-                        arraySorted = False
-                else:
-                    if elements[j].value < elements[j + 1].value:
-                        elements[j], elements[j + 1] = elements[j + 1], elements[j]
-                        arraySorted = False
-            if arraySorted:
-                break
-
-        return elements
-
-    @josix_slash(description="Ranking of the most consumed products during the last 7 days")
+        try:
+            self.history.sync(data['data'])
+        except Monix._PAYLOAD_ERRORS as e:
+            log.writeError("Unexpected response of /history/ : " + log.formatError(e))
+            await ctx.respond("Monix is not available right now (unexpected response)")
+            return None
+
+        return {
+            idElmt: Monix.Element(name, value, isMember)
+            for idElmt, (name, value) in self.history.totals(isMember, days).items()
+        }
+
+    @josix_slash(description="Ranking of the most consumed products during the last days")
     @commands.cooldown(1, 60, commands.BucketType.user)
-    async def products_ranking(self, ctx: ApplicationContext):
+    @option(
+        input_type=int,
+        name="days",
+        description="The period of the ranking",
+        default=7,
+        choices=_PERIODS
+    )
+    async def products_ranking(self, ctx: ApplicationContext, days: int):
         await ctx.defer(ephemeral=False, invisible=False)
-        elements = self.getHistoryValues(False)
+        elements = await self.getHistoryValues(ctx, False, days)
+        if elements is None:
+            return
 
         if len(elements.keys()) == 0:
-            await ctx.respond("No transaction found during the last 7 days")
+            await ctx.respond("No transaction found " + (f"during the last {days} days" if days else "in the history"))
             return
 
-        sortedElmts = self.sortElements(list(elements.values()), False)[:10]
+        sortedElmts = ranking.top_k(elements.values(), Monix._RANKING_SIZE, key=attrgetter("value"))
         embed = discord.Embed(
             title="Monix Ranking",
             description="Biggest consumed products",
@@ -471,17 +347,26 @@ class Monix(JosixCog):
         embed.add_field(name="Rank", value="".join(map(str, sortedElmts)))
         await ctx.respond(embed=embed)
 
-    @josix_slash(description="Ranking of the biggest consumers during the last 7 days")
+    @josix_slash(description="Ranking of the biggest consumers during the last days")
     @commands.cooldown(1, 60, commands.BucketType.user)
-    async def members_ranking(self, ctx: ApplicationContext):
+    @option(
+        input_type=int,
+        name="days",
+        description="The period of the ranking",
+        default=7,
+        choices=_PERIODS
+    )
+    async def members_ranking(self, ctx: ApplicationContext, days: int):
         await ctx.defer(ephemeral=False, invisible=False)
-        elements = self.getHistoryValues(True)
+        elements = await self.getHistoryValues(ctx, True, days)
+        if elements is None:
+            return
 
         if len(elements.keys()) == 0:
-            await ctx.respond("No transaction found during the last 7 days")
+            await ctx.respond("No transaction found " + (f"during the last {days} days" if days else "in the history"))
             return
 
-        sortedElmts = self.sortElements(list(elements.values()), True)[:10]
+        sortedElmts = ranking.bottom_k(elements.values(), Monix._RANKING_SIZE, key=attrgetter("value"))
         embed = discord.Embed(
             title="Monix Ranking",
             description="Biggest monix consumers",
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 from json import JSONDecodeError
@@ -8,10 +9,13 @@ from discord.ext import tasks
 from psycopg2 import Error as DBError
 
 import pkg.logwrite as log
+from database import cache, query_stats
 from database.services import discord_service
 from josix import Josix
+from pkg import event_context
 from pkg.bot_utils import JosixCog, josix_slash
 from pkg.logwrite import ERROR_FILE, LOG_FILE
+from pkg.send_queue import Priority
 
 
 class Owner(JosixCog):
@@ -34,8 +38,17 @@ class Owner(JosixCog):
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp, isOwner=True)
         self.bot = bot
-        self.startup = True
+        self.firstBackup = True
+        self.report = 0
 
+        if self.bot.runs_singletons:
+            self.daily_backup.start()
+        self.check_connection.start()
+
+    async def startup(self) -> None:
+        await asyncio.to_thread(self._loadReport)
+
+    def _loadReport(self) -> None:
         try:
             with open(Owner._CONFIG_FILE, 'r') as f:
                 data = json.load(f)
@@ -44,18 +57,21 @@ class Owner(JosixCog):
         except JSONDecodeError as _:
             self.report = 0
 
-        self.daily_backup.start()
-        self.check_connection.start()
-
-    def cog_check(self, ctx: ApplicationContext):
+    async def cog_check(self, ctx: ApplicationContext):
         """Check automatically called for every command of this cog"""
-        return self.bot.is_owner(ctx.author) or ctx.author.guild_permissions.administrator
+        return await self.bot.is_owner(ctx.author) or ctx.author.guild_permissions.administrator
 
     @josix_slash(description="Stop the bot")
     async def stop_josix(self, ctx: ApplicationContext):
         await ctx.respond("Stopping...")
         await self.bot.close()
 
+    @josix_slash(description="Register again the application commands on Discord")
+    async def resync_commands(self, ctx: ApplicationContext):
+        await ctx.defer(ephemeral=False, invisible=False)
+        await self.bot.sync_josix_commands(force=True)
+        await ctx.respond("Application commands synced !")
+
     @josix_slash(description="Create a backup for the database")
     @option(
         input_type=str,
@@ -165,11 +181,94 @@ class Owner(JosixCog):
         await ctx.defer(ephemeral=False, invisible=False)
         await self.lineDisplay(ctx, ERROR_FILE, count, True)
 
-    
+    @josix_slash(description="Display the slowest and most frequent queries since startup")
+    @option(
+        input_type=int,
+        name="count",
+        description="Number of queries in each ranking",
+        default=10,
+        min_value=1,
+        max_value=25
+    )
+    async def query_stats(self, ctx: ApplicationContext, count: int):
+        await ctx.defer(ephemeral=False, invisible=False)
+
+        def table(title: str, rows: list[query_stats.QueryStats]) -> str:
+            lines = [title, f"{'service':<40} {'calls':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'rows':>8} {'err':>5}"]
+            for stats in rows:
+                lines.append(
+                    f"{stats.name[:40]:<40} {stats.count:>7} {stats.percentile(50):>8.1f} "
+                    f"{stats.percentile(95):>8.1f} {stats.percentile(99):>8.1f} {stats.rows:>8} {stats.errors:>5}"
+                )
+            return "\n".join(lines)
+
+        if not query_stats.get_stats():
+            await ctx.respond("No query executed since startup")
+            return
+
+        # Latencies in milliseconds
+        await ctx.respond(f"```{table('Slowest (p95, ms)', query_stats.top_slowest(count))[:1990]}```")
+        await ctx.respond(f"```{table('Most frequent', query_stats.top_frequent(count))[:1990]}```")
+
+        listener = self.bot.invalidation
+        lines = [
+            f"Caches ({listener.received} invalidations received, max lag {listener.max_lag * 1000:.0f} ms)",
+            f"{'cache':<20} {'hits':>9} {'misses':>9} {'evictions':>9}"
+        ]
+        for tableCache in cache.get_caches():
+            lines.append(f"{tableCache.name:<20} {tableCache.hits:>9} {tableCache.misses:>9} {tableCache.evictions:>9}")
+        resolver = self.bot.resolver
+        lines.append(
+            f"Resolver : {resolver.hits} hits, {resolver.negative_hits} known missing, "
+            f"{resolver.misses} misses, {resolver.fetches} HTTP fetches"
+        )
+        lines.append(
+            f"Events with several handlers : {event_context.stats.events}, "
+            f"{event_context.stats.lookups} lookups, {event_context.stats.shared} not repeated"
+        )
+        await ctx.respond("```" + "\n".join(lines)[:1990] + "```")
+
+    @josix_slash(description="Statistics of the Monix API cache")
+    async def monix_stats(self, ctx: ApplicationContext):
+        monix = self.bot.get_cog("Monix")
+        if monix is None:
+            await ctx.respond("The Monix extension is not loaded")
+            return
+
+        responseCache = monix.cache
+        calls = responseCache.hits + responseCache.stale_hits + responseCache.misses
+        hitRate = (responseCache.hits + responseCache.stale_hits) / calls * 100 if calls else 0.0
+        lines = [
+            f"Monix cache ({calls} calls, {hitRate:.1f}% served from the cache, circuit {monix.client.breaker.state.value})",
+            f"{'hits':<14} {responseCache.hits:>7}",
+            f"{'stale hits':<14} {responseCache.stale_hits:>7}",
+            f"{'misses':<14} {responseCache.misses:>7}",
+            f"{'upstream':<14} {responseCache.upstream:>7}",
+            f"{'not modified':<14} {responseCache.not_modified:>7}",
+            f"{'errors':<14} {responseCache.errors:>7}"
+        ]
+        await ctx.respond("```" + "\n".join(lines) + "```")
+
+    @josix_slash(description="Statistics of the messages sent by the bot")
+    async def send_stats(self, ctx: ApplicationContext):
+        sender = self.bot.sender
+        depths = sender.depth()
+        lines = [
+            f"Send queue ({sender.posted} posted, {sender.sent} sent, {sender.merged} merged, "
+            f"{sender.dropped} dropped, {sender.failed} failed)",
+            f"{'priority':<14} {'waiting':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}"
+        ]
+        for priority in Priority:
+            lines.append(
+                f"{priority.name.lower():<14} {depths[priority]:>8} "
+                f"{sender.wait_percentile(priority, 50):>9.0f} {sender.wait_percentile(priority, 95):>9.0f}"
+            )
+        await ctx.respond("```" + "\n".join(lines) + "```")
+
     @tasks.loop(hours=24.0)
     async def daily_backup(self):
-        if self.startup: # Prevents daily backup on startup
-            self.startup = False
+        if self.firstBackup: # Prevents daily backup on startup
+            self.firstBackup = False
             return
         try:
             self.bot.db.backup("", True)
@@ -180,9 +279,11 @@ class Owner(JosixCog):
     async def check_connection(self):
         try:
             discord_service.get_user(self.bot.get_handler(), 0)
+            self.bot.get_handler().check_idle_transactions()
         except Exception as e:
-            if self.report and ((reportChan := self.bot.get_channel(self.report)) or (reportChan := await self.bot.fetch_channel(self.report))):
-                await reportChan.send("Connection to database lost !\n" + str(e))
+            if self.report and (reportChan := await self.bot.resolver.channel(self.report)):
+                self.bot.sender.post(reportChan, Priority.NOTIFICATION, content="Database check failed !\n" + str(e))
+            log.writeError(log.formatError(e))
         else:
             log.writeLog("Database connection check passed !")
 
@@ -9,7 +9,7 @@ from discord.ext import commands
 import pkg.logwrite as log
 from database.services import reactrole_service
 from josix import Josix
-from pkg.bot_utils import JosixCog
+from pkg.bot_utils import JosixCog, JosixDatabaseUnavailable, fetch_members
 
 
 class ReactionRole(JosixCog):
@@ -59,10 +59,10 @@ class ReactionRole(JosixCog):
             if not guildId:
                 return
 
-            if not (guild := self.bot.get_guild(guildId)) and not (guild := await self.bot.fetch_guild(guildId)):
+            if not (guild := await self.bot.resolver.guild(guildId)):
                 return
 
-            if not (member := guild.get_member(userId)) and not (member := await guild.fetch_member(userId)):
+            if not (member := payload.member) and not (member := (await fetch_members(guild, [userId], self.bot.resolver)).get(userId)):
                 return
 
             if member.bot:
@@ -73,13 +73,8 @@ class ReactionRole(JosixCog):
                 return
 
             roleId = resRole
-            if not (role := guild.get_role(roleId)):
-                for val in await guild.fetch_roles():
-                    if val.id == roleId:
-                        role = val
-                        break
-                else:
-                    return
+            if not (role := await self.bot.resolver.role(guild, roleId)):
+                return
 
             if add:
                 if not member.get_role(roleId):
@@ -92,6 +87,8 @@ class ReactionRole(JosixCog):
     async def on_raw_reaction_add(self, payload: RawReactionActionEvent):
         try:
             await self.updateRole(payload, True)
+        except JosixDatabaseUnavailable:
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
 
@@ -99,6 +96,8 @@ class ReactionRole(JosixCog):
     async def on_raw_reaction_remove(self, payload: RawReactionActionEvent):
         try:
             await self.updateRole(payload, False)
+        except JosixDatabaseUnavailable:
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
         
@@ -11,20 +11,26 @@ from discord.ext import commands, tasks
 
 import pkg.logwrite as log
 from cogs.events import Events
+from database.database import DatabaseHandler
 from database.services import (
     birthday_service,
     discord_service,
     guild_service,
+    poll_service,
 )
 from josix import Josix
 from pkg.bot_utils import JosixCog, JosixSlash, get_permissions_str, josix_slash
+from pkg.polls import MAX_CHOICES, PollEngine, PollState, PollView
+from pkg.send_queue import Priority
 
 
 class Poll(discord.ui.Modal):
     """A class representing a modal to create custom polls on discord"""
 
-    def __init__(self) -> None:
+    def __init__(self, engine: PollEngine, handler: DatabaseHandler) -> None:
         super().__init__(title="Poll", timeout=300.0)
+        self.engine = engine
+        self.handler = handler
         self.add_item(discord.ui.InputText(
             label="Title (optional)",
             max_length=64,
@@ -39,19 +45,30 @@ class Poll(discord.ui.Modal):
             style=discord.InputTextStyle.paragraph,
             row=1
         ))
+        self.add_item(discord.ui.InputText(
+            label=f"Choices, one per line (optional, {MAX_CHOICES} max)",
+            max_length=512,
+            style=discord.InputTextStyle.paragraph,
+            row=2,
+            required=False
+        ))
 
     async def callback(self, interaction: discord.Interaction):
-        if not interaction:
+        if not interaction or not interaction.guild or not interaction.channel:
             return
 
-        title = self.children[0]
-        content = self.children[1]
-        text = (f"# {title.value} :\n\n" if title.value else "") + (content.value if content.value else "")
+        title = self.children[0].value or ""
+        content = self.children[1].value or ""
+        choices = [choice.strip()[:80] for choice in (self.children[2].value or "").splitlines() if choice.strip()]
+        choices = list(dict.fromkeys(choices))[:MAX_CHOICES] or ["✅ Yes", "❌ No"]
 
-        msg = await interaction.response.send_message(content=text)
+        poll = PollState(0, interaction.guild.id, interaction.channel.id, title, content, choices)
+        msg = await interaction.response.send_message(embed=poll.embed())
         og = await msg.original_response()
-        await og.add_reaction("✅")
-        await og.add_reaction("❌")
+        poll.id = og.id
+        self.engine.add(self.handler, poll)
+        # Attached once the message exists, so that the view is bound to its id like after a restart
+        await msg.edit_original_response(view=PollView(self.engine, poll))
 
 
 class Usage(JosixCog):
@@ -70,7 +87,22 @@ class Usage(JosixCog):
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp)
         self.bot = bot
-        self.checkBirthday.start()
+        self.polls = PollEngine(bot)
+        if self.bot.runs_singletons:
+            self.checkBirthday.start()
+        self.flush_polls.start()
+
+    def cog_unload(self) -> None:
+        self.flush_polls.cancel()
+        try:
+            self.polls.flush(self.bot.get_handler())
+        except Exception as e:
+            log.writeError(log.formatError(e))
+
+    async def startup(self) -> None:
+        count = self.polls.load(self.bot.get_handler(), self.bot.owns_guild)
+        if count:
+            log.writeLog(f"{count} open polls loaded")
 
     @josix_slash(description="Get the help menu")
     @option(
@@ -338,7 +370,54 @@ class Usage(JosixCog):
     @commands.guild_only()
     @discord.default_permissions(manage_messages=True)
     async def create_poll(self, ctx: ApplicationContext):
-        await ctx.send_modal(Poll())
+        await ctx.send_modal(Poll(self.polls, self.bot.get_handler()))
+
+    def _getPoll(self, ctx: ApplicationContext, message_id: str) -> PollState | None:
+        """Get a poll of the guild, open or closed"""
+        if not message_id.isdigit():
+            return None
+
+        idMsg = int(message_id)
+        if (poll := self.polls.polls.get(idMsg)) is None:
+            handler = self.bot.get_handler()
+            if (pollDB := poll_service.get_poll(handler, idMsg)) is None:
+                return None
+            poll = PollState.from_db(pollDB, poll_service.get_poll_votes(handler, idMsg))
+        return poll if poll.idGuild == ctx.guild.id else None
+
+    @josix_slash(description="See the results of a poll")
+    @commands.guild_only()
+    @option(
+        input_type=str,
+        name="message_id",
+        description="ID of the poll message",
+        required=True
+    )
+    async def poll_results(self, ctx: ApplicationContext, message_id: str):
+        if (poll := self._getPoll(ctx, message_id)) is None:
+            await ctx.respond("Unknown poll", ephemeral=True)
+            return
+        await ctx.respond(embed=poll.embed(), ephemeral=True)
+
+    @josix_slash(description="Close a poll, the votes are no longer accepted")
+    @commands.guild_only()
+    @discord.default_permissions(manage_messages=True)
+    @option(
+        input_type=str,
+        name="message_id",
+        description="ID of the poll message",
+        required=True
+    )
+    async def close_poll(self, ctx: ApplicationContext, message_id: str):
+        if (poll := self._getPoll(ctx, message_id)) is None:
+            await ctx.respond("Unknown poll", ephemeral=True)
+            return
+        if poll.closed:
+            await ctx.respond("This poll is already closed", ephemeral=True)
+            return
+
+        await self.polls.close(self.bot.get_handler(), poll)
+        await ctx.respond("Poll closed !", ephemeral=True)
 
     @josix_slash(description="Add your birthday in the database !", give_xp=True)
     @commands.guild_only()
@@ -487,6 +566,13 @@ class Usage(JosixCog):
         embed.add_field(name="Date", value=f"**{hbDate.strftime('%d/%m')}**")
         await ctx.respond(embed=embed)
 
+    @tasks.loop(seconds=5.0)
+    async def flush_polls(self):
+        try:
+            self.polls.flush(self.bot.get_handler())
+        except Exception as e:
+            log.writeError(log.formatError(e))
+
     @tasks.loop(hours=6.0)
     async def checkBirthday(self):
         today = datetime.date.today()
@@ -503,12 +589,12 @@ class Usage(JosixCog):
                 continue
 
             for idChan in results:
-                chan = await self.bot.fetch_channel(idChan)
+                chan = await self.bot.resolver.channel(idChan)
                 if not chan:
                     continue
 
                 today = datetime.date.today()
-                await chan.send(f"Happy birthday to <@{idUser}> :tada: !")
+                self.bot.sender.post(chan, Priority.NOTIFICATION, content=f"Happy birthday to <@{idUser}> :tada: !")
                 birthday_service.update_user_birthday(
                     handler,
                     idUser,
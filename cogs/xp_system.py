@@ -13,15 +13,25 @@ from discord import (
 )
 from discord.abc import PrivateChannel
 from discord.ext import commands, tasks
+from psycopg2 import OperationalError
 
 import pkg.logwrite as log
+from database.database import DatabaseHandler
 from database.services import (
     discord_service,
     season_service,
     xp_service,
 )
+from database.xp_spool import SpoolEntry, XPSpool, spool_path
 from josix import Josix
-from pkg.bot_utils import JosixCog, JosixSlash, josix_slash
+from pkg.bot_utils import (
+    JosixCog,
+    JosixDatabaseUnavailable,
+    JosixSlash,
+    fetch_members,
+    josix_slash,
+)
+from pkg.send_queue import Priority
 
 
 class XP(JosixCog):
@@ -32,12 +42,20 @@ class XP(JosixCog):
     ----------
     bot : Josix
         The bot that loaded this extension
+    spool : XPSpool
+        Local spool of the xp earned while the database is unreachable
     """
 
     def __init__(self, bot: Josix, showHelp: bool):
         super().__init__(showHelp=showHelp)
         self.bot = bot
+        self.spool = XPSpool(spool_path(bot.shard_label))
         self.check_temporary.start()
+        self.replay_spool.start()
+
+    def cog_unload(self) -> None:
+        self.replay_spool.cancel()
+        self.spool.flush()
 
     @staticmethod
     def nextLevelXP(lvl: int, xp: int = 0) -> int:
@@ -103,37 +121,50 @@ class XP(JosixCog):
         xp : int
             The XP the user will obtain
         """
+        nowTime = dt.datetime.now()
+        if self.spool.pending:
+            # Keeps the order with the xp waiting to be replayed
+            self.spool.append(idTarget, idGuild, xp, idCat, nowTime)
+            return
+
         handler = self.bot.get_handler()
-        userDB, guildDB, userGuildDB = discord_service.fetch_user_guild_relationship(handler, idTarget, idGuild)
+        try:
+            userDB, guildDB, userGuildDB = discord_service.fetch_user_guild_xp(handler, idTarget, idGuild)
+            if not (guildDB and userGuildDB):
+                return
 
-        if not (guildDB and userGuildDB):
-            return
+            xpChanId = guildDB.xpNews
+            xpEnabled = guildDB.enableXp
 
-        xpChanId = guildDB.xpNews
-        xpEnabled = guildDB.enableXp
+            currentXP = userGuildDB.xp
+            currentLvl = userGuildDB.lvl
+            lastSend = userGuildDB.lastMessage
+            userBlocked = userGuildDB.isUserBlocked
 
-        currentXP = userGuildDB.xp
-        currentLvl = userGuildDB.lvl
-        lastSend = userGuildDB.lastMessage
-        userBlocked = userGuildDB.isUserBlocked
+            if not xpEnabled or userBlocked:
+                return
 
-        if not xpEnabled or userBlocked:
-            return
+            if idCat != 0 and idCat in guildDB.blockedCat:
+                return
 
-        if idCat != 0 and idCat in guildDB.blockedCat:
-            return
+            if ((nowTime - lastSend).seconds < 60):
+                return
 
-        nowTime = dt.datetime.now()
-        if ((nowTime - lastSend).seconds < 60):
-            return
+            xpNeed = self.nextLevelXP(currentLvl, currentXP - self.totalLevelXP(currentLvl))
+            newLvl = xpNeed <= xp
 
-        xpNeed = self.nextLevelXP(currentLvl, currentXP - self.totalLevelXP(currentLvl))
-        newLvl = xpNeed <= xp
+            currentLvl = currentLvl + 1 if newLvl else currentLvl
+            currentXP = min(1_899_250, currentXP+xp)
 
-        currentLvl = currentLvl + 1 if newLvl else currentLvl
-        currentXP = min(1_899_250, currentXP+xp)
+            xp_service.update_user_xp(handler, idTarget, idGuild, currentLvl, currentXP, nowTime)
+        except (JosixDatabaseUnavailable, OperationalError) as error:
+            if isinstance(error, OperationalError) and not handler.conn.closed:
+                raise error
 
-        xp_service.update_user_xp(handler, idTarget, idGuild, currentLvl, currentXP, nowTime)
+            # Kept until the database is back, see replay_spool. Spooled with the same date,
+            # the replay skips it if the update was committed before the connection broke
+            self.spool.append(idTarget, idGuild, xp, idCat, nowTime)
+            return
 
         if newLvl and xpChanId:
             ping = currentLvl == 1 or userDB.pingUser
@@ -145,14 +176,65 @@ class XP(JosixCog):
             if ping:
                 mentions = AllowedMentions.all()
 
-            if ((xpChan := self.bot.get_channel(xpChanId)) or (xpChan := await self.bot.fetch_channel(xpChanId))) and isinstance(xpChan, TextChannel):
+            if (xpChan := await self.bot.resolver.channel(xpChanId)) and isinstance(xpChan, TextChannel):
 
-                await xpChan.send(
-                    f"Congratulations <@{idTarget}>, you are now level **{currentLvl}** with **{currentXP}** exp. ! 🎉" + info,
+                self.bot.sender.post(
+                    xpChan,
+                    Priority.NOTIFICATION,
+                    content=f"Congratulations <@{idTarget}>, you are now level **{currentLvl}** with **{currentXP}** exp. ! 🎉" + info,
                     allowed_mentions=mentions
                 )
 
 
+    def _applySpooled(self, entry: SpoolEntry) -> None:
+        """
+        Apply xp earned while the database was unreachable
+
+        Follows the same rules as `_updateUser` without the level up message.
+        The last message date is set to the date of the entry, so an entry
+        already applied is skipped by the cooldown check
+        """
+        handler = self.bot.get_handler()
+        try:
+            self._replaySpooled(handler, entry)
+        except OperationalError as error:
+            if not handler.conn.closed:
+                raise error
+            raise JosixDatabaseUnavailable(f"Connection lost during the replay : {error}") from error
+
+
+    def _replaySpooled(self, handler: DatabaseHandler, entry: SpoolEntry) -> None:
+        _, guildDB, userGuildDB = discord_service.fetch_user_guild_xp(handler, entry.idUser, entry.idGuild)
+        if not (guildDB and userGuildDB):
+            return
+
+        if not guildDB.enableXp or userGuildDB.isUserBlocked:
+            return
+
+        if entry.idCat != 0 and entry.idCat in guildDB.blockedCat:
+            return
+
+        sentAt = entry.time
+        if (sentAt - userGuildDB.lastMessage).total_seconds() < 60:
+            return
+
+        currentXP, currentLvl = userGuildDB.xp, userGuildDB.lvl
+        xpNeed = self.nextLevelXP(currentLvl, currentXP - self.totalLevelXP(currentLvl))
+        newLvl = currentLvl + 1 if xpNeed <= entry.xp else currentLvl
+        xp_service.update_user_xp(handler, entry.idUser, entry.idGuild, newLvl, min(1_899_250, currentXP + entry.xp), sentAt)
+
+
+    @tasks.loop(seconds=1.0)
+    async def replay_spool(self):
+        if not self.spool.pending:
+            return
+
+        try:
+            self.spool.replay(self._applySpooled, unavailable=(JosixDatabaseUnavailable,))
+        except Exception as e:
+            log.writeError(log.formatError(e))
+
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         await self.bot.process_commands(message)
@@ -174,6 +256,8 @@ class XP(JosixCog):
                 xp,
                 idCat if idCat else 0
             )
+        except JosixDatabaseUnavailable:
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
 
@@ -199,13 +283,15 @@ class XP(JosixCog):
                 25,
                 idCat if idCat else 0
             )
+        except JosixDatabaseUnavailable:
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
 
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        if not (channel := self.bot.get_channel(payload.channel_id)) and not (channel := await self.bot.fetch_channel(payload.channel_id)):
+        if not (channel := await self.bot.resolver.channel(payload.channel_id)):
             return
 
         if (
@@ -224,6 +310,8 @@ class XP(JosixCog):
                 25,
                 idCat if idCat else 0
             )
+        except JosixDatabaseUnavailable:
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
 
@@ -466,6 +554,9 @@ class XP(JosixCog):
                 xp_service.get_all_time_leaderboard(handler, idGuild, limit) if all_time else
                 xp_service.get_leaderboard(handler, idGuild, limit)
             )
+        except JosixDatabaseUnavailable:
+            await ctx.respond("The database is unavailable, try again later")
+            return
         except Exception as e:
             log.writeError(log.formatError(e))
             return
@@ -732,14 +823,9 @@ class XP(JosixCog):
         res = ""
         if scores:
             medals = ["🥇", "🥈", ":third_place:"]
-            for i, score in enumerate(scores):
-                if i >= 3:
-                    break
-
-                try:
-                    if not (member := guild.get_member(score.idUser)) and not (member := await guild.fetch_member(score.idUser)):
-                        continue
-                except discord.HTTPException:
+            members = await fetch_members(guild, [score.idUser for score in scores[:3]], self.bot.resolver)
+            for i, score in enumerate(scores[:3]):
+                if not (member := members.get(score.idUser)):
                     continue
                 res += f"{medals[i]} {member.name} (**{score.score}**)\n"
         
@@ -801,15 +887,18 @@ class XP(JosixCog):
             return
 
         for guild in guilds:
+            if not self.bot.owns_guild(guild.id):
+                continue
+
             try:
                 season_service.stop_temporary_season(handler, guild.id)
                 if not guild.xpNews:
                     continue
 
-                if not (xpChan := self.bot.get_channel(guild.xpNews)) and not (xpChan := await self.bot.fetch_channel(guild.xpNews)):
+                if not (xpChan := await self.bot.resolver.channel(guild.xpNews)):
                     continue
 
-                await xpChan.send("The temporary season has ended ! Rolling back to the previous season")
+                self.bot.sender.post(xpChan, Priority.NOTIFICATION, content="The temporary season has ended ! Rolling back to the previous season")
             except Exception as e:
                 log.writeError(log.formatError(e))
                 continue
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from functools import wraps
+from time import time
+from typing import Callable
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+import pkg.logwrite as log
+from database.database import open_connection
+
+CHANNEL = "josix_invalidate"
+MAX_LAG = float(os.getenv("CACHE_MAX_INVALIDATION_LAG", "1"))
+
+_MISS = object()
+_CACHES: list["TableCache"] = []
+_enabled = False
+
+
+class TableCache:
+    """
+    Represents a local cache of the results of a read service
+
+    The entries are grouped by the first parameter of the service (a guild or a message id)
+    so that a notification evicts all the results related to this key.
+    The results of a service without parameter are grouped under None
+
+    Attributes
+    ----------
+    name : str
+        Name of the cache, used in the logs
+    tables : tuple[str]
+        Tables (lowercase) whose changes invalidate the cache
+    max_groups : int
+        Number of keys kept, the oldest ones are evicted first
+    hits : int
+        Number of results served by the cache
+    misses : int
+        Number of results loaded from the database
+    evictions : int
+        Number of keys evicted by an invalidation
+    """
+
+    def __init__(self, name: str, tables: tuple[str, ...], max_groups: int = 10000) -> None:
+        self.name = name
+        self.tables = tables
+        self.max_groups = max_groups
+        self._groups: OrderedDict[object, dict[tuple, object]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _CACHES.append(self)
+
+    def get(self, args: tuple) -> object:
+        group = self._groups.get(args[0] if args else None)
+        if group is None or args not in group:
+            self.misses += 1
+            return _MISS
+
+        self.hits += 1
+        return group[args]
+
+    def set(self, args: tuple, value: object) -> None:
+        group = self._groups.setdefault(args[0] if args else None, {})
+        group[args] = value
+        if len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+
+    def evict(self, key: object) -> None:
+        if self._groups.pop(key, None) is not None:
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.evictions += len(self._groups)
+        self._groups.clear()
+
+
+def cached(cache: TableCache) -> Callable:
+    """
+    Decorator for the read services whose results can be kept in the cache
+
+    The result is only kept while the invalidations are received,
+    otherwise the service is always executed. A result read inside a pending
+    write is not kept, no invalidation is sent if this transaction is rolled back.
+    The results are shared, the services return immutable values (tuples, frozen dataclasses)
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(handler, *args):
+            if not _enabled:
+                return func(handler, *args)
+
+            res = cache.get(args)
+            if res is _MISS:
+                res = func(handler, *args)
+                if handler.conn.get_transaction_status() == TRANSACTION_STATUS_IDLE:
+                    cache.set(args, res)
+            return res
+        return wrapper
+    return decorator
+
+
+def invalidate(table: str, key: int | None = None) -> None:
+    """
+    Evict the cached entries that depend on a table
+
+    Called by the write services for the current process and
+    by the listener for the changes made by the other processes
+
+    Parameters
+    ----------
+    table : str
+        Name of the modified table
+    key : int | None
+        Key of the modified rows, everything related to the table is evicted if None
+    """
+    table = table.lower()
+    for cache in _CACHES:
+        if table not in cache.tables:
+            continue
+
+        if key is None:
+            cache.clear()
+        else:
+            cache.evict(key)
+
+
+def set_enabled(enabled: bool) -> None:
+    """Enable or disable the caches, they are emptied in both cases"""
+    global _enabled
+    _enabled = enabled
+    for cache in _CACHES:
+        cache.clear()
+
+
+def get_caches() -> list[TableCache]:
+    return list(_CACHES)
+
+
+class InvalidationListener:
+    """
+    Represents the listener of the invalidations sent by the database triggers
+
+    It uses its own autocommit connection, read by the event loop without blocking it.
+    The caches are disabled while this connection is down since the invalidations
+    sent meanwhile are lost
+
+    Attributes
+    ----------
+    received : int
+        Number of invalidations received
+    max_lag : float
+        Highest delay in seconds between a commit and the reception of its invalidation
+    """
+
+    def __init__(self, max_delay: float = 60.0) -> None:
+        self.max_delay = max_delay
+        self.conn = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._fd: int | None = None
+        self._delay = 1.0
+
+        self.received = 0
+        self.max_lag = 0.0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self._connect()
+
+    def stop(self) -> None:
+        set_enabled(False)
+        self._close()
+        self.loop = None
+
+    def _connect(self) -> None:
+        if self.loop is None:
+            return
+
+        try:
+            self.conn = open_connection()
+            self.conn.autocommit = True
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL};")
+        except psycopg2.Error as error:
+            log.writeError(f"Cache invalidation listener unavailable, next try in {self._delay:.0f}s : {error}")
+            self._close()
+            self.loop.call_later(self._delay, self._connect)
+            self._delay = min(self._delay * 2, self.max_delay)
+            return
+
+        self._fd = self.conn.fileno()
+        self.loop.add_reader(self._fd, self._read)
+        self._delay = 1.0
+        set_enabled(True)
+        log.writeLog(" - Cache invalidation listener started")
+
+    def _close(self) -> None:
+        if self.conn is None:
+            return
+
+        if self.loop is not None and self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+        try:
+            self.conn.close()
+        except psycopg2.Error:
+            pass
+        self.conn = None
+
+    def _read(self) -> None:
+        try:
+            self.conn.poll()
+        except psycopg2.Error as error:
+            log.writeError(f"Cache invalidation listener lost : {error}")
+            set_enabled(False)
+            self._close()
+            self.loop.call_later(self._delay, self._connect)
+            return
+
+        while self.conn.notifies:
+            self._handle(self.conn.notifies.pop(0).payload)
+
+    def _handle(self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            key = int(data["key"]) if data.get("key") is not None else None
+            invalidate(data["table"], key)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            log.writeError(f"Invalid cache invalidation : {payload}")
+            return
+
+        self.received += 1
+        lag = time() - float(data.get("at", time()))
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag > MAX_LAG:
+            log.writeError(f"Cache invalidation of {data['table']} received after {lag:.2f}s")
@@ -1,57 +1,330 @@
 import datetime as dt
 import os
 from shutil import copyfile
+from time import monotonic
 from typing import Callable
 
 import psycopg2
-from dotenv import load_dotenv
+from psycopg2.errors import InvalidSqlStatementName
 
 import pkg.logwrite as log
+from pkg.bot_utils import JosixDatabaseException, JosixDatabaseUnavailable
+from pkg.circuit_breaker import CircuitBreaker, CircuitState
 
 SCRIPT_DIR = os.path.dirname(__file__)
 BACKUP_PATH = os.path.join(SCRIPT_DIR, 'backup.sql')
 DAILY_BACKUP_PATH = os.path.join(SCRIPT_DIR, 'daily_backup.sql')
 OLD_PATH = os.path.join(SCRIPT_DIR, 'daily_backup.sql.old')
 TABLE_ORDER_PATH = os.path.join(SCRIPT_DIR, 'table_order.sql')
+SCHEMA_PATH = os.path.join(SCRIPT_DIR, '..', 'initialization-scripts', '2-schema-josix.sql')
+
+APPLICATION_NAME = "josix"
+
+
+def open_connection(connect_timeout: int = 5):
+    """
+    Open a new connection on the primary database with the settings of `.env.dev`
+
+    Parameters
+    ----------
+    connect_timeout : int
+        Maximum time in seconds to wait for the connection
+
+    Returns
+    -------
+    connection
+        The psycopg2 connection
+    """
+    return psycopg2.connect(
+        host=os.getenv("HOST"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        application_name=APPLICATION_NAME,
+        connect_timeout=connect_timeout
+    )
+
 
 class DatabaseHandler():
     """
     Represents an handler for the database.
     Allows to execute queries on the database
+
+    The hot queries of the services are registered with `register_statement`.
+    They are prepared once per connection on the server and then executed by name
+
+    When the connection is lost, a circuit breaker opens : the services fail fast
+    with a JosixDatabaseUnavailable and the handler reconnects with an exponential backoff
+
+    An optional read-only replica can serve the heavy reads with `read_cursor`.
+    The primary is used instead while the replica is down or lags too much
     """
-    def __init__(self) -> None:
-        load_dotenv(".env.dev")
+    _STATEMENTS: dict[str, str] = {}
 
-        conn = psycopg2.connect(
-            host=os.getenv("HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD")
-        )
+    def __init__(self, read_dsn: str | None = None) -> None:
+        self.idle_threshold = int(os.getenv("DB_IDLE_TX_THRESHOLD", "300"))
+        self.connect_timeout = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+        self.breaker = CircuitBreaker("database", threshold=1, base_delay=1.0, max_delay=60.0)
+        self._connect()
 
         log.writeLog(" - Connection on the database for Josix done")
 
+        self.read_dsn = read_dsn or os.getenv("DB_READ_DSN")
+        self.max_lag = float(os.getenv("DB_READ_MAX_LAG", "10"))
+        self.replica_breaker = CircuitBreaker("read replica", threshold=1, base_delay=5.0, max_delay=300.0)
+        self.replica_conn = None
+        self.replica_cursor = None
+        self.replica_used = False
+        self.force_primary = False
+        self.depth = 0
+        self._lag = 0.0
+        self._lag_checked = 0.0
+
+
+    def _connect(self) -> None:
+        conn = open_connection(self.connect_timeout)
+
         self.conn = conn
         self.cursor = conn.cursor()
+        self.prepared: set[str] = set()
+
+
+    def _connect_replica(self) -> None:
+        conn = psycopg2.connect(
+            self.read_dsn,
+            application_name=APPLICATION_NAME,
+            connect_timeout=self.connect_timeout
+        )
+        conn.set_session(readonly=True, autocommit=True)
+
+        self.replica_conn = conn
+        self.replica_cursor = conn.cursor()
+        self._lag_checked = 0.0
+        log.writeLog(" - Connection on the read replica for Josix done")
+
+
+    def _replica_ready(self) -> bool:
+        if not self.read_dsn or not self.replica_breaker.allow():
+            return False
+
+        try:
+            if self.replica_conn is None or self.replica_conn.closed:
+                self._connect_replica()
+
+            if monotonic() - self._lag_checked > self.max_lag / 2:
+                # No lag when everything received has been replayed, even if the primary is idle
+                self.replica_cursor.execute("""SELECT CASE
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+                    END;""")
+                self._lag = float(self.replica_cursor.fetchone()[0])
+                self._lag_checked = monotonic()
+        except psycopg2.Error:
+            self._replica_lost()
+            return False
+
+        self.replica_breaker.success()
+        return self._lag <= self.max_lag
+
+
+    def _replica_lost(self) -> None:
+        if self.replica_conn is not None and not self.replica_conn.closed:
+            try:
+                self.replica_conn.close()
+            except psycopg2.Error:
+                pass
+        self.replica_breaker.failure()
+
+
+    def read_cursor(self):
+        """
+        Get the cursor for a heavy read query
+
+        Returns the cursor of the read replica when it is configured, reachable
+        and lags less than `DB_READ_MAX_LAG` seconds. Otherwise the cursor of the primary.
+        A service called by another one always reads on the primary to see the pending writes,
+        as well as the retry of a query that failed on the replica
+        """
+        self.replica_used = not self.force_primary and self.depth <= 1 and self._replica_ready()
+        return self.replica_cursor if self.replica_used else self.cursor
+
+
+    def replica_error(self) -> bool:
+        """
+        Handle an error raised by a heavy read query
+
+        Returns
+        -------
+        bool
+            True if the query ran on the replica and can be retried on the primary
+        """
+        if not self.replica_used:
+            return False
+
+        self.replica_used = False
+        if self.replica_conn is None or self.replica_conn.closed:
+            self._replica_lost()
+        return True
+
+
+    def ensure_connection(self) -> None:
+        """
+        Check the connection before a query and reconnect if it was lost
+
+        Raises a JosixDatabaseUnavailable without waiting on the network
+        while the circuit is open or when the reconnection fails
+        """
+        if not self.conn.closed and self.breaker.state == CircuitState.CLOSED:
+            return
+
+        if not self.breaker.allow():
+            raise JosixDatabaseUnavailable(f"Database unavailable, next try in {self.breaker.retry_in:.0f}s")
+
+        if self.conn.closed:
+            try:
+                self._connect()
+            except psycopg2.OperationalError as error:
+                self.breaker.failure()
+                raise JosixDatabaseUnavailable(f"Reconnection to the database failed : {error}") from error
+            log.writeLog(" - Reconnection on the database for Josix done")
+        self.breaker.success()
+
+
+    def recover(self) -> None:
+        """
+        Restore the handler after a failed query
+
+        Rollbacks the current transaction, or closes the connection and
+        opens the circuit if the connection is broken
+        """
+        if not self.conn.closed:
+            try:
+                self.conn.rollback()
+                return
+            except psycopg2.Error:
+                pass
+
+        try:
+            self.conn.close()
+        except psycopg2.Error:
+            pass
+        self.breaker.failure()
 
 
     @staticmethod
     def _error_handler(func: Callable):
         def wrapper(ref: "DatabaseHandler", *args):
+            ref.ensure_connection()
             try:
                 return func(ref, *args)
             except psycopg2.Error as dbError:
-                ref.conn.rollback()
+                ref.recover()
                 raise dbError
             except Exception as commonError:
                 raise commonError
         return wrapper
 
 
+    @classmethod
+    def register_statement(cls, name: str, query: str) -> str:
+        """
+        Register a query in the prepared statements registry
+
+        The registry is shared by all the handlers and connections,
+        the statement is prepared on a connection the first time it is executed on it
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the statement on the server
+        query : str
+            The query, using $1, $2... as parameters
+
+        Returns
+        -------
+        str
+            The name of the statement
+        """
+        if cls._STATEMENTS.get(name, query) != query:
+            raise JosixDatabaseException(f"A different statement is already registered as {name}")
+
+        cls._STATEMENTS[name] = query
+        return name
+
+
+    def execute_prepared(self, name: str, params: tuple) -> None:
+        """
+        Execute a registered statement with the cursor of the handler
+
+        Prepares it first if it was not done yet on the current connection
+
+        Parameters
+        ----------
+        name : str
+            Name of the registered statement
+        params : tuple
+            Parameters of the statement, in order
+        """
+        if name not in self.prepared:
+            self.cursor.execute(f"PREPARE {name} AS {DatabaseHandler._STATEMENTS[name]}")
+            self.prepared.add(name)
+
+        try:
+            self.cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        except InvalidSqlStatementName as dbError:
+            # Deallocated outside of the handler, prepared again on the next call
+            self.prepared.discard(name)
+            raise dbError
+
+
+    @_error_handler
+    def check_idle_transactions(self) -> None:
+        """
+        Check that no Josix connection stays "idle in transaction" on the server
+
+        Such a session keeps an old snapshot and prevents the vacuum of the tables.
+        Raises a JosixDatabaseException when a session stayed idle in a transaction
+        longer than the threshold (`DB_IDLE_TX_THRESHOLD` in seconds)
+        """
+        query = """SELECT pid, EXTRACT(EPOCH FROM NOW() - state_change)::INT
+                    FROM pg_stat_activity
+                    WHERE application_name = %s AND
+                          state = 'idle in transaction' AND
+                          NOW() - state_change > MAKE_INTERVAL(secs => %s);"""
+        self.cursor.execute(query, (APPLICATION_NAME, self.idle_threshold))
+        res = self.cursor.fetchall()
+        self.conn.commit()
+
+        if res:
+            sessions = ", ".join(f"pid {pid} ({idle}s)" for pid, idle in res)
+            raise JosixDatabaseException(f"Sessions idle in transaction for more than {self.idle_threshold}s : {sessions}")
+
+
+    @_error_handler
+    def migrate(self) -> None:
+        """
+        Create the josix tables missing from the database
+
+        Runs the schema script, made only of `CREATE TABLE IF NOT EXISTS`, so the tables
+        added by an update (e.g. josix.Poll) exist on a database created before it.
+        The existing tables are not altered
+        """
+        with open(SCHEMA_PATH, 'r') as schema_file:
+            self.cursor.execute(schema_file.read())
+        self.conn.commit()
+
+
     def execute(self, query: str, raiseError: bool = False) -> str:
         if query.startswith("--") or query.startswith("\n") or len(query) == 0:
             return "Empty query"
 
+        try:
+            self.ensure_connection()
+        except JosixDatabaseUnavailable as error:
+            if raiseError:
+                raise error
+            return str(error)
+
         try:
             self.cursor.execute(query)
             self.conn.commit()
@@ -64,7 +337,7 @@ class DatabaseHandler():
                 return "Query executed : nothing to fetch"
 
         except psycopg2.Error as commonError:
-            self.conn.rollback()
+            self.recover()
             if raiseError:
                 raise commonError
             return str(commonError)
@@ -119,4 +392,5 @@ class DatabaseHandler():
                             row_data.append("ARRAY%s::BIGINT[]" % (repr(rd)))
                         else:
                             row_data.append(repr(rd))
-                    f.write('%s (%s);\n' % (insert_prefix, ', '.join(row_data)))
\ No newline at end of file
+                    f.write('%s (%s);\n' % (insert_prefix, ', '.join(row_data)))
+        self.conn.commit()
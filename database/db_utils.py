@@ -1,30 +1,98 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import date, datetime
+from functools import wraps
+from time import perf_counter
 from typing import Callable
 
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 
+from database import query_stats
 from database.database import DatabaseHandler
 from pkg.bot_utils import JosixDatabaseException
 
-# TODO : add dataclasses param checking on start (same name/order)
 
 def error_handler(func: Callable):
+    """
+    Decorator for all the services
+
+    Fails fast while the database is unavailable, recovers the handler on
+    database errors and records the latency, rows and errors of every call in `query_stats`
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @wraps(func)
     def wrapper(*args):
         if not args or not isinstance(args[0], DatabaseHandler):
             raise JosixDatabaseException("The service must have at least one argument from the type DatabaseHandler")
 
+        args[0].ensure_connection()
+        args[0].depth += 1
+        start = perf_counter()
         try:
-            return func(*args)
+            res = func(*args)
         except psycopg2.Error as dbError:
-            args[0].conn.rollback()
+            query_stats.record(name, (perf_counter() - start) * 1000, args, failed=True)
+            args[0].recover()
             raise dbError
         except Exception as commonError:
+            query_stats.record(name, (perf_counter() - start) * 1000, args, failed=True)
             raise commonError
+        finally:
+            args[0].depth -= 1
+
+        query_stats.record(name, (perf_counter() - start) * 1000, args, res)
+        return res
+    return wrapper
+
+
+def read_handler(func: Callable):
+    """
+    Decorator for the services that only read data
+
+    Works like `error_handler` but closes the transaction opened by the query
+    once the rows are fetched, so the connection does not stay idle in transaction.
+    When the service is called inside a pending write, the transaction is left untouched.
+    """
+    @error_handler
+    @wraps(func)
+    def wrapper(*args):
+        conn = args[0].conn
+        standalone = conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+        res = func(*args)
+        if standalone:
+            conn.commit()
+        return res
+    return wrapper
+
+
+def replica_handler(func: Callable):
+    """
+    Decorator for the heavy read services that can run on the read replica
+
+    Works like `read_handler`, the service must run its query on `handler.read_cursor()`.
+    When the query fails on the replica, the service is called again on the primary,
+    even if the replica is still reachable (e.g. a query cancelled by a conflict with recovery)
+    """
+    @read_handler
+    @wraps(func)
+    def wrapper(*args):
+        handler = args[0]
+        try:
+            return func(*args)
+        except psycopg2.Error as dbError:
+            if not handler.replica_error():
+                raise dbError
+
+        handler.force_primary = True
+        try:
+            return func(*args)
+        finally:
+            handler.force_primary = False
     return wrapper
 
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class UserDB:
     """Dataclass that represents a User in the database"""
     id: int
@@ -33,7 +101,7 @@ class UserDB:
     hbDate: date
     pingUser: bool
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class GuildDB:
     """Dataclass that represents a Guild in the database"""
     id: int
@@ -45,11 +113,26 @@ class GuildDB:
     wRole: int
     wText: str
     logNews: int
-    blockedCat: list[int]
+    blockedCat: tuple[int, ...]
     tempSeasonActive: bool
     endTempSeason: datetime
 
-@dataclass()
+    def __post_init__(self) -> None:
+        # Immutable, the rows are shared by the cache
+        object.__setattr__(self, "blockedCat", tuple(self.blockedCat or ()))
+
+@dataclass(frozen=True, slots=True)
+class GuildXP:
+    """Dataclass that represents the xp settings of a Guild in the database"""
+    id: int
+    xpNews: int
+    enableXp: bool
+    blockedCat: tuple[int, ...]
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "blockedCat", tuple(self.blockedCat or ()))
+
+@dataclass(frozen=True, slots=True)
 class LinkUserGuild:
     """Dataclass that represents a link between a User and a Guild in the database"""
     idUser: int
@@ -59,32 +142,35 @@ class LinkUserGuild:
     lastMessage: datetime
     isUserBlocked: bool
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class MsgReact:
     """Dataclass that represents a Reaction Message of a guild in the database"""
     id: int
     idGuild: int
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class ReactCouple:
     """Dataclass that represents a Reaction couple of emoji and role in the database"""
     id: int
     emoji: str
     idRole: int
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class LogSelection:
     """Dataclass that represents a Log Selection of a guild in the database"""
     idGuild: int
-    logs: list[int]
+    logs: tuple[int, ...]
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "logs", tuple(self.logs))
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class GameType:
     """Dataclass that represents a Type of Game in the database"""
     id: int
     name: str
     
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class Game:
     """Dataclass that represents a Game in the database"""
     id: int
@@ -92,7 +178,7 @@ class Game:
     idUser: int
     opponent: int
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class BirthdayAuto:
     """Dataclass that represents data retrieved from the database for automatic birthday reminder"""
     idUser: int
@@ -100,14 +186,14 @@ class BirthdayAuto:
     day: int
     month: int
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class Birthday:
     """Dataclass that represent the birthday of a user"""
     idUser: int
     day: int
     month: int
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class Season:
     """Dataclass that represents a XP season"""
     idSeason: int
@@ -116,7 +202,7 @@ class Season:
     ended_at: datetime
     temporary: bool
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class UserScore:
     """Dataclass that represents a score obtained for a user in a season"""
     idUser: int
@@ -125,10 +211,103 @@ class UserScore:
     ranking: int
     label: str
 
-@dataclass()
+@dataclass(frozen=True, slots=True)
 class Score:
     """Dataclass that represents a simple score"""
     idUser: int
     idSeason: int
     score: int
-    ranking: int
\ No newline at end of file
+    ranking: int
+
+@dataclass(frozen=True, slots=True)
+class PollDB:
+    """Dataclass that represents a Poll in the database"""
+    id: int
+    idGuild: int
+    idChannel: int
+    title: str
+    content: str
+    choices: list[str]
+    closed: bool
+
+
+# Columns selected for the row types mapped on a table, in the order of the fields
+ROW_COLUMNS: dict[type, tuple[str, tuple[str, ...]]] = {
+    UserDB: ("User", ("idUser", "elo", "nbGames", "hbDate", "pingUser")),
+    GuildDB: ("Guild", (
+        "idGuild", "chanNews", "xpNews", "enableXP", "enableWelcome", "welcomeChan",
+        "welcomeRole", "welcomeText", "logNews", "blockedCategories", "tempSeasonActive", "endTempSeason"
+    )),
+    GuildXP: ("Guild", ("idGuild", "xpNews", "enableXP", "blockedCategories")),
+    LinkUserGuild: ("UserGuild", ("idUser", "idGuild", "xp", "lvl", "lastMessage", "xpBlocked")),
+    MsgReact: ("MsgReact", ("idMsg", "idGuild")),
+    ReactCouple: ("ReactCouple", ("idCouple", "emoji", "idRole")),
+    GameType: ("GameType", ("idType", "gameName")),
+    Game: ("Games", ("idGame", "idType", "idUser", "opponent")),
+    Season: ("Season", ("idSeason", "idGuild", "label", "ended_at", "temporary")),
+    Score: ("Score", ("idUser", "idSeason", "score", "ranking")),
+    PollDB: ("Poll", ("idMsg", "idGuild", "idChannel", "title", "content", "choices", "closed")),
+}
+
+_PG_TYPES: dict[object, tuple[str, ...]] = {
+    int: ("smallint", "integer", "bigint"),
+    bool: ("boolean",),
+    str: ("character varying", "text"),
+    date: ("date",),
+    datetime: ("timestamp without time zone", "timestamp with time zone"),
+    list[int]: ("ARRAY",),
+    tuple[int, ...]: ("ARRAY",),
+    list[str]: ("ARRAY",),
+}
+
+
+def select_columns(row_type: type, alias: str = "") -> str:
+    """
+    Get the column list to select for a row type
+
+    Parameters
+    ----------
+    row_type : type
+        A dataclass registered in `ROW_COLUMNS`
+    alias : str
+        Alias of the table in the query, if any
+
+    Returns
+    -------
+    str
+        The columns separated by commas
+    """
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + column for column in ROW_COLUMNS[row_type][1])
+
+
+@read_handler
+def check_row_types(handler: DatabaseHandler) -> None:
+    """
+    Compare the row types with the columns of the josix schema
+
+    Raises a JosixDatabaseException listing every field that does not match
+    an existing column of a compatible type
+    """
+    query = """SELECT LOWER(table_name), LOWER(column_name), data_type
+                FROM information_schema.columns
+                WHERE table_schema = 'josix';"""
+    handler.cursor.execute(query)
+    columns = {(row[0], row[1]): row[2] for row in handler.cursor.fetchall()}
+
+    errors = []
+    for row_type, (table, names) in ROW_COLUMNS.items():
+        row_fields = fields(row_type)
+        if len(row_fields) != len(names):
+            errors.append(f"{row_type.__name__} has {len(row_fields)} fields for {len(names)} columns")
+            continue
+
+        for field, name in zip(row_fields, names):
+            data_type = columns.get((table.lower(), name.lower()))
+            if data_type is None:
+                errors.append(f"{row_type.__name__}.{field.name} : no column josix.{table}.{name}")
+            elif data_type not in _PG_TYPES.get(field.type, (data_type,)):
+                errors.append(f"{row_type.__name__}.{field.name} : {field.type} does not match {data_type}")
+
+    if errors:
+        raise JosixDatabaseException("Row types do not match the database : " + ", ".join(errors))
@@ -0,0 +1,95 @@
+import os
+from collections import deque
+from dataclasses import dataclass, field
+
+import pkg.logwrite as log
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "250"))
+SAMPLES_SIZE = 2048
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """
+    Dataclass that represents the statistics of a service function since startup
+
+    Only the last `SAMPLES_SIZE` durations are kept to compute the percentiles
+    """
+    name: str
+    count: int = 0
+    errors: int = 0
+    rows: int = 0
+    total: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=SAMPLES_SIZE))
+
+    def percentile(self, percent: float) -> float:
+        """Get the percentile of the recent durations in milliseconds"""
+        if not self.samples:
+            return 0.0
+
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+_STATS: dict[str, QueryStats] = {}
+
+
+def _count_rows(result: object) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def record(name: str, duration: float, args: tuple, result: object = None, failed: bool = False) -> None:
+    """
+    Record a call of a service function
+
+    Calls slower than `SLOW_QUERY_MS` are written in the slow query log.
+    Only the types of the parameters are written, never their values
+
+    Parameters
+    ----------
+    name : str
+        Name of the service function
+    duration : float
+        Duration of the call in milliseconds
+    args : tuple
+        Arguments given to the service, the handler included
+    result : object
+        Value returned by the service
+    failed : bool
+        Whether the call raised an exception
+    """
+    stats = _STATS.get(name)
+    if stats is None:
+        stats = _STATS[name] = QueryStats(name)
+
+    stats.count += 1
+    stats.total += duration
+    stats.samples.append(duration)
+    if failed:
+        stats.errors += 1
+    else:
+        stats.rows += _count_rows(result)
+
+    if duration >= SLOW_QUERY_MS:
+        params = ", ".join(type(arg).__name__ for arg in args[1:])
+        log.writeSlowQuery(f"{name}({params}) took {duration:.1f} ms" + (" and failed" if failed else ""))
+
+
+def get_stats() -> list[QueryStats]:
+    """Get the statistics of all the service functions called since startup"""
+    return list(_STATS.values())
+
+
+def top_slowest(limit: int) -> list[QueryStats]:
+    """Get the service functions with the highest p95 latency"""
+    return sorted(_STATS.values(), key=lambda stats: stats.percentile(95), reverse=True)[:limit]
+
+
+def top_frequent(limit: int) -> list[QueryStats]:
+    """Get the most called service functions"""
+    return sorted(_STATS.values(), key=lambda stats: stats.count, reverse=True)[:limit]
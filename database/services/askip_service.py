@@ -0,0 +1,70 @@
+from database import cache
+from database.database import DatabaseHandler
+from database.db_utils import error_handler, read_handler
+
+_GET_ASKIP = DatabaseHandler.register_statement(
+    "josix_get_askip",
+    "SELECT content FROM josix.Askip WHERE username = $1 AND askipName = $2"
+)
+_GET_ASKIP_NAMES = DatabaseHandler.register_statement(
+    "josix_get_askip_names",
+    "SELECT askipName FROM josix.Askip WHERE username = $1 ORDER BY askipName"
+)
+
+_ASKIP_USERS_CACHE = cache.TableCache("askip users", ("askip",))
+_ASKIP_NAMES_CACHE = cache.TableCache("askip names", ("askip",))
+_ASKIP_CACHE = cache.TableCache("askip", ("askip",))
+
+
+@cache.cached(_ASKIP_USERS_CACHE)
+@read_handler
+def get_askip_users(handler: DatabaseHandler) -> tuple[str, ...]:
+    query = "SELECT DISTINCT username FROM josix.Askip ORDER BY username;"
+    handler.cursor.execute(query)
+    return tuple(row[0] for row in handler.cursor.fetchall())
+
+
+@cache.cached(_ASKIP_NAMES_CACHE)
+@read_handler
+def get_askip_names(handler: DatabaseHandler, username: str) -> tuple[str, ...]:
+    handler.execute_prepared(_GET_ASKIP_NAMES, (username,))
+    return tuple(row[0] for row in handler.cursor.fetchall())
+
+
+@cache.cached(_ASKIP_CACHE)
+@read_handler
+def get_askip(handler: DatabaseHandler, username: str, askip_name: str) -> str | None:
+    handler.execute_prepared(_GET_ASKIP, (username, askip_name))
+    res = handler.cursor.fetchone()
+    if res:
+        return res[0]
+    return None
+
+
+@error_handler
+def add_askip(handler: DatabaseHandler, username: str, askip_name: str, content: str) -> bool:
+    """Add an askip, returns False if the user already has an askip with this name"""
+    query = """INSERT INTO josix.Askip(username, askipName, content)
+                VALUES(%s, %s, %s)
+                ON CONFLICT DO NOTHING
+                RETURNING username;"""
+    handler.cursor.execute(query, (username, askip_name, content))
+    added = handler.cursor.fetchone() is not None
+    handler.conn.commit()
+    cache.invalidate("askip")
+    return added
+
+
+@error_handler
+def import_askips(handler: DatabaseHandler, askips: list[tuple[str, str, str]]) -> int:
+    """Add the askips (username, name, content) in one transaction, the existing ones are kept"""
+    query = """INSERT INTO josix.Askip(username, askipName, content)
+                VALUES(%s, %s, %s)
+                ON CONFLICT DO NOTHING;"""
+    count = 0
+    for askip in askips:
+        handler.cursor.execute(query, askip)
+        count += handler.cursor.rowcount
+    handler.conn.commit()
+    cache.invalidate("askip")
+    return count
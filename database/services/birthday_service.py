@@ -3,10 +3,11 @@ from database.db_utils import (
     Birthday,
     BirthdayAuto,
     error_handler,
+    replica_handler,
 )
 
 
-@error_handler
+@replica_handler
 def check_birthday(handler: DatabaseHandler, day: int, month: int) -> list[BirthdayAuto] | None:
     query = """SELECT u.idUser AS "user", ug.idGuild as "guild",
                         EXTRACT(DAY FROM u.hbDate) AS "day",
@@ -16,21 +17,23 @@ def check_birthday(handler: DatabaseHandler, day: int, month: int) -> list[Birth
                         EXTRACT(DAY FROM u.hbDate) = %s AND
                         EXTRACT(MONTH FROM u.hbDate) = %s;"""
     params = (day, month)
-    handler.cursor.execute(query, params)
-    res = handler.cursor.fetchall()
+    cursor = handler.read_cursor()
+    cursor.execute(query, params)
+    res = cursor.fetchall()
     if res:
         return [BirthdayAuto(*row) for row in res]
     return None
 
 
-@error_handler
+@replica_handler
 def get_birthday_month(handler: DatabaseHandler, id_guild: int, month: int) -> list[Birthday] | None:
     query = """SELECT u.idUser, EXTRACT(DAY FROM u.hbDate), EXTRACT(MONTH FROM u.hbDate)
                 FROM josix.User u INNER JOIN josix.UserGuild ug ON u.idUser = ug.idUser
                 WHERE ug.idGuild = %s AND EXTRACT(MONTH FROM u.hbDate) = %s
                 ORDER BY EXTRACT(DAY FROM u.hbDate), EXTRACT(MONTH FROM u.hbDate);"""
-    handler.cursor.execute(query, (id_guild, month))
-    res = handler.cursor.fetchall()
+    cursor = handler.read_cursor()
+    cursor.execute(query, (id_guild, month))
+    res = cursor.fetchall()
     if res:
         return [Birthday(*row) for row in res]
     return None
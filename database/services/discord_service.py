@@ -1,16 +1,40 @@
+from database import cache
 from database.database import DatabaseHandler
 from database.db_utils import (
     GuildDB,
+    GuildXP,
     LinkUserGuild,
     UserDB,
     error_handler,
+    read_handler,
+    select_columns,
 )
 
+_GET_GUILD = DatabaseHandler.register_statement(
+    "josix_get_guild",
+    f"SELECT {select_columns(GuildDB)} FROM josix.Guild WHERE idGuild = $1"
+)
+_GET_GUILD_XP = DatabaseHandler.register_statement(
+    "josix_get_guild_xp",
+    f"SELECT {select_columns(GuildXP)} FROM josix.Guild WHERE idGuild = $1"
+)
+_GET_USER = DatabaseHandler.register_statement(
+    "josix_get_user",
+    f"SELECT {select_columns(UserDB)} FROM josix.User WHERE idUser = $1"
+)
+_GET_USER_IN_GUILD = DatabaseHandler.register_statement(
+    "josix_get_user_in_guild",
+    f"SELECT {select_columns(LinkUserGuild)} FROM josix.UserGuild WHERE idUser = $1 AND idGuild = $2"
+)
 
-@error_handler
+_GUILD_CACHE = cache.TableCache("guild", ("guild",))
+_GUILD_XP_CACHE = cache.TableCache("guild xp", ("guild",))
+
+
+@cache.cached(_GUILD_CACHE)
+@read_handler
 def get_guild(handler: DatabaseHandler, id_guild: int) -> GuildDB | None:
-    query = "SELECT * FROM josix.Guild WHERE idGuild = %s;"
-    handler.cursor.execute(query, (id_guild,))
+    handler.execute_prepared(_GET_GUILD, (id_guild,))
     res = handler.cursor.fetchone()
 
     if res:
@@ -18,10 +42,20 @@ def get_guild(handler: DatabaseHandler, id_guild: int) -> GuildDB | None:
     return None
 
 
-@error_handler
+@cache.cached(_GUILD_XP_CACHE)
+@read_handler
+def get_guild_xp(handler: DatabaseHandler, id_guild: int) -> GuildXP | None:
+    handler.execute_prepared(_GET_GUILD_XP, (id_guild,))
+    res = handler.cursor.fetchone()
+
+    if res:
+        return GuildXP(*res)
+    return None
+
+
+@read_handler
 def get_user(handler: DatabaseHandler, id_user: int) -> UserDB | None:
-    query = "SELECT * FROM josix.User WHERE idUser = %s;"
-    handler.cursor.execute(query, (id_user,))
+    handler.execute_prepared(_GET_USER, (id_user,))
     res = handler.cursor.fetchone()
 
     if res:
@@ -29,12 +63,10 @@ def get_user(handler: DatabaseHandler, id_user: int) -> UserDB | None:
     return None
 
 
-@error_handler
+@read_handler
 def get_user_in_guild(handler: DatabaseHandler, id_user: int, id_guild: int) -> LinkUserGuild | None:
-    query = """SELECT * FROM josix.UserGuild
-                WHERE idUser = %s AND idGuild  = %s;"""
     params = (id_user, id_guild)
-    handler.cursor.execute(query, params)
+    handler.execute_prepared(_GET_USER_IN_GUILD, params)
     res = handler.cursor.fetchone()
 
     if res:
@@ -57,6 +89,7 @@ def add_guild(handler: DatabaseHandler, id_guild: int, id_chan_stat: int = 0, id
     params = (id_guild, id_chan_stat, id_chan_xp)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -90,4 +123,25 @@ def fetch_user_guild_relationship(handler: DatabaseHandler, id_user: int, id_gui
     if not userGuildDB:
         add_user_in_guild(handler, id_user, id_guild)
         userGuildDB = get_user_in_guild(handler, id_user, id_guild)
-    return userDB, guildDB, userGuildDB
\ No newline at end of file
+    return userDB, guildDB, userGuildDB
+
+
+@error_handler
+def fetch_user_guild_xp(handler: DatabaseHandler, id_user: int, id_guild: int) -> tuple[UserDB | None, GuildXP | None, LinkUserGuild | None]:
+    """
+    Same as `fetch_user_guild_relationship` but only retrieves the xp settings of the guild
+    """
+    userDB = get_user(handler, id_user)
+    guildXP = get_guild_xp(handler, id_guild)
+    userGuildDB = get_user_in_guild(handler, id_user, id_guild)
+
+    if not userDB:
+        add_user(handler, id_user)
+        userDB = get_user(handler, id_user)
+    if not guildXP:
+        add_guild(handler, id_guild)
+        guildXP = get_guild_xp(handler, id_guild)
+    if not userGuildDB:
+        add_user_in_guild(handler, id_user, id_guild)
+        userGuildDB = get_user_in_guild(handler, id_user, id_guild)
+    return userDB, guildXP, userGuildDB
@@ -1,12 +1,18 @@
 import discord
 
 from database.database import DatabaseHandler
-from database.db_utils import Game, GameType, error_handler
+from database.db_utils import (
+    Game,
+    GameType,
+    error_handler,
+    read_handler,
+    select_columns,
+)
 
 
-@error_handler
+@read_handler
 def get_game_from_user(handler: DatabaseHandler, id_user: int) -> Game | None:
-    query = "SELECT * FROM josix.Games WHERE idUser = %s OR opponent = %s;"
+    query = f"SELECT {select_columns(Game)} FROM josix.Games WHERE idUser = %s OR opponent = %s;"
     handler.cursor.execute(query, (id_user, id_user))
     res = handler.cursor.fetchone()
 
@@ -15,9 +21,9 @@ def get_game_from_user(handler: DatabaseHandler, id_user: int) -> Game | None:
     return None
 
 
-@error_handler
+@read_handler
 def get_game_type(handler: DatabaseHandler, game_name: str) -> GameType | None:
-    query = "SELECT * FROM josix.GameType WHERE gameName = %s;"
+    query = f"SELECT {select_columns(GameType)} FROM josix.GameType WHERE gameName = %s;"
     handler.cursor.execute(query, (game_name,))
     res = handler.cursor.fetchone()
 
@@ -26,10 +32,10 @@ def get_game_type(handler: DatabaseHandler, game_name: str) -> GameType | None:
     return None
 
 
-@error_handler
+@read_handler
 def get_existing_game(handler: DatabaseHandler, id_game: int, id_user: int) -> Game | None:
     """May seems weird but its to ensure a player is in this specific game"""
-    query = """SELECT * FROM josix.Games
+    query = f"""SELECT {select_columns(Game)} FROM josix.Games
                 WHERE idGame = %s AND (idUser = %s OR opponent = %s);"""
     params = (id_game, id_user, id_user)
     handler.cursor.execute(query, params)
@@ -91,7 +97,7 @@ def delete_games(handler: DatabaseHandler) -> None:
 
 # old dart system. Not updated
 
-@error_handler
+@read_handler
 def getPlayerStat(handler: DatabaseHandler, id_user: int) -> tuple[int, int] | None:
     query = "SELECT elo, nbGames FROM josix.User WHERE idUser = %s;"
     handler.cursor.execute(query, (id_user,))
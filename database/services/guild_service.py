@@ -1,10 +1,11 @@
 from datetime import datetime
 
+from database import cache
 from database.database import DatabaseHandler
-from database.db_utils import error_handler
+from database.db_utils import error_handler, read_handler
 
 
-@error_handler
+@read_handler
 def get_news_chan_from_user(handler: DatabaseHandler, id_user: int) -> list[int] | None:
     query = """SELECT chanNews 
                 FROM josix.Guild g INNER JOIN josix.UserGuild ug ON g.idGuild = ug.idGuild
@@ -24,6 +25,7 @@ def update_news_channel(handler: DatabaseHandler, id_guild: int, id_chan: int) -
     params = (id_chan, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -42,6 +44,7 @@ def update_welcome(handler: DatabaseHandler, id_guild: int, id_chan: int | None,
     params = (id_chan, id_role, message, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -51,6 +54,7 @@ def switch_welcome_enabling(handler: DatabaseHandler, id_guild: int) -> None:
                 WHERE idGuild = %s"""
     handler.cursor.execute(query, (id_guild,))
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -61,4 +65,5 @@ def start_temporary_season(handler: DatabaseHandler, id_guild: int, end: datetim
                WHERE idGuild = %s"""
     params = (end, id_guild)
     handler.cursor.execute(query, params)
-    handler.conn.commit()
\ No newline at end of file
+    handler.conn.commit()
+    cache.invalidate("guild", id_guild)
\ No newline at end of file
@@ -1,17 +1,25 @@
+from database import cache
 from database.database import DatabaseHandler
-from database.db_utils import LogSelection, error_handler
+from database.db_utils import LogSelection, error_handler, read_handler
 
+_GET_LOGS_SELECTION = DatabaseHandler.register_statement(
+    "josix_get_logs_selection",
+    "SELECT idLog FROM josix.LogSelector WHERE idGuild = $1 ORDER BY idLog"
+)
 
-@error_handler
+_LOGS_SELECTION_CACHE = cache.TableCache("logs selection", ("logselector",))
+
+
+@cache.cached(_LOGS_SELECTION_CACHE)
+@read_handler
 def get_logs_selection(handler: DatabaseHandler, id_guild: int) -> LogSelection | None:
-    query = "SELECT * FROM josix.LogSelector WHERE idGuild = %s ORDER BY idLog;"
-    handler.cursor.execute(query, (id_guild,))
+    handler.execute_prepared(_GET_LOGS_SELECTION, (id_guild,))
     res = handler.cursor.fetchall()
 
     if res:
         logs = []
         for row in res:
-            logs.append(row[1])
+            logs.append(row[0])
         return LogSelection(id_guild, logs)
     return None
 
@@ -27,6 +35,7 @@ def update_logs_selection(handler: DatabaseHandler, id_guild: int, logs: list[in
             query = "DELETE FROM josix.LogSelector WHERE idGuild = %s AND idLog = %s;"
         handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("logselector", id_guild)
 
 
 @error_handler
@@ -44,3 +53,4 @@ def update_log_channel(handler: DatabaseHandler, id_guild: int, id_chan: int | N
     params = (id_chan, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
@@ -0,0 +1,68 @@
+from database.database import DatabaseHandler
+from database.db_utils import PollDB, error_handler, read_handler, select_columns
+
+
+@read_handler
+def get_poll(handler: DatabaseHandler, id_msg: int) -> PollDB | None:
+    query = f"SELECT {select_columns(PollDB)} FROM josix.Poll WHERE idMsg = %s;"
+    handler.cursor.execute(query, (id_msg,))
+    res = handler.cursor.fetchone()
+    if res:
+        return PollDB(*res)
+    return None
+
+
+@read_handler
+def get_open_polls(handler: DatabaseHandler) -> list[PollDB]:
+    query = f"SELECT {select_columns(PollDB)} FROM josix.Poll WHERE NOT closed;"
+    handler.cursor.execute(query)
+    return [PollDB(*row) for row in handler.cursor.fetchall()]
+
+
+@read_handler
+def get_poll_votes(handler: DatabaseHandler, id_msg: int) -> dict[int, int]:
+    """Get the choice of each user that voted, by user id"""
+    query = "SELECT idUser, choice FROM josix.PollVote WHERE idMsg = %s;"
+    handler.cursor.execute(query, (id_msg,))
+    return {row[0]: row[1] for row in handler.cursor.fetchall()}
+
+
+@error_handler
+def add_poll(
+        handler: DatabaseHandler,
+        id_msg: int,
+        id_guild: int,
+        id_channel: int,
+        title: str,
+        content: str,
+        choices: list[str]
+) -> None:
+    query = """INSERT INTO josix.Poll(idMsg, idGuild, idChannel, title, content, choices)
+                VALUES(%s, %s, %s, %s, %s, %s);"""
+    handler.cursor.execute(query, (id_msg, id_guild, id_channel, title, content, choices))
+    handler.conn.commit()
+
+
+@error_handler
+def save_poll_votes(handler: DatabaseHandler, votes: list[tuple[int, int, int | None]]) -> None:
+    """
+    Save the votes (message id, user id, choice) in one transaction,
+    a choice None removes the vote of the user
+    """
+    upsert = """INSERT INTO josix.PollVote(idMsg, idUser, choice)
+                VALUES(%s, %s, %s)
+                ON CONFLICT (idMsg, idUser) DO UPDATE SET choice = EXCLUDED.choice;"""
+    delete = "DELETE FROM josix.PollVote WHERE idMsg = %s AND idUser = %s;"
+    for idMsg, idUser, choice in votes:
+        if choice is None:
+            handler.cursor.execute(delete, (idMsg, idUser))
+        else:
+            handler.cursor.execute(upsert, (idMsg, idUser, choice))
+    handler.conn.commit()
+
+
+@error_handler
+def close_poll(handler: DatabaseHandler, id_msg: int) -> None:
+    query = "UPDATE josix.Poll SET closed = TRUE WHERE idMsg = %s;"
+    handler.cursor.execute(query, (id_msg,))
+    handler.conn.commit()
@@ -1,16 +1,33 @@
+from database import cache
 from database.database import DatabaseHandler
 from database.db_utils import (
     MsgReact,
     ReactCouple,
     error_handler,
+    read_handler,
+    select_columns,
 )
 from pkg.bot_utils import JosixDatabaseException
 
+_GET_REACTION_MESSAGE = DatabaseHandler.register_statement(
+    "josix_get_reaction_message",
+    f"SELECT {select_columns(MsgReact)} FROM josix.MsgReact WHERE idMsg = $1"
+)
+_GET_ROLE_FROM_REACTION = DatabaseHandler.register_statement(
+    "josix_get_role_from_reaction",
+    """SELECT idRole FROM josix.ReactCouple rc
+        INNER JOIN josix.MsgCouple mc ON rc.idCouple = mc.idCouple
+        WHERE mc.idMsg = $1 AND rc.emoji = $2"""
+)
 
-@error_handler
+_REACTION_MESSAGE_CACHE = cache.TableCache("reaction message", ("msgreact",))
+_ROLE_CACHE = cache.TableCache("reaction role", ("msgreact", "msgcouple", "reactcouple"))
+
+
+@cache.cached(_REACTION_MESSAGE_CACHE)
+@read_handler
 def get_reaction_message(handler: DatabaseHandler, id_msg: int) -> MsgReact | None:
-    query = "SELECT * FROM josix.Msgreact WHERE idMsg = %s;"
-    handler.cursor.execute(query, (id_msg,))
+    handler.execute_prepared(_GET_REACTION_MESSAGE, (id_msg,))
     res = handler.cursor.fetchone()
 
     if res:
@@ -18,22 +35,20 @@ def get_reaction_message(handler: DatabaseHandler, id_msg: int) -> MsgReact | No
     return None
 
 
-@error_handler
+@cache.cached(_ROLE_CACHE)
+@read_handler
 def get_role_from_reaction(handler: DatabaseHandler, id_msg: int, emoji_name: str) -> int | None:
-    query = """SELECT idRole FROM josix.ReactCouple rc
-                INNER JOIN josix.MsgCouple mc ON rc.idCouple = mc.idCouple
-                WHERE mc.idMsg = %s AND rc.emoji = %s;"""
     params = (id_msg, emoji_name)
-    handler.cursor.execute(query, params)
+    handler.execute_prepared(_GET_ROLE_FROM_REACTION, params)
     res = handler.cursor.fetchone()
     if res:
         return res[0]
     return None
 
 
-@error_handler
+@read_handler
 def get_couples(handler: DatabaseHandler, id_msg: int | None = None) -> list[ReactCouple] | None:
-    query = """SELECT rc.idCouple, rc.emoji, rc.idRole FROM josix.ReactCouple rc
+    query = f"""SELECT {select_columns(ReactCouple, "rc")} FROM josix.ReactCouple rc
                 INNER JOIN josix.MsgCouple mc ON rc.idCouple = mc.idCouple
                 WHERE mc.idMsg = %s;"""
     params = (id_msg,)
@@ -44,9 +59,9 @@ def get_couples(handler: DatabaseHandler, id_msg: int | None = None) -> list[Rea
     return None
 
 
-@error_handler
+@read_handler
 def get_couple_from_role(handler: DatabaseHandler, id_role: int) -> list[ReactCouple] | None:
-    query = "SELECT * FROM josix.ReactCouple WHERE idRole = %s;"
+    query = f"SELECT {select_columns(ReactCouple)} FROM josix.ReactCouple WHERE idRole = %s;"
     handler.cursor.execute(query, (id_role,))
     res = handler.cursor.fetchone()
     if res:
@@ -73,6 +88,7 @@ def add_couple(handler: DatabaseHandler, couple: tuple, id_msg: int) -> None:
     params = (id_msg, idCouple)
     handler.cursor.execute(query2, params)
     handler.conn.commit()
+    cache.invalidate("msgcouple", id_msg)
 
 
 @error_handler
@@ -81,6 +97,7 @@ def add_message_react(handler: DatabaseHandler, id_guild: int, id_msg: int) -> N
     params = (id_msg, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("msgreact", id_msg)
 
 
 @error_handler
@@ -90,6 +107,7 @@ def delete_message_react(handler: DatabaseHandler, id_msg: int) -> None:
     handler.cursor.execute(query, (id_msg,))
     handler.cursor.execute(query2, (id_msg,))
     handler.conn.commit()
+    cache.invalidate("msgreact", id_msg)
 
 
 @error_handler
@@ -99,6 +117,7 @@ def delete_reaction_couple(handler: DatabaseHandler, id_couple: int) -> None:
     handler.cursor.execute(query, (id_couple,))
     handler.cursor.execute(query2, (id_couple,))
     handler.conn.commit()
+    cache.invalidate("reactcouple")
 
 
 @error_handler
@@ -106,4 +125,5 @@ def delete_message_couple(handler: DatabaseHandler, id_msg: int, id_couple: int)
     query = "DELETE FROM josix.MsgCouple WHERE idMsg = %s AND idCouple = %s;"
     params = (id_msg, id_couple)
     handler.cursor.execute(query, params)
-    handler.conn.commit()
\ No newline at end of file
+    handler.conn.commit()
+    cache.invalidate("msgcouple", id_msg)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from database import cache
 from database.database import DatabaseHandler
 from database.db_utils import (
     GuildDB,
@@ -7,15 +8,18 @@ from database.db_utils import (
     Season,
     UserScore,
     error_handler,
+    read_handler,
+    replica_handler,
+    select_columns,
 )
 from database.services.discord_service import get_link_user_guild
 from database.services.guild_service import start_temporary_season
 from database.services.xp_service import clean_xp_guild_soft, get_leaderboard
 
 
-@error_handler
+@read_handler
 def get_season_by_label(handler: DatabaseHandler, id_guild: int, label: str) -> Season | None:
-    query = "SELECT * FROM josix.Season WHERE idGuild = %s AND LOWER(label) = LOWER(%s);"
+    query = f"SELECT {select_columns(Season)} FROM josix.Season WHERE idGuild = %s AND LOWER(label) = LOWER(%s);"
     params = (id_guild, label)
     handler.cursor.execute(query, params)
     res = handler.cursor.fetchone()
@@ -24,7 +28,7 @@ def get_season_by_label(handler: DatabaseHandler, id_guild: int, label: str) ->
     return None
 
 
-@error_handler
+@read_handler
 def get_new_season_id(handler: DatabaseHandler, id_guild: int) -> int:
     query = "SELECT COUNT(idSeason) FROM josix.Season WHERE idGuild = %s;"
     handler.cursor.execute(query, (id_guild,))
@@ -36,9 +40,9 @@ def get_new_season_id(handler: DatabaseHandler, id_guild: int) -> int:
     return newLabelID
 
 
-@error_handler
+@read_handler
 def get_season(handler: DatabaseHandler, id_season: int) -> Season | None:
-    query = "SELECT * FROM josix.Season WHERE idSeason = %s;"
+    query = f"SELECT {select_columns(Season)} FROM josix.Season WHERE idSeason = %s;"
     handler.cursor.execute(query, (id_season,))
     res = handler.cursor.fetchone()
     if res:
@@ -46,9 +50,9 @@ def get_season(handler: DatabaseHandler, id_season: int) -> Season | None:
     return None
 
 
-@error_handler
+@read_handler
 def get_seasons(handler: DatabaseHandler, id_guild: int, limit: int) -> list[Season] | None:
-    query = "SELECT * FROM josix.Season WHERE idGuild = %s ORDER BY idSeason DESC LIMIT %s;"
+    query = f"SELECT {select_columns(Season)} FROM josix.Season WHERE idGuild = %s ORDER BY idSeason DESC LIMIT %s;"
     params = (id_guild, limit)
     handler.cursor.execute(query, params)
     res = handler.cursor.fetchall()
@@ -58,7 +62,7 @@ def get_seasons(handler: DatabaseHandler, id_guild: int, limit: int) -> list[Sea
     return None
 
 
-@error_handler
+@replica_handler
 def get_user_history(handler: DatabaseHandler, id_guild: int, id_user: int) -> list[UserScore] | None:
     query = """
             SELECT sc.idUser, sc.idSeason, sc.score, sc.ranking, se.label
@@ -66,28 +70,30 @@ def get_user_history(handler: DatabaseHandler, id_guild: int, id_user: int) -> l
             WHERE sc.idUser = %s AND se.idGuild = %s ORDER BY sc.idSeason DESC;
             """
     params = (id_user, id_guild)
-    handler.cursor.execute(query, params)
-    res = handler.cursor.fetchall()
+    cursor = handler.read_cursor()
+    cursor.execute(query, params)
+    res = cursor.fetchall()
 
     if res:
         return [UserScore(*score) for score in res]
     return None
 
 
-@error_handler
+@replica_handler
 def get_scores(handler: DatabaseHandler, id_season: int) -> list[Score] | None:
-    query = """SELECT * FROM josix.Score WHERE idSeason = %s ORDER BY ranking;"""
-    handler.cursor.execute(query, (id_season,))
-    res = handler.cursor.fetchall()
+    query = f"SELECT {select_columns(Score)} FROM josix.Score WHERE idSeason = %s ORDER BY ranking;"
+    cursor = handler.read_cursor()
+    cursor.execute(query, (id_season,))
+    res = cursor.fetchall()
     
     if res:
         return [Score(*score) for score in res]
     return None
 
 
-@error_handler
+@read_handler
 def get_user_score(handler: DatabaseHandler, id_season: int, id_user: int) -> Score | None:
-    query = "SELECT * FROM josix.Score WHERE idSeason = %s AND idUser = %s;"
+    query = f"SELECT {select_columns(Score)} FROM josix.Score WHERE idSeason = %s AND idUser = %s;"
     params = (id_season, id_user)
     handler.cursor.execute(query, params)
     res = handler.cursor.fetchone()
@@ -171,9 +177,9 @@ def rebase_scores(handler: DatabaseHandler, season: Season) -> None:
     handler.conn.commit()
     delete_season(handler, season)
 
-@error_handler
+@read_handler
 def get_last_season(handler: DatabaseHandler, id_guild: int, temporary: bool) -> Season | None:
-    query = "SELECT * FROM josix.Season WHERE idGuild = %s AND temporary = %s ORDER BY ended_at DESC LIMIT 1;"
+    query = f"SELECT {select_columns(Season)} FROM josix.Season WHERE idGuild = %s AND temporary = %s ORDER BY ended_at DESC LIMIT 1;"
     params = (id_guild, temporary)
     handler.cursor.execute(query, params)
     res = handler.cursor.fetchone()
@@ -205,11 +211,12 @@ def stop_temporary_season(handler: DatabaseHandler, id_guild: int):
     query = "UPDATE josix.Guild SET tempSeasonActive = FALSE WHERE idGuild = %s;"
     handler.cursor.execute(query, (id_guild,))
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
-@error_handler
+@read_handler
 def get_guilds_ended_temporary(handler: DatabaseHandler) -> list[GuildDB] | None:
-    query = "SELECT * FROM josix.Guild WHERE tempSeasonActive = TRUE AND endTempSeason <= %s;"
+    query = f"SELECT {select_columns(GuildDB)} FROM josix.Guild WHERE tempSeasonActive = TRUE AND endTempSeason <= %s;"
     handler.cursor.execute(query, (datetime.now(),))
     res = handler.cursor.fetchall()
     if res:
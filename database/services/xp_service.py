@@ -1,24 +1,41 @@
 import datetime as dt
 
+from database import cache
 from database.database import DatabaseHandler
-from database.db_utils import LinkUserGuild, error_handler
+from database.db_utils import (
+    LinkUserGuild,
+    error_handler,
+    read_handler,
+    replica_handler,
+    select_columns,
+)
 
+_UPDATE_USER_XP = DatabaseHandler.register_statement(
+    "josix_update_user_xp",
+    """UPDATE josix.UserGuild
+        SET lvl = $1,
+            xp = $2,
+            lastMessage = $3
+        WHERE idUser = $4 AND idGuild = $5"""
+)
 
-@error_handler
+
+@replica_handler
 def get_leaderboard(handler: DatabaseHandler, id_guild: int, limit: int | None) -> list[LinkUserGuild] | None:
-    query = """SELECT * FROM josix.UserGuild
+    query = f"""SELECT {select_columns(LinkUserGuild)} FROM josix.UserGuild
                 WHERE idGuild = %s
                 ORDER BY xp DESC
                 LIMIT %s"""
     params = (id_guild, limit)
-    handler.cursor.execute(query, params)
-    res = handler.cursor.fetchall()
+    cursor = handler.read_cursor()
+    cursor.execute(query, params)
+    res = cursor.fetchall()
     if res:
         return [LinkUserGuild(*row) for row in res]
     return None
 
 
-@error_handler
+@replica_handler
 def get_all_time_leaderboard(handler: DatabaseHandler, id_guild, limit: int | None) -> list[LinkUserGuild] | None:
     query = """
 SELECT idUser, SUM(score)
@@ -36,14 +53,15 @@ ORDER BY 2 DESC
 LIMIT %s;
 """
     params = (id_guild, id_guild, limit)
-    handler.cursor.execute(query, params)
-    res = handler.cursor.fetchall()
+    cursor = handler.read_cursor()
+    cursor.execute(query, params)
+    res = cursor.fetchall()
     if res:
         return [LinkUserGuild(row[0], 0, row[1], 0, dt.datetime.now(), False) for row in res]
     return None
 
 
-@error_handler
+@read_handler
 def get_ranking(handler: DatabaseHandler, id_user: int, id_guild: int) -> int | None:
     query = """SELECT COUNT(DISTINCT idUser) + 1
                 FROM josix.UserGuild
@@ -59,13 +77,8 @@ def get_ranking(handler: DatabaseHandler, id_user: int, id_guild: int) -> int |
 
 @error_handler
 def update_user_xp(handler: DatabaseHandler, id_user: int, id_guild: int, lvl: int, xp: int, last_send: dt.datetime) -> None:
-    query = """UPDATE josix.UserGuild
-                SET lvl = %s,
-                    xp = %s,
-                    lastMessage = %s
-                WHERE idUser = %s AND idGuild = %s;"""
     params = (lvl, xp, last_send, id_user, id_guild)
-    handler.cursor.execute(query, params)
+    handler.execute_prepared(_UPDATE_USER_XP, params)
     handler.conn.commit()
 
 
@@ -77,6 +90,7 @@ def change_channel_xp(handler: DatabaseHandler, id_guild: int, id_chan: int) ->
     params = (id_chan, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -86,6 +100,7 @@ def switch_xp_enabling(handler: DatabaseHandler, id_guild: int) -> None:
                 WHERE idGuild = %s"""
     handler.cursor.execute(query, (id_guild,))
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -106,6 +121,7 @@ def block_category_xp(handler: DatabaseHandler, id_category: int, id_guild: int)
     params = (id_category, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -116,6 +132,7 @@ def unblock_category_xp(handler: DatabaseHandler, id_category: int, id_guild: in
     params = (id_category, id_guild)
     handler.cursor.execute(query, params)
     handler.conn.commit()
+    cache.invalidate("guild", id_guild)
 
 
 @error_handler
@@ -0,0 +1,219 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from time import perf_counter
+from typing import Callable
+
+import pkg.logwrite as log
+
+SPOOL_PATH = os.path.join(log.LOGS_PATH, os.getenv("XP_SPOOL", "xp_spool.jsonl"))
+SPOOL_MAX_BYTES = int(os.getenv("XP_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def spool_path(shard_label: str = "all") -> str:
+    """Path of the spool of a process, each process running a range of shards has its own file"""
+    if shard_label == "all":
+        return SPOOL_PATH
+
+    root, ext = os.path.splitext(SPOOL_PATH)
+    return f"{root}.{shard_label}{ext}"
+
+
+@dataclass(frozen=True, slots=True)
+class SpoolEntry:
+    """Dataclass that represents xp earned by a user while the database was unreachable"""
+    idUser: int
+    idGuild: int
+    xp: int
+    idCat: int
+    sentAt: str
+
+    @property
+    def time(self) -> datetime:
+        return datetime.fromisoformat(self.sentAt)
+
+
+class XPSpool:
+    """
+    Represents an append-only local file of the xp earned while the database is unreachable
+
+    The entries are buffered and written with a single fsync per batch.
+    They are replayed in order once the database is back, by slices so that a large
+    spool does not block the event loop. The replayed entries are removed from the file
+    once all of them are replayed or once they fill half of it, the replay function
+    must be idempotent since an entry can be replayed twice after a crash.
+    An entry that keeps failing is moved to a `.failed` file after `max_attempts` tries
+
+    Attributes
+    ----------
+    path : str
+        Path of the spool file
+    max_bytes : int
+        Size limit of the file, new entries are dropped beyond it
+    batch_size : int
+        Number of buffered entries that triggers a write
+    max_attempts : int
+        Number of failed replays after which an entry is moved to the `.failed` file
+    appended : int
+        Number of entries accepted since startup
+    dropped : int
+        Number of entries dropped because the spool was full
+    replayed : int
+        Number of entries replayed since startup
+    quarantined : int
+        Number of entries moved to the `.failed` file since startup
+    """
+
+    def __init__(
+            self,
+            path: str = SPOOL_PATH,
+            max_bytes: int = SPOOL_MAX_BYTES,
+            batch_size: int = 64,
+            max_attempts: int = 5
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._buffer: list[str] = []
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._offset = 0 # Bytes of the file already replayed
+        self._attempts = 0 # Failed replays of the entry at the offset
+
+        self.appended = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.quarantined = 0
+
+    @property
+    def pending(self) -> bool:
+        """Whether entries are waiting to be replayed"""
+        return bool(self._buffer) or self._size > self._offset
+
+    def append(self, id_user: int, id_guild: int, xp: int, id_cat: int, sent_at: datetime) -> bool:
+        """
+        Add xp earned by a user in the spool
+
+        Returns
+        -------
+        bool
+            False if the entry was dropped because the spool is full
+        """
+        line = json.dumps(asdict(SpoolEntry(id_user, id_guild, xp, id_cat, sent_at.isoformat()))) + "\n"
+        if self._size - self._offset + len(line) > self.max_bytes:
+            if self.dropped == 0:
+                log.writeError(f"XP spool full ({self.max_bytes} bytes), new entries are dropped")
+            self.dropped += 1
+            return False
+
+        self._buffer.append(line)
+        self._size += len(line)
+        self.appended += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Write the buffered entries on the disk"""
+        if not self._buffer:
+            return
+
+        with open(self.path, "a") as f:
+            f.writelines(self._buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer.clear()
+
+    def _compact(self) -> None:
+        """Remove the replayed entries from the file when they are all replayed or fill half of it"""
+        if self._offset >= self._size:
+            os.remove(self.path)
+            self._size = 0
+        elif self._offset * 2 >= self._size:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                rest = f.read()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._size = len(rest)
+        else:
+            return
+        self._offset = 0
+
+    def _quarantine(self, line: str, error: Exception) -> None:
+        with open(self.path + ".failed", "a") as f:
+            f.write(line)
+        self.quarantined += 1
+        log.writeError(f"XP spool entry moved to {self.path}.failed after {self.max_attempts} tries : {error}")
+
+    def replay(
+            self,
+            apply: Callable[[SpoolEntry], None],
+            limit: int = 500,
+            unavailable: tuple[type[Exception], ...] = ()
+    ) -> int:
+        """
+        Replay the next entries in order
+
+        Stops at an entry that raises an exception, this entry and the following ones
+        are kept for the next replay. An entry that raised another exception than
+        `unavailable` `max_attempts` times is moved to the `.failed` file and skipped
+
+        Parameters
+        ----------
+        apply : Callable[[SpoolEntry], None]
+            Idempotent function that applies an entry on the database
+        limit : int
+            Maximum number of entries replayed by this call
+        unavailable : tuple[type[Exception], ...]
+            Exceptions raised while the database is unreachable, they do not count as a try
+
+        Returns
+        -------
+        int
+            Number of entries replayed or skipped
+        """
+        self.flush()
+        if not self.pending:
+            return 0
+
+        start = perf_counter()
+        done = 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            while done < limit and (raw := f.readline()):
+                try:
+                    line = raw.decode()
+                    entry = SpoolEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    log.writeError(f"Corrupted XP spool entry skipped : {raw.strip()!r}")
+                else:
+                    try:
+                        apply(entry)
+                    except unavailable:
+                        break
+                    except Exception as e:
+                        self._attempts += 1
+                        if self._attempts < self.max_attempts:
+                            log.writeError(f"XP spool entry failed ({self._attempts}/{self.max_attempts}) : {e}")
+                            break
+                        self._quarantine(line, e)
+
+                self._offset += len(raw)
+                self._attempts = 0
+                done += 1
+
+        if done > 0:
+            self._compact()
+            duration = perf_counter() - start
+            self.replayed += done
+            log.writeLog(
+                f"XP spool : {done} entries replayed in {duration:.2f}s "
+                f"({done / max(duration, 1e-6):.0f}/s), {self._size - self._offset} bytes left"
+            )
+        return done
@@ -84,6 +84,25 @@ CREATE TABLE IF NOT EXISTS josix.Games (
     CONSTRAINT fk_user_games_id FOREIGN KEY(idUser) REFERENCES josix.User(idUser)
 );
 
+-- The primary key is the index of the lookups by user and name
+CREATE TABLE IF NOT EXISTS josix.Askip (
+    username VARCHAR(64) NOT NULL,
+    askipName VARCHAR(64) NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY(username, askipName)
+);
+
+CREATE TABLE IF NOT EXISTS josix.Poll (
+    idMsg BIGINT NOT NULL,
+    idGuild BIGINT NOT NULL,
+    idChannel BIGINT NOT NULL,
+    title VARCHAR(64) DEFAULT '',
+    content VARCHAR(512) NOT NULL,
+    choices VARCHAR(80) ARRAY NOT NULL,
+    closed BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY(idMsg)
+);
+
 CREATE TABLE IF NOT EXISTS josix.Season (
     idSeason SERIAL,
     idGuild BIGINT NOT NULL,
@@ -136,4 +155,13 @@ CREATE TABLE IF NOT EXISTS josix.Score (
     PRIMARY KEY(idUser, idSeason),
     CONSTRAINT fk_user_score_id FOREIGN KEY(idUser) REFERENCES josix.User(idUser),
     CONSTRAINT fk_season_score_id FOREIGN KEY(idSeason) REFERENCES josix.Season(idSeason)
-);
\ No newline at end of file
+);
+
+-- The primary key allows one vote per user
+CREATE TABLE IF NOT EXISTS josix.PollVote (
+    idMsg BIGINT NOT NULL,
+    idUser BIGINT NOT NULL,
+    choice SMALLINT NOT NULL,
+    PRIMARY KEY(idMsg, idUser),
+    CONSTRAINT fk_poll_pv_id FOREIGN KEY(idMsg) REFERENCES josix.Poll(idMsg)
+);
@@ -0,0 +1,80 @@
+/*
+Notifies the bot processes listening on josix_invalidate when a cached table changes.
+The payload is a JSON with the table name, the key of the row
+(NULL when every entry of the table must be evicted) and the commit time
+*/
+
+CREATE OR REPLACE FUNCTION josix.notify_invalidate() RETURNS TRIGGER AS $$
+DECLARE
+    rowKey TEXT := NULL;
+BEGIN
+    IF TG_LEVEL = 'ROW' AND TG_NARGS > 0 THEN
+        IF TG_OP = 'DELETE' THEN
+            rowKey := to_jsonb(OLD) ->> TG_ARGV[0];
+        ELSE
+            rowKey := to_jsonb(NEW) ->> TG_ARGV[0];
+        END IF;
+    END IF;
+
+    PERFORM pg_notify('josix_invalidate', json_build_object(
+        'table', LOWER(TG_TABLE_NAME),
+        'key', rowKey,
+        'at', EXTRACT(EPOCH FROM clock_timestamp())
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+--
+
+CREATE OR REPLACE TRIGGER guild_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON josix.Guild
+    FOR EACH ROW EXECUTE FUNCTION josix.notify_invalidate('idguild');
+
+CREATE OR REPLACE TRIGGER logselector_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON josix.LogSelector
+    FOR EACH ROW EXECUTE FUNCTION josix.notify_invalidate('idguild');
+
+CREATE OR REPLACE TRIGGER msgreact_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON josix.MsgReact
+    FOR EACH ROW EXECUTE FUNCTION josix.notify_invalidate('idmsg');
+
+CREATE OR REPLACE TRIGGER msgcouple_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON josix.MsgCouple
+    FOR EACH ROW EXECUTE FUNCTION josix.notify_invalidate('idmsg');
+
+-- A couple is not linked to a message id, every reaction role is evicted
+CREATE OR REPLACE TRIGGER reactcouple_invalidate
+    AFTER UPDATE OR DELETE ON josix.ReactCouple
+    FOR EACH ROW EXECUTE FUNCTION josix.notify_invalidate();
+
+-- The askips are keyed by username, every askip is evicted
+CREATE OR REPLACE TRIGGER askip_invalidate
+    AFTER INSERT OR UPDATE OR DELETE ON josix.Askip
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+--
+
+CREATE OR REPLACE TRIGGER guild_truncate_invalidate
+    AFTER TRUNCATE ON josix.Guild
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+CREATE OR REPLACE TRIGGER logselector_truncate_invalidate
+    AFTER TRUNCATE ON josix.LogSelector
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+CREATE OR REPLACE TRIGGER msgreact_truncate_invalidate
+    AFTER TRUNCATE ON josix.MsgReact
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+CREATE OR REPLACE TRIGGER msgcouple_truncate_invalidate
+    AFTER TRUNCATE ON josix.MsgCouple
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+CREATE OR REPLACE TRIGGER reactcouple_truncate_invalidate
+    AFTER TRUNCATE ON josix.ReactCouple
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
+
+CREATE OR REPLACE TRIGGER askip_truncate_invalidate
+    AFTER TRUNCATE ON josix.Askip
+    FOR EACH STATEMENT EXECUTE FUNCTION josix.notify_invalidate();
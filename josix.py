@@ -1,48 +1,280 @@
+import asyncio
+import resource
+import sys
 from os import getenv
+from pathlib import Path
+from time import perf_counter
 
 import discord
 from discord.ext import commands
-from dotenv import load_dotenv
 from psycopg2 import Error
 
 import pkg.logwrite as log
+from database.cache import InvalidationListener
 from database.database import DatabaseHandler
+from database.db_utils import check_row_types
+from pkg import command_sync, event_context
+from pkg.bot_utils import JosixCog, JosixDatabaseException
+from pkg.resolver import Resolver
+from pkg.send_queue import SendQueue
+from pkg.votes import VoteRegistry
 
 EXIT = True
 
 
-class Josix(commands.Bot):
+class Josix(commands.AutoShardedBot):
     """
     The main class that represents Josix bot
 
+    The process runs the shards given by `SHARD_IDS` out of `SHARD_COUNT`,
+    or every shard recommended by Discord when they are not set.
+    Each process only caches the guilds of its own shards
+
+    The members cached are selected by `MEMBER_CACHE` and the guilds are chunked
+    according to `CHUNK_GUILDS` : at startup, lazily once ready, or never
+
     Attributes
     ----------
     db : DatabaseHandler
         A handler for the connection with the database to perform requests
+    invalidation : InvalidationListener
+        The listener that keeps the caches of the services up to date
+    resolver : Resolver
+        The lookups of the channels, guilds, members and roles missing from the cache
+    sender : SendQueue
+        The messages sent outside of the interaction responses, by priority
+    shard_label : str
+        The shards run by this process (e.g. `0-3`), `all` when every shard is run
+    votes : VoteRegistry
+        The votes with reactions running on the bot
 
     Methods
     -------
     run()
         Run the bot
     """
-    load_dotenv(".env.dev")
     _TOKEN = getenv("DISCORD")
 
     def __init__(self, bot_intents: discord.Intents) -> None:
+        shardCount, shardIds = Josix._shardConfig()
+        memberCache = Josix._memberCacheConfig(bot_intents)
+        if memberCache.voice:
+            bot_intents.voice_states = True
+
+        self.member_cache = memberCache
+        self.chunk_policy = getenv("CHUNK_GUILDS", "startup").lower()
+        self.chunk_max_members = int(getenv("CHUNK_MAX_MEMBERS", "0"))
+        if self.chunk_policy not in ("startup", "lazy", "none"):
+            raise ValueError(f"Invalid CHUNK_GUILDS {self.chunk_policy}, expected startup, lazy or none")
+
         super().__init__(
             description="Josix !",
             activity=discord.Game("/help and stats"), # The activity
             intents=bot_intents,
-            help_command=None
+            help_command=None,
+            shard_count=shardCount,
+            shard_ids=shardIds,
+            member_cache_flags=memberCache,
+            chunk_guilds_at_startup=self.chunk_policy == "startup" and bot_intents.members
         )
+        self.shard_label = getenv("SHARD_IDS", "all") if shardIds is not None else "all"
+        self._startTime = perf_counter()
+        self._chunkTask: asyncio.Task | None = None
+        self._commandsSynced = False
         try:
             self.db = DatabaseHandler()
-        except Error as error:
+            self.db.check_idle_transactions()
+            self.db.migrate()
+            check_row_types(self.db)
+        except (Error, JosixDatabaseException) as error:
                 log.writeError(log.formatError(error))
                 if EXIT:
                     exit(1)
+        self.invalidation = InvalidationListener()
+        self.resolver = Resolver(self)
+        self.sender = SendQueue()
+        self.votes = VoteRegistry(self)
+        self.add_listener(self.votes.on_raw_reaction_add)
+        self.add_listener(self.votes.on_raw_reaction_remove)
         self._extensions()
 
+    @staticmethod
+    def _shardConfig() -> tuple[int | None, list[int] | None]:
+        """
+        Read the shards to run from `SHARD_COUNT` and `SHARD_IDS`
+
+        `SHARD_IDS` is a range (`0-3`) or a list (`0,2,5`) of shard ids.
+        Every shard is run when it is not set
+        """
+        count = getenv("SHARD_COUNT")
+        if not count:
+            return None, None
+
+        shardCount = int(count)
+        value = getenv("SHARD_IDS", "").replace(" ", "")
+        if not value:
+            return shardCount, None
+
+        if "-" in value:
+            start, end = value.split("-")
+            shardIds = list(range(int(start), int(end) + 1))
+        else:
+            shardIds = [int(shard) for shard in value.split(",")]
+
+        if any(shard < 0 or shard >= shardCount for shard in shardIds):
+            raise ValueError(f"Invalid SHARD_IDS {value} for {shardCount} shards")
+        return shardCount, shardIds
+
+    @staticmethod
+    def _memberCacheConfig(intents: discord.Intents) -> discord.MemberCacheFlags:
+        """
+        Read the members to cache from `MEMBER_CACHE`
+
+        It is a list of `joined` (every member chunked or that joined), `voice`
+        (members in a voice channel) and `interaction` (members that used the bot),
+        or `all` / `none`. Defaults on the members allowed by the intents
+        """
+        value = getenv("MEMBER_CACHE", "").replace(" ", "").lower()
+        if not value:
+            return discord.MemberCacheFlags.from_intents(intents)
+        if value in ("all", "none"):
+            return getattr(discord.MemberCacheFlags, value)()
+
+        flags = discord.MemberCacheFlags.none()
+        for flag in filter(None, value.split(",")):
+            if flag not in discord.MemberCacheFlags.VALID_FLAGS:
+                raise ValueError(f"Invalid MEMBER_CACHE {value}")
+            setattr(flags, flag, True)
+        return flags
+
+    def owns_guild(self, id_guild: int) -> bool:
+        """Check if the guild belongs to a shard run by this process"""
+        if self.shard_ids is None or self.shard_count is None:
+            return True
+        return ((id_guild >> 22) % self.shard_count) in self.shard_ids
+
+    @property
+    def runs_singletons(self) -> bool:
+        """
+        Check if this process runs the jobs that must run once for the whole bot
+        (backups, birthdays...). They are run by the process that owns the shard 0
+        """
+        return self.shard_ids is None or 0 in self.shard_ids
+
+    def dispatch(self, event_name: str, *args, **kwargs) -> None:
+        """
+        Dispatch an event to its handlers, the handlers of an event handled
+        by several cogs share its lookups (see `pkg.event_context`)
+        """
+        method = "on_" + event_name
+        listeners = self.extra_events.get(method)
+        if not listeners or (len(listeners) == 1 and not hasattr(self, method)):
+            super().dispatch(event_name, *args, **kwargs)
+            return
+
+        # The tasks of the handlers are created here and copy the context
+        token = event_context.begin(event_name)
+        try:
+            super().dispatch(event_name, *args, **kwargs)
+        finally:
+            event_context.end(token)
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        guilds = sum(1 for guild in self.guilds if guild.shard_id == shard_id)
+        log.writeLog(
+            f"Shard {shard_id}/{self.shard_count} ready in {perf_counter() - self._startTime:.1f}s "
+            f"with {guilds} guilds"
+        )
+
+    async def on_connect(self) -> None:
+        # Dispatched by every shard and on every reconnection, the commands are synced once
+        if not self.auto_sync_commands or self._commandsSynced:
+            return
+
+        self._commandsSynced = True
+        try:
+            await self.sync_josix_commands()
+        except Exception as e:
+            self._commandsSynced = False
+            log.writeError(log.formatError(e))
+
+    async def sync_josix_commands(self, force: bool = False) -> bool:
+        """
+        Register the application commands on Discord if they changed since the last sync
+
+        The hash of the commands tree and the ids of the commands are saved after each sync,
+        when the hash did not change the ids are restored without any request
+
+        Parameters
+        ----------
+        force : bool
+            Sync even if the commands did not change
+
+        Returns
+        -------
+        bool
+            True if the commands were synced, False if the sync was skipped
+        """
+        start = perf_counter()
+        commands = self.pending_application_commands
+        treeHash = command_sync.tree_hash(commands)
+        state = None if force else command_sync.load()
+
+        if (
+            state and
+            state["hash"] == treeHash and
+            state["application"] == self.user.id and
+            (restored := command_sync.restore(state, commands)) is not None
+        ):
+            self._application_commands.update(restored)
+            log.writeLog(f"Application commands unchanged ({treeHash[:12]}), sync skipped")
+            return False
+
+        await self.sync_commands()
+        command_sync.save(self.user.id, treeHash, commands)
+        log.writeLog(f"Application commands synced in {perf_counter() - start:.1f}s ({treeHash[:12]}{', forced' if force else ''})")
+        return True
+
+    async def on_ready(self) -> None:
+        self._memberReport(f"Ready in {perf_counter() - self._startTime:.1f}s")
+        # The chunked members are only kept with the joined flag
+        if self.chunk_policy == "lazy" and self.member_cache.joined and self._chunkTask is None:
+            self._chunkTask = asyncio.create_task(self._lazyChunk())
+
+    async def _lazyChunk(self) -> None:
+        """Chunk the guilds one by one once the bot is ready, the smallest first"""
+        start = perf_counter()
+        guilds = sorted(
+            (guild for guild in self.guilds if not guild.chunked and (
+                self.chunk_max_members <= 0 or (guild.member_count or 0) <= self.chunk_max_members
+            )),
+            key=lambda guild: guild.member_count or 0
+        )
+        for guild in guilds:
+            try:
+                await guild.chunk()
+            except Exception as e:
+                log.writeError(log.formatError(e))
+        self._memberReport(f"Lazy chunking of {len(guilds)} guilds done in {perf_counter() - start:.1f}s")
+
+    def _memberReport(self, title: str) -> None:
+        """Log the guilds and cached members by guild size, with the peak resident memory"""
+        buckets = {100: [0, 0, 0], 1000: [0, 0, 0], 10000: [0, 0, 0], 0: [0, 0, 0]}
+        for guild in self.guilds:
+            size = guild.member_count or 0
+            limit = next((limit for limit in buckets if limit and size < limit), 0)
+            buckets[limit][0] += 1
+            buckets[limit][1] += guild.chunked
+            buckets[limit][2] += len(guild.members)
+
+        # ru_maxrss is in KiB on Linux
+        lines = [f"{title}, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"]
+        for limit, (guilds, chunked, members) in buckets.items():
+            if guilds:
+                label = f"< {limit}" if limit else ">= 10000"
+                lines.append(f"    {label:>8} members : {guilds} guilds, {chunked} chunked, {members} members cached")
+        log.writeLog("\n".join(lines))
+
     def _extensions(self) -> None:
         """
         Load all the extensions of the bot.
@@ -51,25 +283,80 @@ class Josix(commands.Bot):
         file that does not starts with an underscore
         
         Once done, check the results for each extension, and log it
+        with its import time and the new modules it imported
         """
+        start = perf_counter()
         try:
-            res = self.load_extension("cogs", recursive=True, store=True)
-            if res is None or isinstance(res, list):
-                return
+            names = [
+                ".".join(path.with_suffix("").parts)
+                for path in Path("cogs").rglob("[!_]*.py")
+            ]
+        except Exception as error:
+            log.writeError(log.formatError(error))
+            return
+
+        for name in names:
+            modules = set(sys.modules)
+            loadStart = perf_counter()
+            try:
+                res = self.load_extension(name, store=True)
+            except Exception as error:
+                log.writeError(log.formatError(error))
+                continue
 
-            for cogName, cogRes in res.items():
+            duration = (perf_counter() - loadStart) * 1000
+            newModules = set(sys.modules) - modules
+            packages = sorted({module.split(".")[0] for module in newModules} - {"cogs"})
+            for cogName, cogRes in (res or {}).items():
                 if isinstance(cogRes, Exception):
                     log.writeError(log.formatError(cogRes))
 
                 elif isinstance(cogRes, bool) and cogRes:
-                    log.writeLog(f"Extension {cogName} succesfully loaded")
-                
-        except Exception as error:
-            log.writeError(log.formatError(error))
+                    log.writeLog(
+                        f"Extension {cogName} succesfully loaded in {duration:.1f} ms "
+                        f"({len(newModules)} new modules{' : ' + ', '.join(packages) if packages else ''})"
+                    )
+        log.writeLog(f"{len(names)} extensions loaded in {(perf_counter() - start) * 1000:.1f} ms")
 
     def get_handler(self) -> DatabaseHandler:
         return self.db
 
+    async def _startupCog(self, cog: JosixCog) -> float:
+        start = perf_counter()
+        await cog.startup()
+        return perf_counter() - start
+
+    async def _startupCogs(self) -> None:
+        """
+        Run the startup of every cog concurrently and log the time taken by each one
+
+        A cog whose startup failed is removed
+        """
+        start = perf_counter()
+        cogs = [cog for cog in self.cogs.values() if isinstance(cog, JosixCog)]
+        results = await asyncio.gather(*(self._startupCog(cog) for cog in cogs), return_exceptions=True)
+
+        lines = []
+        for cog, res in sorted(zip(cogs, results), key=lambda item: -item[1] if isinstance(item[1], float) else 0):
+            if isinstance(res, BaseException):
+                log.writeError(log.formatError(res))
+                self.remove_cog(cog.qualified_name)
+                lines.append(f"    {cog.qualified_name:<15} failed, removed")
+            else:
+                lines.append(f"    {cog.qualified_name:<15} {res * 1000:>8.1f} ms")
+        log.writeLog(f"Startup of {len(cogs)} extensions done in {(perf_counter() - start) * 1000:.1f} ms\n" + "\n".join(lines))
+
+    async def start(self, token: str, *, reconnect: bool = True) -> None:
+        self.invalidation.start(asyncio.get_running_loop())
+        # The login only uses HTTP, it runs during the startup of the cogs
+        await asyncio.gather(self._startupCogs(), self.login(token))
+        await self.connect(reconnect=reconnect)
+
+    async def close(self) -> None:
+        self.invalidation.stop()
+        await self.sender.close()
+        await super().close()
+
     def run(self) -> None:
         super().run(Josix._TOKEN)
 
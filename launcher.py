@@ -0,0 +1,125 @@
+import signal
+import subprocess
+import sys
+import time
+from os import environ, getenv
+
+import pkg.logwrite as log
+
+IDENTIFY_DELAY = 5.5 # Discord allows one IDENTIFY every 5 seconds
+MAX_RESTART_DELAY = 300.0
+
+
+def shard_ranges(shard_count: int, processes: int) -> list[range]:
+    """
+    Split the shards in contiguous ranges, one for each process
+
+    Parameters
+    ----------
+    shard_count : int
+        Total number of shards
+    processes : int
+        Number of processes
+
+    Returns
+    -------
+    list[range]
+        The shards of each process
+    """
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(range(start, end))
+        start = end
+    return ranges
+
+
+class ShardProcess:
+    """
+    Represents a Josix process running a range of shards
+
+    Attributes
+    ----------
+    shards : range
+        The shards run by the process
+    label : str
+        The range given in `SHARD_IDS`
+    """
+
+    def __init__(self, shards: range, shard_count: int) -> None:
+        self.shards = shards
+        self.label = f"{shards.start}-{shards.stop - 1}"
+        self.shard_count = shard_count
+        self.process: subprocess.Popen | None = None
+        self.started_at = 0.0
+        self.restart_delay = IDENTIFY_DELAY
+        self.restart_at = 0.0
+
+    def start(self) -> None:
+        env = dict(environ, SHARD_COUNT=str(self.shard_count), SHARD_IDS=self.label)
+        self.process = subprocess.Popen([sys.executable, "josix.py"], env=env)
+        self.started_at = time.monotonic()
+        log.writeLog(f"Launcher : shards {self.label} started (pid {self.process.pid})")
+
+    def check(self) -> None:
+        """Restart the process with an exponential backoff if it stopped"""
+        if self.process is None or (code := self.process.poll()) is None:
+            return
+
+        now = time.monotonic()
+        if self.restart_at == 0.0:
+            if now - self.started_at > MAX_RESTART_DELAY:
+                self.restart_delay = IDENTIFY_DELAY
+            self.restart_at = now + self.restart_delay
+            log.writeError(f"Launcher : shards {self.label} stopped with code {code}, restart in {self.restart_delay:.0f}s")
+        elif now >= self.restart_at:
+            self.restart_at = 0.0
+            self.restart_delay = min(self.restart_delay * 2, MAX_RESTART_DELAY)
+            self.start()
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+
+def main() -> None:
+    """
+    Run Josix as `SHARD_PROCESSES` processes sharing `SHARD_COUNT` shards
+
+    The processes are started one after the other so that their shards do not
+    exceed the identify rate limit, and restarted when they stop
+    """
+    shardCount = int(getenv("SHARD_COUNT", "1"))
+    processes = [ShardProcess(shards, shardCount) for shards in shard_ranges(shardCount, int(getenv("SHARD_PROCESSES", "1")))]
+
+    running = True
+    def stop(*_) -> None:
+        nonlocal running
+        running = False
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        for proc in processes:
+            if not running:
+                break
+            proc.start()
+            time.sleep(IDENTIFY_DELAY * len(proc.shards))
+
+        while running:
+            for proc in processes:
+                proc.check()
+            time.sleep(1)
+    finally:
+        for proc in processes:
+            proc.stop()
+        for proc in processes:
+            if proc.process is not None:
+                proc.process.wait()
+
+
+if __name__ == "__main__":
+    main()
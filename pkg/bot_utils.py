@@ -1,13 +1,19 @@
+import asyncio
 from typing import Callable
 
-from discord import Permissions, SlashCommand
+from discord import ClientException, Guild, HTTPException, Member, Permissions, SlashCommand
 from discord.commands.core import application_command
 from discord.ext.commands import Cog
 
+from pkg.resolver import Resolver
+
 
 class JosixCog(Cog):
     """A class representing a Cog for Josix with a special attribute for the help command
 
+    The init work that needs I/O goes in `startup`, run once before the connection
+    to Discord concurrently with the other cogs
+
     Attributes
     ----------
     showHelp : bool
@@ -23,6 +29,16 @@ class JosixCog(Cog):
         self.isGame = isGame
         self.isOwner = isOwner
 
+    async def startup(self) -> None:
+        """
+        Init work of the cog, run concurrently with the other cogs
+
+        The blocking work that does not use the database (files, HTTP...) should be
+        run in a thread with `asyncio.to_thread`, the database handler is not thread-safe.
+        The cog is removed if this raises an exception
+        """
+        return
+
 
 class JosixSlash(SlashCommand):
     """
@@ -64,6 +80,12 @@ class JosixDatabaseException(JosixError):
     """
 
 
+class JosixDatabaseUnavailable(JosixDatabaseException):
+    """
+    Subclass raised without calling the database while its connection is down
+    """
+
+
 def josix_slash(**kwargs):
     """Decorator for josix's slash commands that invokes application_comand.
 
@@ -79,4 +101,56 @@ def get_permissions_str(perms: Permissions) -> list[str]:
     if not perms:
         return []
 
-    return [flag for flag, state in perms if state]
\ No newline at end of file
+    return [flag for flag, state in perms if state]
+
+
+async def fetch_members(guild: Guild, ids: list[int], resolver: Resolver | None = None) -> dict[int, Member]:
+    """
+    Get members of a guild, from the cache first
+
+    The members missing from the cache are requested on the gateway by batches of 100,
+    unless the guild is fully chunked. Falls back on the API when the gateway request fails,
+    through the resolver when given
+
+    Parameters
+    ----------
+    guild : Guild
+        The guild of the members
+    ids : list[int]
+        Ids of the users
+    resolver : Resolver | None
+        Shares the API requests and remembers the users that are not members
+
+    Returns
+    -------
+    dict[int, Member]
+        The members found, by user id
+    """
+    members = {}
+    missing = []
+    for idUser in dict.fromkeys(ids):
+        if member := guild.get_member(idUser):
+            members[idUser] = member
+        else:
+            missing.append(idUser)
+
+    if not missing or guild.chunked:
+        return members
+
+    for i in range(0, len(missing), 100):
+        batch = missing[i:i + 100]
+        try:
+            for member in await guild.query_members(user_ids=batch, limit=len(batch)):
+                members[member.id] = member
+        except (asyncio.TimeoutError, ClientException, KeyError):
+            # Guild of another process or gateway unavailable
+            for idUser in batch:
+                try:
+                    if resolver is not None:
+                        if member := await resolver.member(guild, idUser):
+                            members[idUser] = member
+                    else:
+                        members[idUser] = await guild.fetch_member(idUser)
+                except HTTPException:
+                    continue
+    return members
@@ -0,0 +1,113 @@
+from enum import Enum
+from time import monotonic
+
+import pkg.logwrite as log
+
+
+class CircuitState(Enum):
+    """Enumerator that represents the states of a circuit breaker"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Represents a circuit breaker in front of an external dependency
+
+    After `threshold` consecutive failures the circuit opens and the calls
+    must fail fast. Once the delay is elapsed, one call is allowed to test the
+    dependency (half-open). The delay doubles after each failed test, up to `max_delay`.
+    A test that reports nothing within `trial_timeout` counts as failed, so a lost
+    call can not keep the circuit half-open. Every state change is logged
+
+    Attributes
+    ----------
+    name : str
+        Name of the dependency, used in the logs
+    threshold : int
+        Number of consecutive failures that opens the circuit
+    base_delay : float
+        First delay in seconds before testing the dependency again
+    max_delay : float
+        Maximum delay in seconds between two tests
+    trial_timeout : float
+        Seconds given to the test call to report its result
+    """
+
+    def __init__(
+            self,
+            name: str,
+            threshold: int = 3,
+            base_delay: float = 1.0,
+            max_delay: float = 60.0,
+            trial_timeout: float = 60.0
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.trial_timeout = trial_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.delay = base_delay
+        self.retry_at = 0.0
+        self.trial_until = 0.0
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state == self.state:
+            return
+
+        self.state = state
+        if state == CircuitState.OPEN:
+            log.writeError(f"Circuit {self.name} open, next try in {self.delay:.1f}s")
+        else:
+            log.writeLog(f"Circuit {self.name} {state.value}")
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds left before the next test of the dependency"""
+        return max(0.0, self.retry_at - monotonic())
+
+    def allow(self) -> bool:
+        """
+        Check if a call can be made to the dependency
+
+        Returns
+        -------
+        bool
+            False if the call must fail fast
+        """
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if self.state == CircuitState.HALF_OPEN and monotonic() >= self.trial_until:
+            log.writeError(f"Circuit {self.name} : no result for the test call after {self.trial_timeout:.0f}s")
+            self.failure()
+
+        if self.state == CircuitState.OPEN and monotonic() >= self.retry_at:
+            self._set_state(CircuitState.HALF_OPEN)
+            self.trial_until = monotonic() + self.trial_timeout
+            return True
+        return False
+
+    def success(self) -> None:
+        """Record a successful call"""
+        if self.state == CircuitState.CLOSED and self.failures == 0:
+            return
+
+        self.failures = 0
+        self.delay = self.base_delay
+        self._set_state(CircuitState.CLOSED)
+
+    def failure(self) -> None:
+        """Record a failed call"""
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN:
+            self.delay = min(self.max_delay, self.delay * 2)
+        elif self.failures < self.threshold:
+            return
+
+        self.retry_at = monotonic() + self.delay
+        self._set_state(CircuitState.OPEN)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from json import JSONDecodeError
+
+from discord import ApplicationCommand, SlashCommandGroup
+
+import pkg.logwrite as log
+
+SYNC_FILE = os.path.join(log.LOGS_PATH, os.getenv("COMMANDS_SYNC_FILE", "commands_sync.json"))
+
+
+def _metadata(command: ApplicationCommand) -> dict:
+    """Josix metadata of a command and its subcommands, not sent to Discord"""
+    if isinstance(command, SlashCommandGroup):
+        return {sub.name: _metadata(sub) for sub in command.subcommands}
+    return {
+        "give_xp": getattr(command, "give_xp", False),
+        "hidden": getattr(command, "hidden", False)
+    }
+
+
+def tree_hash(commands: list[ApplicationCommand]) -> str:
+    """
+    Compute a stable hash of the commands tree
+
+    It covers everything sent to Discord (names, options, permissions...)
+    and the Josix metadata of the commands
+
+    Parameters
+    ----------
+    commands : list[ApplicationCommand]
+        The commands of the bot
+
+    Returns
+    -------
+    str
+        The hexadecimal sha256 of the tree
+    """
+    tree = sorted(
+        (
+            {
+                "guilds": sorted(command.guild_ids) if command.guild_ids else None,
+                "payload": command.to_dict(),
+                "josix": _metadata(command)
+            }
+            for command in commands
+        ),
+        key=lambda item: (item["payload"]["name"], item["payload"].get("type", 1), str(item["guilds"]))
+    )
+    data = json.dumps(tree, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def load() -> dict | None:
+    """Load the state of the last sync, None if there is no usable state"""
+    try:
+        with open(SYNC_FILE, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, JSONDecodeError):
+        return None
+
+    if not isinstance(state, dict) or not {"hash", "application", "commands"} <= state.keys():
+        return None
+    return state
+
+
+def save(application_id: int, hash_value: str, commands: list[ApplicationCommand]) -> None:
+    """
+    Save the hash of the synced tree and the ids given by Discord to the global commands
+
+    The file is replaced atomically so that a crash never leaves a partial state.
+    Each process writes its own temporary file, the shard processes can save at the same time
+    """
+    state = {
+        "hash": hash_value,
+        "application": application_id,
+        "commands": {
+            f"{command.name}:{command.type}": command.id
+            for command in commands
+            if command.guild_ids is None and command.id is not None
+        }
+    }
+
+    tmpPath = f"{SYNC_FILE}.{os.getpid()}.tmp"
+    with open(tmpPath, "w") as f:
+        json.dump(state, f)
+    os.replace(tmpPath, SYNC_FILE)
+
+
+def restore(state: dict, commands: list[ApplicationCommand]) -> dict[int, ApplicationCommand] | None:
+    """
+    Give back to the commands the ids saved during the last sync
+
+    Parameters
+    ----------
+    state : dict
+        The state returned by `load`
+    commands : list[ApplicationCommand]
+        The commands of the bot
+
+    Returns
+    -------
+    dict[int, ApplicationCommand] | None
+        The commands by id, None if a command has no saved id
+    """
+    ids = state["commands"]
+    restored = {}
+    for command in commands:
+        key = f"{command.name}:{command.type}"
+        if command.guild_ids is not None or key not in ids:
+            return None
+        restored[int(ids[key])] = command
+
+    for idCommand, command in restored.items():
+        command.id = idCommand
+    return restored
@@ -0,0 +1,91 @@
+from collections.abc import Callable, Hashable
+from contextvars import ContextVar, Token
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class EventContext:
+    """
+    Represents the lookups shared by the handlers of one dispatched event
+
+    The first handler that needs a value computes it, the others get the same value.
+    It lives as long as the tasks of the handlers of the event
+
+    Attributes
+    ----------
+    event : str
+        Name of the event
+    """
+
+    def __init__(self, event: str) -> None:
+        self.event = event
+        self.values: dict[Hashable, Any] = {}
+
+
+class EventStats:
+    """
+    Counters of the lookups made through the event contexts
+
+    Attributes
+    ----------
+    events : int
+        Events dispatched with a context (at least two handlers)
+    lookups : int
+        Lookups made with a context
+    shared : int
+        Lookups answered by the context, each one is a lookup not repeated
+    """
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.lookups = 0
+        self.shared = 0
+
+
+stats = EventStats()
+_current: ContextVar[EventContext | None] = ContextVar("josix_event", default=None)
+
+
+def begin(event: str) -> Token:
+    """Open the context of an event, the tasks created until `end` share it"""
+    stats.events += 1
+    return _current.set(EventContext(event))
+
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> EventContext | None:
+    return _current.get()
+
+
+def memo(key: Hashable, lookup: Callable[[], T]) -> T:
+    """
+    Get a value once for the current event
+
+    Parameters
+    ----------
+    key : Hashable
+        Identifies the value among the lookups of the event, e.g. `("guild", idGuild)`
+    lookup : Callable[[], T]
+        Computes the value, called directly outside of an event
+
+    Returns
+    -------
+    T
+        The value
+    """
+    if (context := _current.get()) is None:
+        return lookup()
+
+    stats.lookups += 1
+    if key in context.values:
+        stats.shared += 1
+        return context.values[key]
+
+    # Not stored when the lookup raises, the next handler tries again
+    value = context.values[key] = lookup()
+    return value
+
@@ -0,0 +1,153 @@
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass
+
+import aiohttp
+
+import pkg.logwrite as log
+
+
+@dataclass(frozen=True, slots=True)
+class Joke:
+    """A joke of blagues-api.fr"""
+    id: int
+    type: str
+    joke: str
+    answer: str
+
+
+class JokePool:
+    """
+    Represents a pool of jokes prefetched from blagues-api.fr for each category
+
+    The jokes are served from memory, a category is refilled in the background
+    once it is under `low_water` jokes. The jokes already in the pool or recently
+    served are not added again. All the requests share one HTTP session
+
+    Attributes
+    ----------
+    size : int
+        Number of jokes kept for each category
+    low_water : int
+        Number of jokes under which a category is refilled
+    hits : int
+        Jokes served from the pool
+    misses : int
+        Jokes fetched while the command was waiting
+    """
+
+    TYPES = ("global", "dev", "beauf", "blondes", "dark", "limit")
+    _URL = "https://www.blagues-api.fr/api"
+
+    def __init__(self, token: str, size: int = 5, low_water: int = 2, timeout: float = 10.0) -> None:
+        self.size = size
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+
+        self._token = token
+        self._timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+        self._pools: dict[str, deque[Joke]] = {jokeType: deque() for jokeType in JokePool.TYPES}
+        self._recent: deque[int] = deque(maxlen=size * len(JokePool.TYPES) * 4)
+        self._refills: dict[str, asyncio.Task] = {}
+
+    def _getSession(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                raise_for_status=True,
+                headers={"Authorization": "Bearer " + self._token},
+                timeout=aiohttp.ClientTimeout(total=self._timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        for task in self._refills.values():
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _fetch(self, path: str, params: list[tuple[str, str]] | None = None) -> Joke:
+        async with self._getSession().get(JokePool._URL + path, params=params) as resp:
+            data = await resp.json()
+        return Joke(data["id"], data["type"], data["joke"], data["answer"])
+
+    def _known(self, joke: Joke, pool: deque[Joke]) -> bool:
+        return joke.id in self._recent or any(pooled.id == joke.id for pooled in pool)
+
+    def refill(self, joke_type: str) -> None:
+        """Start the refill of a category if it is under the low-water mark and not already refilled"""
+        if len(self._pools[joke_type]) > self.low_water or joke_type in self._refills:
+            return
+
+        task = asyncio.create_task(self._refill(joke_type))
+        task.add_done_callback(lambda _: self._refills.pop(joke_type, None))
+        self._refills[joke_type] = task
+
+    def refill_all(self) -> None:
+        for jokeType in JokePool.TYPES:
+            self.refill(jokeType)
+
+    async def _refill(self, joke_type: str) -> None:
+        pool = self._pools[joke_type]
+        # Bounded, a small category may not have enough new jokes
+        for _ in range(self.size * 2):
+            if len(pool) >= self.size:
+                return
+            try:
+                joke = await self._fetch(f"/type/{joke_type}/random")
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                log.writeError(f"Refill of the {joke_type} jokes failed : {e}")
+                return
+
+            if not self._known(joke, pool):
+                pool.append(joke)
+
+    async def get(self, joke_type: str | None = None, disallow: list[str] | None = None) -> Joke | None:
+        """
+        Get a joke, from the pool when possible
+
+        Parameters
+        ----------
+        joke_type : str | None
+            The category of the joke, a random allowed category if None
+        disallow : list[str] | None
+            The categories that can not be chosen when no category is given
+
+        Returns
+        -------
+        Joke | None
+            The joke, None if the API answered an unexpected content
+
+        Raises
+        ------
+        aiohttp.ClientError | asyncio.TimeoutError
+            When the pool is empty and the joke could not be fetched
+        """
+        disallow = disallow or []
+        if joke_type is None:
+            candidates = [jokeType for jokeType in JokePool.TYPES if jokeType not in disallow and self._pools[jokeType]]
+            chosen = random.choice(candidates) if candidates else None
+        else:
+            chosen = joke_type if self._pools[joke_type] else None
+
+        if chosen is not None:
+            self.hits += 1
+            joke = self._pools[chosen].popleft()
+            self.refill(chosen)
+        else:
+            self.misses += 1
+            try:
+                if joke_type is None:
+                    joke = await self._fetch("/random", [("disallow", jokeType) for jokeType in disallow])
+                    self.refill_all()
+                else:
+                    joke = await self._fetch(f"/type/{joke_type}/random")
+                    self.refill(joke_type)
+            except (KeyError, ValueError, TypeError) as e:
+                log.writeError(f"Unexpected joke from the API : {e}")
+                return None
+
+        self._recent.append(joke.id)
+        return joke
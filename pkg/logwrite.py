@@ -4,6 +4,7 @@ from datetime import datetime
 
 from dotenv import load_dotenv
 
+# The only load of .env.dev : this module is imported first by the bot, the database and the launcher
 load_dotenv(".env.dev")
 
 # GLOBAL PATHS
@@ -11,6 +12,7 @@ HOME_PATH = os.getenv("HOME")
 LOGS_PATH = os.path.join(HOME_PATH, os.getenv("LOGS", "")) if HOME_PATH else ""
 LOG_FILE = os.path.join(LOGS_PATH, "josixout.log")
 ERROR_FILE = os.path.join(LOGS_PATH, "josixerr.log")
+SLOW_QUERY_FILE = os.path.join(LOGS_PATH, "josixslow.log")
 
 LOG_COLOR = '\033[94m'
 ERROR_COLOR = '\033[91m'
@@ -84,3 +86,18 @@ def writeError(msg: str) -> None:
     """
     with open(ERROR_FILE, 'a') as f:
         f.write(ERROR_COLOR + str(datetime.now()) + END_FORMAT + msg + '\n')
+
+
+# Function to write to the slow query file the message and a timestamp, example :
+# 2016-01-01 00:00:00 : msg
+def writeSlowQuery(msg: str) -> None:
+    """
+    Write the message in the slow query file
+
+    Parameters
+    ----------
+    msg : str
+        The slow query message to write
+    """
+    with open(SLOW_QUERY_FILE, 'a') as f:
+        f.write(str(datetime.now()) + " : " + msg + '\n')
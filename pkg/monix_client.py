@@ -0,0 +1,345 @@
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import Enum
+from time import monotonic
+
+import aiohttp
+
+import pkg.logwrite as log
+from pkg.circuit_breaker import CircuitBreaker
+
+
+class HTTPMethod(Enum):
+    """Enumerator that represents HTTP method used for the bot"""
+    GET = "GET"
+    POST = "POST"
+
+
+class MonixAPIError(Exception):
+    """Exception for every Monix API errors"""
+
+
+class MonixUnavailable(MonixAPIError):
+    """Subclass for the errors due to an unreachable or failing API, they open the circuit"""
+
+
+class MonixClient:
+    """
+    Represents an asynchronous client for the Monix API
+
+    The connections are pooled in one aiohttp session and every request has a timeout.
+    An expired token is refreshed once for all the concurrent requests,
+    the failed requests are retried a bounded number of times and a circuit breaker
+    makes the calls fail fast while the API is down
+
+    Attributes
+    ----------
+    base_url : str
+        The url of the Monix API
+    timeout : float
+        Maximum time in seconds of a request
+    retries : int
+        Number of retries of a failed request (network error, 5xx, expired token)
+    breaker : CircuitBreaker
+        The circuit breaker in front of the API
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            login: str,
+            password: str,
+            timeout: float = 10.0,
+            retries: int = 2,
+            verify_ssl: bool = False,
+            pool_size: int = 10
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = CircuitBreaker("Monix API", threshold=3, base_delay=5.0, max_delay=300.0)
+
+        self._login = login
+        self._password = password
+        self._verifySSL = verify_ssl
+        self._poolSize = pool_size
+        self._session: aiohttp.ClientSession | None = None
+        self._token: str | None = None
+        self._tokenLock = asyncio.Lock()
+
+    def _getSession(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._poolSize, ssl=None if self._verifySSL else False),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def refresh_token(self, expired: str | None) -> None:
+        """
+        Log in again and store the new token
+
+        Single-flight : when several requests saw the same expired token,
+        only the first one logs in, the others wait and reuse its token
+
+        Parameters
+        ----------
+        expired : str | None
+            The token rejected by the API
+        """
+        async with self._tokenLock:
+            if self._token != expired:
+                return
+
+            try:
+                async with self._getSession().post(
+                    self.base_url + "/auth/login",
+                    json={"username": self._login, "password": self._password}
+                ) as resp:
+                    data = await resp.json(content_type=None) if resp.status < 300 else None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
+                raise MonixUnavailable(f"Unable to connect to {self.base_url}") from error
+
+            try:
+                self._token = data["data"]["token"]
+            except (KeyError, TypeError):
+                raise MonixAPIError("Error on Josix login")
+            log.writeLog("Monix API token refreshed")
+
+    async def request(self, target: str, method: HTTPMethod = HTTPMethod.GET, json: dict | None = None) -> dict:
+        """
+        Execute a request to the target endpoint of the API and retrieve the result
+
+        Parameters
+        ----------
+        target : str
+            The endpoint of the ressource
+        method : HTTPMethod
+            The HTTP method
+        json : dict | None
+            The body of the request
+
+        Returns
+        -------
+        dict
+            The JSON returned by the API
+
+        Raises
+        ------
+        MonixAPIError
+            When the API is unavailable, refused the request or returned an invalid response
+        """
+        data, _ = await self.fetch(target, method, json)
+        return data
+
+    async def fetch(
+            self,
+            target: str,
+            method: HTTPMethod = HTTPMethod.GET,
+            json: dict | None = None,
+            etag: str | None = None,
+            last_modified: str | None = None
+    ) -> tuple[dict | None, Mapping[str, str]]:
+        """
+        Same as `request` but the request is conditional when a validator is given
+
+        Parameters
+        ----------
+        etag : str | None
+            The ETag of the cached response, sent in If-None-Match
+        last_modified : str | None
+            The Last-Modified of the cached response, sent in If-Modified-Since
+
+        Returns
+        -------
+        tuple[dict | None, Mapping[str, str]]
+            The JSON returned by the API (None if it was not modified) and the headers of the response
+        """
+        if not self.breaker.allow():
+            raise MonixAPIError(f"Monix API unavailable, next try in {self.breaker.retry_in:.0f}s")
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            res = await self._request(target, method, json, headers)
+        except MonixUnavailable as error:
+            self.breaker.failure()
+            raise error
+        except MonixAPIError as error:
+            # The API answered
+            self.breaker.success()
+            raise error
+
+        self.breaker.success()
+        return res
+
+    async def _request(self, target: str, method: HTTPMethod, json: dict | None, headers: dict) -> tuple[dict | None, Mapping[str, str]]:
+        error: MonixAPIError = MonixUnavailable(f"Unable to connect to {self.base_url}")
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+            token = self._token
+            if token is None:
+                await self.refresh_token(None)
+                token = self._token
+
+            try:
+                async with self._getSession().request(
+                    method.value,
+                    self.base_url + target,
+                    json=json,
+                    headers={"accept": "application/json", "Authorization": f"Bearer {token}", **headers}
+                ) as resp:
+                    if resp.status == 304:
+                        return None, resp.headers
+                    if resp.status in (401, 403):
+                        await self.refresh_token(token)
+                        error = MonixAPIError("Access Forbidden check credentials")
+                        continue
+                    if resp.status >= 500:
+                        error = MonixUnavailable(f"Wrong status code obtained : {resp.status}")
+                        continue
+                    if resp.status < 200 or resp.status >= 300:
+                        raise MonixAPIError(f"Wrong status code obtained : {resp.status}")
+
+                    try:
+                        data = await resp.json(content_type=None)
+                    except ValueError:
+                        raise MonixAPIError(f"Unable to parse JSON response : {await resp.text()}")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                error = MonixUnavailable(f"Unable to connect to {self.base_url}")
+                continue
+
+            if isinstance(data, dict) and "error" in data:
+                raise MonixAPIError(data["error"])
+            return data, resp.headers
+
+        raise error
+
+
+@dataclass()
+class CachedResponse:
+    """A response of the API kept in a `ResponseCache`"""
+    data: dict
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+
+class ResponseCache:
+    """
+    Represents a cache of the GET responses of the Monix API
+
+    A response is fresh during the TTL of its endpoint. Once expired it is still
+    served during `stale` seconds while it is revalidated in the background,
+    with If-None-Match / If-Modified-Since when the API gave an ETag / Last-Modified.
+    The concurrent calls to an endpoint share the same request
+
+    Attributes
+    ----------
+    client : MonixClient
+        The client used for the requests
+    ttls : dict[str, float]
+        TTL in seconds of each endpoint
+    default_ttl : float
+        TTL of the endpoints missing from `ttls`
+    stale : float
+        Seconds during which an expired response is still served
+    hits, stale_hits, misses : int
+        How the calls were answered
+    upstream, not_modified, errors : int
+        Requests made to the API, responses not modified and failed requests
+    """
+
+    def __init__(self, client: MonixClient, ttls: dict[str, float], default_ttl: float = 60.0, stale: float = 300.0) -> None:
+        self.client = client
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.stale = stale
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream = 0
+        self.not_modified = 0
+        self.errors = 0
+
+        self._entries: dict[str, CachedResponse] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get(self, target: str) -> dict:
+        """
+        Get the response of an endpoint, from the cache when possible
+
+        Raises
+        ------
+        MonixAPIError
+            When there is no usable response cached and the request failed
+        """
+        entry = self._entries.get(target)
+        if entry is not None:
+            age = monotonic() - entry.fetched_at
+            ttl = self.ttls.get(target, self.default_ttl)
+            if age < ttl:
+                self.hits += 1
+                return entry.data
+            if age < ttl + self.stale:
+                self.stale_hits += 1
+                self._refresh(target)
+                return entry.data
+
+        self.misses += 1
+        # Shielded, a cancelled command does not cancel the request shared with the others
+        return await asyncio.shield(self._refresh(target))
+
+    async def refresh(self, target: str) -> dict:
+        """Get the response of an endpoint from the API, even if the cached one is fresh"""
+        return await asyncio.shield(self._refresh(target))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _refresh(self, target: str) -> asyncio.Task:
+        """Start the request of an endpoint, or join the one already running"""
+        task = self._inflight.get(target)
+        if task is None:
+            task = asyncio.create_task(self._fetch(target))
+            task.add_done_callback(lambda done: self._done(target, done))
+            self._inflight[target] = task
+        return task
+
+    def _done(self, target: str, task: asyncio.Task) -> None:
+        self._inflight.pop(target, None)
+        if not task.cancelled() and (error := task.exception()) is not None:
+            self.errors += 1
+            log.writeError(f"Monix request {target} failed : {error}")
+
+    async def _fetch(self, target: str) -> dict:
+        entry = self._entries.get(target)
+        self.upstream += 1
+        data, headers = await self.client.fetch(
+            target,
+            etag=entry.etag if entry else None,
+            last_modified=entry.last_modified if entry else None
+        )
+
+        if data is None and entry is not None:
+            self.not_modified += 1
+            entry.fetched_at = monotonic()
+            return entry.data
+
+        if data is None:
+            raise MonixAPIError(f"Not modified response without a cached version for {target}")
+        self._entries[target] = CachedResponse(data, headers.get("ETag"), headers.get("Last-Modified"), monotonic())
+        return data
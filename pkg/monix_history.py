@@ -0,0 +1,154 @@
+import datetime
+
+
+class HistoryStore:
+    """
+    Represents the aggregated transactions of the Monix history
+
+    The history feed of the API is ordered from the newest record, each sync
+    only reads the records newer than the last one seen. The consumption of each
+    member (credits spent) and product (units sold) is kept for the last 7 days,
+    the last 30 days and since the first sync. The records of the last 30 days are
+    kept by day, so that the windows roll without reading the history again
+
+    Attributes
+    ----------
+    windows : tuple[int, ...]
+        The windows in days
+    records : int
+        Number of records read since the first sync
+    """
+
+    def __init__(self, windows: tuple[int, ...] = (7, 30)) -> None:
+        self.windows = windows
+        self.records = 0
+
+        self._last: tuple[str, int] | None = None
+        self._today = datetime.date.today()
+        self._names: dict[tuple[bool, int], str] = {}
+        self._days: dict[datetime.date, dict[tuple[bool, int], int]] = {}
+        self._totals: dict[int, dict[tuple[bool, int], int]] = {window: {} for window in windows}
+        self._totals[0] = {}
+
+    @staticmethod
+    def _add(totals: dict[tuple[bool, int], int], values: dict[tuple[bool, int], int], sign: int = 1) -> None:
+        for key, value in values.items():
+            total = totals.get(key, 0) + sign * value
+            if total:
+                totals[key] = total
+            else:
+                totals.pop(key, None)
+
+    def _roll(self, today: datetime.date) -> None:
+        """Remove from each window the days that left it since the last call"""
+        if today <= self._today:
+            return
+
+        for day in list(self._days):
+            previousAge = (self._today - day).days
+            age = (today - day).days
+            for window in self.windows:
+                if previousAge <= window < age:
+                    HistoryStore._add(self._totals[window], self._days[day], -1)
+            if age > max(self.windows):
+                del self._days[day]
+        self._today = today
+
+    @staticmethod
+    def _parse(record: dict) -> tuple[tuple[bool, int], str, int] | None:
+        """
+        Get the element and the value of a record
+
+        The members are counted with the credits they spent (negative movements)
+        and the products with the units sold
+        """
+        try:
+            if record["User"] is not None:
+                key, name, value = (True, record["User"]["id"]), record["User"]["username"], record["movement"]
+                return (key, name, value) if value < 0 else None
+
+            if record["Product"] is not None:
+                key, name = (False, record["Product"]["id"]), record["Product"]["name"]
+                value = int(-(record["movement"] / record["Product"]["price"]))
+                return (key, name, value) if value > 0 else None
+        except (KeyError, TypeError, ZeroDivisionError):
+            pass
+        return None
+
+    def sync(self, records: list[dict], today: datetime.date | None = None) -> int:
+        """
+        Add the records newer than the last sync
+
+        Parameters
+        ----------
+        records : list[dict]
+            The history returned by the API, from the newest record
+        today : datetime.date | None
+            The current day, today by default
+
+        Returns
+        -------
+        int
+            Number of new records
+        """
+        self._roll(today or datetime.date.today())
+
+        new = []
+        for record in records:
+            try:
+                position = (record["date"], record.get("id") or 0)
+            except KeyError:
+                continue
+            if self._last is not None and position <= self._last:
+                break
+            new.append((position, record))
+
+        # From the oldest, so that the last record seen is always consistent
+        for position, record in reversed(new):
+            self._last = position
+            self.records += 1
+            if (parsed := HistoryStore._parse(record)) is None:
+                continue
+
+            key, name, value = parsed
+            try:
+                day = datetime.date.fromisoformat(position[0][:10])
+            except ValueError:
+                continue
+
+            self._names[key] = name
+            values = {key: value}
+            HistoryStore._add(self._totals[0], values)
+            age = (self._today - day).days
+            for window in self.windows:
+                if age <= window:
+                    HistoryStore._add(self._totals[window], values)
+            if age <= max(self.windows):
+                HistoryStore._add(self._days.setdefault(day, {}), values)
+        return len(new)
+
+    def totals(self, isMember: bool, days: int = 7) -> dict[int, tuple[str, int]]:
+        """
+        Get the consumption of the members or products during a window
+
+        Parameters
+        ----------
+        isMember : bool
+            The members or else the products
+        days : int
+            The window in days, one of `windows` or 0 since the first sync
+
+        Returns
+        -------
+        dict[int, tuple[str, int]]
+            The name and value of each element by id
+        """
+        if days not in self._totals:
+            raise ValueError(f"Unknown window of {days} days, expected one of {self.windows} or 0")
+
+        self._roll(datetime.date.today())
+        return {
+            key[1]: (self._names[key], value)
+            for key, value in self._totals[days].items()
+            if key[0] == isMember
+        }
@@ -0,0 +1,105 @@
+from collections import deque
+from dataclasses import dataclass
+from time import time
+
+
+@dataclass()
+class StockAlert:
+    """A change of the stocks worth a message"""
+    low: bool
+    message: str
+
+
+class StockWatcher:
+    """
+    Represents the last known stocks of Monix and their history
+
+    Each update is compared with the previous snapshot, an alert is given when
+    the total crosses the threshold or when a product runs out.
+    The total is kept in a time series, with a point only when it changes
+
+    Attributes
+    ----------
+    threshold : int
+        The total under which the stocks are low
+    products : dict[int, tuple[str, int]]
+        The name and stock of each product by id
+    total : int
+        The total of the stocks
+    updated_at : float
+        Timestamp of the last update, 0 if never updated
+    series : deque[tuple[float, int]]
+        The timestamps and totals, from the oldest
+    """
+
+    def __init__(self, threshold: int = 50, max_points: int = 4096) -> None:
+        self.threshold = threshold
+        self.products: dict[int, tuple[str, int]] = {}
+        self.total = 0
+        self.updated_at = 0.0
+        self.series: deque[tuple[float, int]] = deque(maxlen=max_points)
+
+    def update(self, records: list[dict], now: float | None = None) -> tuple[bool, list[StockAlert]]:
+        """
+        Replace the snapshot with the products returned by the API
+
+        Parameters
+        ----------
+        records : list[dict]
+            The products returned by the API
+        now : float | None
+            Timestamp of the update, the current time by default
+
+        Returns
+        -------
+        tuple[bool, list[StockAlert]]
+            If a stock changed and the alerts to send, there is no alert on the first update
+        """
+        now = time() if now is None else now
+        products = {
+            record["id"]: (record["name"], record["stock"])
+            for record in records
+            if record.get("id") is not None and record.get("stock") is not None
+        }
+        total = sum(stock for _, stock in products.values())
+        first = not self.series
+        changed = products != self.products
+
+        alerts = []
+        if not first:
+            if self.total >= self.threshold > total:
+                alerts.append(StockAlert(True, f"The stocks are low : **{total}** remaining"))
+            elif total >= self.threshold > self.total:
+                alerts.append(StockAlert(False, f"The stocks are back : **{total}** remaining"))
+
+            for idProduct, (name, stock) in products.items():
+                previous = self.products.get(idProduct)
+                if stock <= 0 and previous is not None and previous[1] > 0:
+                    alerts.append(StockAlert(True, f"**{name}** is out of stock"))
+
+        if first or total != self.total:
+            self.series.append((now, total))
+        self.products = products
+        self.total = total
+        self.updated_at = now
+        return changed and not first, alerts
+
+    def consumption(self, seconds: float, now: float | None = None) -> int:
+        """
+        Get the units consumed during the last seconds, the restocks are ignored
+
+        Parameters
+        ----------
+        seconds : float
+            The period
+        now : float | None
+            The end of the period, the current time by default
+        """
+        start = (time() if now is None else now) - seconds
+        consumed = 0
+        previous = None
+        for timestamp, total in self.series:
+            if previous is not None and timestamp > start and total < previous:
+                consumed += previous - total
+            previous = total
+        return consumed
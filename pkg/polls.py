@@ -0,0 +1,250 @@
+import asyncio
+from collections.abc import Callable
+from time import monotonic
+
+import discord
+
+import pkg.logwrite as log
+from database.database import DatabaseHandler
+from database.db_utils import PollDB
+from database.services import poll_service
+
+RENDER_INTERVAL = 5.0 # Minimum seconds between two edits of a poll message
+MAX_CHOICES = 10
+
+
+class PollState:
+    """
+    Represents a poll and its votes in memory
+
+    Each user has at most one vote, the tallies are updated on every vote
+    and the votes not saved yet are kept in `dirty`
+
+    Attributes
+    ----------
+    id : int
+        Id of the poll message
+    choices : list[str]
+        The choices of the poll
+    votes : dict[int, int]
+        The choice of each user
+    tallies : list[int]
+        Number of votes of each choice
+    dirty : dict[int, int | None]
+        The votes changed since the last flush, None for a removed vote
+    """
+
+    def __init__(
+            self,
+            id_msg: int,
+            id_guild: int,
+            id_channel: int,
+            title: str,
+            content: str,
+            choices: list[str],
+            closed: bool = False,
+            votes: dict[int, int] | None = None
+    ) -> None:
+        self.id = id_msg
+        self.idGuild = id_guild
+        self.idChannel = id_channel
+        self.title = title
+        self.content = content
+        self.choices = choices
+        self.closed = closed
+        self.votes: dict[int, int] = {}
+        self.tallies = [0] * len(choices)
+        self.dirty: dict[int, int | None] = {}
+        self.rendered_at = 0.0
+
+        for idUser, choice in (votes or {}).items():
+            if 0 <= choice < len(choices):
+                self.votes[idUser] = choice
+                self.tallies[choice] += 1
+
+    @classmethod
+    def from_db(cls, poll: PollDB, votes: dict[int, int]) -> "PollState":
+        return cls(poll.id, poll.idGuild, poll.idChannel, poll.title, poll.content, poll.choices, poll.closed, votes)
+
+    def vote(self, id_user: int, choice: int) -> int | None:
+        """
+        Vote for a choice, voting again for the same choice removes the vote
+
+        Returns
+        -------
+        int | None
+            The choice of the user, None if the vote was removed
+        """
+        previous = self.votes.get(id_user)
+        if previous is not None:
+            self.tallies[previous] -= 1
+
+        if previous == choice:
+            del self.votes[id_user]
+            self.dirty[id_user] = None
+            return None
+
+        self.votes[id_user] = choice
+        self.tallies[choice] += 1
+        self.dirty[id_user] = choice
+        return choice
+
+    def embed(self) -> discord.Embed:
+        total = len(self.votes)
+        lines = []
+        for choice, count in zip(self.choices, self.tallies):
+            percent = count / total * 100 if total else 0.0
+            bar = "█" * round(percent / 10) + "░" * (10 - round(percent / 10))
+            lines.append(f"**{choice}**\n`{bar}` {count} ({percent:.0f}%)")
+
+        embed = discord.Embed(
+            title=self.title or "Poll",
+            description=self.content + "\n\n" + "\n".join(lines),
+            color=0x8a8a8a if self.closed else 0x0089FF
+        )
+        embed.set_footer(text=f"{total} votes" + (" - closed" if self.closed else ""))
+        return embed
+
+
+class PollButton(discord.ui.Button["PollView"]):
+    """Button of a choice of a poll"""
+
+    def __init__(self, index: int, label: str, disabled: bool = False):
+        # The custom id is the same on every poll, the views are bound to their message id
+        super().__init__(
+            style=discord.ButtonStyle.secondary,
+            label=label[:80],
+            custom_id=f"josix_poll:{index}",
+            row=index // 5,
+            disabled=disabled
+        )
+        self.index = index
+
+    async def callback(self, interaction: discord.Interaction):
+        assert self.view is not None
+        view: PollView = self.view
+        poll = view.poll
+
+        if poll.closed or not interaction.user:
+            await interaction.response.send_message("This poll is closed", ephemeral=True)
+            return
+
+        choice = poll.vote(interaction.user.id, self.index)
+        if choice is None:
+            await interaction.response.send_message("Your vote is removed", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"You voted for **{poll.choices[choice]}**", ephemeral=True)
+        view.engine.render(poll)
+
+
+class PollView(discord.ui.View):
+    """Persistent view with a button for each choice of a poll"""
+
+    def __init__(self, engine: "PollEngine", poll: PollState):
+        super().__init__(timeout=None)
+        self.engine = engine
+        self.poll = poll
+        for index, choice in enumerate(poll.choices):
+            self.add_item(PollButton(index, choice, poll.closed))
+
+
+class PollEngine:
+    """
+    Represents the polls open on the bot
+
+    The votes are counted in memory and saved in batches by `flush`.
+    The message of a poll is edited at most once every `RENDER_INTERVAL` seconds,
+    whatever the number of votes. The open polls are loaded back at startup
+    so that their buttons keep working
+
+    Attributes
+    ----------
+    bot : discord.Client
+        The bot that shows the polls
+    polls : dict[int, PollState]
+        The open polls by message id
+    renders : int
+        Number of edits of the poll messages
+    """
+
+    def __init__(self, bot: discord.Client) -> None:
+        self.bot = bot
+        self.polls: dict[int, PollState] = {}
+        self.renders = 0
+        self._renders: dict[int, asyncio.Task] = {}
+
+    def load(self, handler: DatabaseHandler, owns_guild: Callable[[int], bool] = lambda _: True) -> int:
+        """Load the open polls of the guilds of this process and bind their views"""
+        for pollDB in poll_service.get_open_polls(handler):
+            if not owns_guild(pollDB.idGuild):
+                continue
+            poll = PollState.from_db(pollDB, poll_service.get_poll_votes(handler, pollDB.id))
+            self.polls[poll.id] = poll
+            self.bot.add_view(PollView(self, poll), message_id=poll.id)
+        return len(self.polls)
+
+    def add(self, handler: DatabaseHandler, poll: PollState) -> None:
+        poll_service.add_poll(handler, poll.id, poll.idGuild, poll.idChannel, poll.title, poll.content, poll.choices)
+        self.polls[poll.id] = poll
+
+    def render(self, poll: PollState) -> None:
+        """Schedule the edit of the poll message, votes received meanwhile share the same edit"""
+        if poll.id in self._renders:
+            return
+
+        delay = max(0.0, poll.rendered_at + RENDER_INTERVAL - monotonic())
+        self._renders[poll.id] = asyncio.create_task(self._render(poll, delay))
+
+    async def _render(self, poll: PollState, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Removed before the edit, the votes received during the edit schedule the next one
+        self._renders.pop(poll.id, None)
+        poll.rendered_at = monotonic()
+        self.renders += 1
+        try:
+            message = self.bot.get_partial_messageable(poll.idChannel).get_partial_message(poll.id)
+            await message.edit(embed=poll.embed())
+        except discord.HTTPException as e:
+            log.writeError(log.formatError(e))
+
+    def flush(self, handler: DatabaseHandler) -> int:
+        """
+        Save the votes changed since the last flush in one transaction
+
+        Returns
+        -------
+        int
+            Number of votes saved
+        """
+        pending = {poll: poll.dirty for poll in self.polls.values() if poll.dirty}
+        if not pending:
+            return 0
+
+        for poll in pending:
+            poll.dirty = {}
+        rows = [(poll.id, idUser, choice) for poll, dirty in pending.items() for idUser, choice in dirty.items()]
+        try:
+            poll_service.save_poll_votes(handler, rows)
+        except Exception as e:
+            # Kept for the next flush, the votes received meanwhile are more recent
+            for poll, dirty in pending.items():
+                poll.dirty = dirty | poll.dirty
+            raise e
+        return len(rows)
+
+    async def close(self, handler: DatabaseHandler, poll: PollState) -> None:
+        """Close a poll, its final results are saved and shown with the buttons disabled"""
+        # Closed in memory once saved, a failed save leaves the poll open and the close can be retried
+        self.flush(handler)
+        poll_service.close_poll(handler, poll.id)
+        poll.closed = True
+        self.polls.pop(poll.id, None)
+        if (task := self._renders.pop(poll.id, None)) is not None:
+            task.cancel()
+
+        # The close is saved, a deleted or unreachable message is only logged
+        try:
+            message = self.bot.get_partial_messageable(poll.idChannel).get_partial_message(poll.id)
+            await message.edit(embed=poll.embed(), view=PollView(self, poll))
+        except discord.HTTPException as e:
+            log.writeError(log.formatError(e))
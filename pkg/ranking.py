@@ -0,0 +1,42 @@
+import heapq
+from collections.abc import Callable, Iterable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def top_k(items: Iterable[T], k: int, key: Callable[[T], Any]) -> list[T]:
+    """
+    Get the k greatest items of a stream, from the greatest
+
+    A heap of k items is kept, O(n log k) for n items. On a tie the item
+    that came first in the stream is ranked first
+
+    Parameters
+    ----------
+    items : Iterable[T]
+        The items, read once
+    k : int
+        Size of the ranking
+    key : Callable[[T], Any]
+        The value compared for each item
+
+    Returns
+    -------
+    list[T]
+        At most k items
+    """
+    if k <= 0:
+        return []
+    return heapq.nlargest(k, items, key=key)
+
+
+def bottom_k(items: Iterable[T], k: int, key: Callable[[T], Any]) -> list[T]:
+    """
+    Get the k smallest items of a stream, from the smallest
+
+    Same as `top_k`, on a tie the item that came first in the stream is ranked first
+    """
+    if k <= 0:
+        return []
+    return heapq.nsmallest(k, items, key=key)
@@ -0,0 +1,119 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import monotonic
+from typing import Any
+
+import discord
+
+
+class Resolver:
+    """
+    Represents the lookups of the Discord objects missing from the bot cache
+
+    An object is taken from the cache of the bot first. When missing, it is fetched
+    from the API once for all the concurrent callers and kept `ttl` seconds.
+    An object that does not exist or can not be seen (404, 403) is remembered
+    `negative_ttl` seconds, a deleted channel is not fetched again on every event
+
+    Attributes
+    ----------
+    hits : int
+        Objects found in the cache of the bot or of the resolver
+    negative_hits : int
+        Lookups answered by a known missing object
+    misses : int
+        Lookups that needed a fetch, shared or not
+    fetches : int
+        HTTP requests made
+    """
+
+    def __init__(self, bot: discord.Client, ttl: float = 60.0, negative_ttl: float = 300.0, max_size: int = 4096) -> None:
+        self.bot = bot
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+        self._fetched: dict[tuple, tuple[float, Any]] = {}
+        self._missing: dict[tuple, float] = {}
+        self._pending: dict[tuple, asyncio.Future] = {}
+
+    async def channel(self, id_channel: int) -> discord.abc.GuildChannel | discord.Thread | discord.abc.PrivateChannel | None:
+        return await self._resolve(
+            ("channel", id_channel),
+            self.bot.get_channel(id_channel),
+            lambda: self.bot.fetch_channel(id_channel)
+        )
+
+    async def guild(self, id_guild: int) -> discord.Guild | None:
+        return await self._resolve(
+            ("guild", id_guild),
+            self.bot.get_guild(id_guild),
+            lambda: self.bot.fetch_guild(id_guild)
+        )
+
+    async def member(self, guild: discord.Guild, id_user: int) -> discord.Member | None:
+        return await self._resolve(
+            ("member", guild.id, id_user),
+            guild.get_member(id_user),
+            lambda: guild.fetch_member(id_user)
+        )
+
+    async def role(self, guild: discord.Guild, id_role: int) -> discord.Role | None:
+        async def fetchRole() -> discord.Role | None:
+            return discord.utils.get(await guild.fetch_roles(), id=id_role)
+
+        return await self._resolve(("role", guild.id, id_role), guild.get_role(id_role), fetchRole)
+
+    async def _resolve(self, key: tuple, cached: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        now = monotonic()
+        if (entry := self._fetched.get(key)) is not None:
+            if entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            del self._fetched[key]
+
+        if (expires := self._missing.get(key)) is not None:
+            if expires > now:
+                self.negative_hits += 1
+                return None
+            del self._missing[key]
+
+        self.misses += 1
+        if (task := self._pending.get(key)) is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shielded, a cancelled caller does not cancel the fetch of the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        self.fetches += 1
+        try:
+            result = await fetch()
+        except (discord.NotFound, discord.Forbidden):
+            result = None
+
+        if len(self._fetched) + len(self._missing) >= self.max_size:
+            self._prune()
+
+        if result is None:
+            self._missing[key] = monotonic() + self.negative_ttl
+        else:
+            self._fetched[key] = (monotonic() + self.ttl, result)
+        return result
+
+    def _prune(self) -> None:
+        now = monotonic()
+        self._fetched = {key: entry for key, entry in self._fetched.items() if entry[0] > now}
+        self._missing = {key: expires for key, expires in self._missing.items() if expires > now}
+        if len(self._fetched) + len(self._missing) >= self.max_size:
+            self._fetched.clear()
+            self._missing.clear()
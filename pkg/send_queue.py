@@ -0,0 +1,229 @@
+import asyncio
+from collections import deque
+from enum import IntEnum
+from time import monotonic
+from typing import Any
+
+import discord
+
+import pkg.logwrite as log
+
+
+class Priority(IntEnum):
+    """Classes of the messages sent, the lowest value is sent first"""
+    COMMAND = 0
+    NOTIFICATION = 1
+    LOG = 2
+
+
+class _Message:
+    __slots__ = ("channel", "priority", "kwargs", "future", "queued_at")
+
+    def __init__(self, channel: discord.abc.Messageable, priority: Priority, kwargs: dict[str, Any]) -> None:
+        self.channel = channel
+        self.priority = priority
+        self.kwargs = kwargs
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.queued_at = monotonic()
+
+    def merge(self, kwargs: dict[str, Any]) -> bool:
+        """Add the embeds of a message with only embeds to this one, within the limits of a message"""
+        if self.kwargs.keys() != {"embeds"} or kwargs.keys() != {"embeds"}:
+            return False
+
+        embeds = self.kwargs["embeds"] + kwargs["embeds"]
+        if len(embeds) > SendQueue.MAX_EMBEDS or sum(len(embed) for embed in embeds) > SendQueue.MAX_EMBEDS_LENGTH:
+            return False
+        self.kwargs["embeds"] = embeds
+        return True
+
+
+class _Window:
+    """Sliding window of the last sends, `rate` sends every `per` seconds"""
+
+    def __init__(self, rate: int, per: float) -> None:
+        self.per = per
+        self.sends: deque[float] = deque(maxlen=rate)
+
+    def delay(self, now: float) -> float:
+        if len(self.sends) < (self.sends.maxlen or 0):
+            return 0.0
+        return max(0.0, self.sends[0] + self.per - now)
+
+
+class _Lane:
+    """The messages waiting for one channel, one queue for each priority"""
+
+    def __init__(self, rate: int, per: float) -> None:
+        self.queues: tuple[deque[_Message], ...] = tuple(deque() for _ in Priority)
+        self.window = _Window(rate, per)
+        self.wake = asyncio.Event()
+        self.worker: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self.queues)
+
+    def pop(self) -> _Message | None:
+        for queue in self.queues:
+            if queue:
+                return queue.popleft()
+        return None
+
+
+class SendQueue:
+    """
+    Represents the messages sent by the bot outside of the interaction responses
+
+    Each channel has a worker that sends its messages by priority, paced under the
+    rate limit of the channel (5 messages every 5 seconds) and under a global rate
+    that leaves room for the requests made directly. The messages wait in the queue
+    instead of the rate limit lock of the HTTP client, so a command reply does not
+    wait behind a burst of logs.
+
+    The queue of a channel is bounded : a log made of embeds is merged in the last log
+    waiting, when full the oldest message of the lowest priority is dropped
+
+    Attributes
+    ----------
+    posted : int
+        Messages given to the queue
+    sent : int
+        Messages sent, merged messages count once
+    merged : int
+        Messages merged in another one
+    dropped : int
+        Messages dropped because the queue of their channel was full
+    failed : int
+        Messages refused by Discord
+    """
+
+    MAX_EMBEDS = 10
+    MAX_EMBEDS_LENGTH = 6000
+
+    def __init__(
+            self,
+            max_size: int = 100,
+            channel_rate: int = 5,
+            channel_per: float = 5.0,
+            global_rate: int = 40,
+            samples: int = 1024
+    ) -> None:
+        self.max_size = max_size
+        self.channel_rate = channel_rate
+        self.channel_per = channel_per
+        self.posted = 0
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._lanes: dict[int, _Lane] = {}
+        self._global = _Window(global_rate, 1.0)
+        self._waits: tuple[deque[float], ...] = tuple(deque(maxlen=samples) for _ in Priority)
+
+    def post(self, channel: discord.abc.Messageable, priority: Priority, **kwargs: Any) -> asyncio.Future:
+        """
+        Queue a message, takes the arguments of `channel.send`
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to the message sent, None if it was dropped or refused.
+            Awaiting it is optional
+        """
+        self.posted += 1
+        if "embed" in kwargs:
+            kwargs["embeds"] = [kwargs.pop("embed")]
+
+        idChan = channel.id # type: ignore
+        if (lane := self._lanes.get(idChan)) is None:
+            lane = self._lanes[idChan] = _Lane(self.channel_rate, self.channel_per)
+
+        queue = lane.queues[priority]
+        if priority == Priority.LOG and queue and queue[-1].merge(kwargs):
+            self.merged += 1
+            return queue[-1].future
+
+        message = _Message(channel, priority, kwargs)
+        if len(lane) >= self.max_size and not self._evict(lane, priority):
+            self.dropped += 1
+            message.future.set_result(None)
+            return message.future
+
+        queue.append(message)
+        lane.wake.set()
+        if lane.worker is None:
+            lane.worker = asyncio.create_task(self._work(idChan, lane))
+        return message.future
+
+    def _evict(self, lane: _Lane, priority: Priority) -> bool:
+        """Drop the oldest message of the lowest priority, not above the priority of the new one"""
+        for queue in reversed(lane.queues[priority:]):
+            if queue:
+                dropped = queue.popleft()
+                self.dropped += 1
+                dropped.future.set_result(None)
+                return True
+        return False
+
+    async def _work(self, id_channel: int, lane: _Lane) -> None:
+        while True:
+            if not lane:
+                # Kept for the window of the channel, a worker created later would not know the last sends
+                lane.wake.clear()
+                try:
+                    await asyncio.wait_for(lane.wake.wait(), self.channel_per)
+                except asyncio.TimeoutError:
+                    if not lane:
+                        del self._lanes[id_channel]
+                        return
+                continue
+
+            # Waits for the rate limits before choosing, a message posted meanwhile can go first
+            while (delay := max(lane.window.delay(monotonic()), self._global.delay(monotonic()))) > 0:
+                await asyncio.sleep(delay)
+
+            if (message := lane.pop()) is None:
+                continue
+            now = monotonic()
+            lane.window.sends.append(now)
+            self._global.sends.append(now)
+            self._waits[message.priority].append(now - message.queued_at)
+
+            result = None
+            try:
+                result = await message.channel.send(**message.kwargs)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                log.writeError(log.formatError(e))
+            finally:
+                if not message.future.done():
+                    message.future.set_result(result)
+
+    def depth(self) -> dict[Priority, int]:
+        """Get the number of messages waiting for each priority"""
+        depths = {priority: 0 for priority in Priority}
+        for lane in self._lanes.values():
+            for priority, queue in zip(Priority, lane.queues):
+                depths[priority] += len(queue)
+        return depths
+
+    def wait_percentile(self, priority: Priority, percent: float) -> float:
+        """Get the percentile of the recent waits in the queue in milliseconds"""
+        if not (samples := self._waits[priority]):
+            return 0.0
+
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] * 1000
+
+    async def close(self) -> None:
+        """Stop the workers, the messages waiting are dropped"""
+        for lane in self._lanes.values():
+            if lane.worker is not None:
+                lane.worker.cancel()
+            for queue in lane.queues:
+                for message in queue:
+                    if not message.future.done():
+                        message.future.set_result(None)
+        self._lanes.clear()
@@ -0,0 +1,116 @@
+import asyncio
+from collections.abc import Callable, Iterable
+
+import discord
+
+
+class VoteCollector:
+    """
+    Represents the votes cast with reactions on one message
+
+    Each user counts once for each choice, removing the reaction removes the vote
+
+    Attributes
+    ----------
+    message_id : int
+        The message voted on
+    choices : set[str] | None
+        The emojis counted as votes, every emoji if None
+    votes : dict[str, set[int]]
+        The users that voted for each choice
+    """
+
+    def __init__(self, message_id: int, choices: Iterable[str] | None = None) -> None:
+        self.message_id = message_id
+        self.choices = set(choices) if choices is not None else None
+        self.votes: dict[str, set[int]] = {}
+        self._until: Callable[["VoteCollector"], bool] | None = None
+        self._done = asyncio.Event()
+
+    def add(self, user_id: int, choice: str) -> None:
+        if self.choices is not None and choice not in self.choices:
+            return
+        self.votes.setdefault(choice, set()).add(user_id)
+        if self._until is not None and self._until(self):
+            self._done.set()
+
+    def remove(self, user_id: int, choice: str) -> None:
+        self.votes.get(choice, set()).discard(user_id)
+
+    def count(self, choice: str) -> int:
+        return len(self.votes.get(choice, ()))
+
+    async def wait(self, timeout: float, until: Callable[["VoteCollector"], bool] | None = None) -> bool:
+        """
+        Wait for the end of the vote
+
+        Parameters
+        ----------
+        timeout : float
+            Duration of the vote in seconds
+        until : Callable[[VoteCollector], bool] | None
+            Checked after each vote, ends the vote early when it returns True
+
+        Returns
+        -------
+        bool
+            True if the vote was ended early by `until`
+        """
+        self._until = until
+        if until is not None and until(self):
+            self._done.set()
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._until = None
+
+
+class VoteRegistry:
+    """
+    Represents the votes running on the bot, by message id
+
+    The reactions are dispatched to the collector of their message with
+    one dictionary lookup, a reaction on any other message costs nothing more.
+    The reactions of the bots are ignored
+
+    Attributes
+    ----------
+    bot : discord.Client
+        The bot that receives the reactions
+    """
+
+    def __init__(self, bot: discord.Client) -> None:
+        self.bot = bot
+        self._collectors: dict[int, VoteCollector] = {}
+
+    def __len__(self) -> int:
+        return len(self._collectors)
+
+    def open(self, message_id: int, choices: Iterable[str] | None = None) -> VoteCollector:
+        """Start collecting the votes of a message"""
+        collector = VoteCollector(message_id, choices)
+        self._collectors[message_id] = collector
+        return collector
+
+    def close(self, message_id: int) -> VoteCollector | None:
+        """Stop collecting the votes of a message and get its collector"""
+        return self._collectors.pop(message_id, None)
+
+    def _ignored(self, payload: discord.RawReactionActionEvent) -> bool:
+        if payload.member is not None:
+            return payload.member.bot
+        return self.bot.user is not None and payload.user_id == self.bot.user.id
+
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
+        collector = self._collectors.get(payload.message_id)
+        if collector is not None and not self._ignored(payload):
+            collector.add(payload.user_id, str(payload.emoji))
+
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent) -> None:
+        # The member is not given on removal, the votes of the bots were never added
+        collector = self._collectors.get(payload.message_id)
+        if collector is not None:
+            collector.remove(payload.user_id, str(payload.emoji))
@@ -0,0 +1,145 @@
+"""
+Load test of the poll buttons, without Discord
+
+Clicks the buttons of one poll at a given rate from random users, the poll message
+and the interactions are replaced by stubs. The votes are flushed like the `flush_polls`
+task of the Use cog. At the end, checks that the database matches the votes counted
+in memory, that the message was never edited more than once every `RENDER_INTERVAL`
+seconds, and that the poll can be closed once its message is deleted.
+
+Needs the database of `.env.dev`, the poll is removed at the end.
+Run from the root of the repository :
+
+    python -m scripts.poll_load_test --rate 6000 --duration 60
+"""
+import argparse
+import asyncio
+import random
+import sys
+from time import perf_counter
+from types import SimpleNamespace
+
+import discord
+
+import pkg.polls as polls
+from database.database import DatabaseHandler
+from database.services import poll_service
+from pkg.polls import PollEngine, PollState, PollView
+
+FLUSH_INTERVAL = 5.0 # Same interval as the flush_polls task
+TICK = 0.1
+
+
+class _Message:
+    """Stub of the poll message, records its edits"""
+
+    def __init__(self, edits: list[float], latency: float, deleted: bool) -> None:
+        self.edits = edits
+        self.latency = latency
+        self.deleted = deleted
+
+    async def edit(self, **kwargs) -> None:
+        await asyncio.sleep(self.latency)
+        if self.deleted:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        self.edits.append(perf_counter())
+
+
+class _Response:
+    async def send_message(self, *args, **kwargs) -> None:
+        pass
+
+
+def _interaction(id_user: int) -> SimpleNamespace:
+    return SimpleNamespace(user=SimpleNamespace(id=id_user), response=_Response())
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0.0
+
+
+async def _flushLoop(engine: PollEngine, handler: DatabaseHandler, batches: list[int]) -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        batches.append(engine.flush(handler))
+
+
+async def run(args: argparse.Namespace) -> bool:
+    handler = DatabaseHandler()
+    edits: list[float] = []
+    message = _Message(edits, args.edit_latency, False)
+    bot = SimpleNamespace(get_partial_messageable=lambda _: SimpleNamespace(get_partial_message=lambda _: message))
+
+    engine = PollEngine(bot)
+    poll = PollState(args.poll_id, 0, 0, "Load test", "Load test", [f"Choice {i}" for i in range(args.choices)])
+    engine.add(handler, poll)
+    buttons = PollView(engine, poll).children
+
+    batches: list[int] = []
+    flushTask = asyncio.create_task(_flushLoop(engine, handler, batches))
+    latencies: list[float] = []
+    clicks = 0
+    start = perf_counter()
+    try:
+        while (elapsed := perf_counter() - start) < args.duration:
+            # Catches up the clicks late, the handler must keep the rate
+            while clicks < elapsed * args.rate / 60:
+                clickStart = perf_counter()
+                await random.choice(buttons).callback(_interaction(random.randrange(args.users)))
+                latencies.append(perf_counter() - clickStart)
+                clicks += 1
+            await asyncio.sleep(TICK)
+        elapsed = perf_counter() - start
+    finally:
+        flushTask.cancel()
+
+    await asyncio.sleep(polls.RENDER_INTERVAL + args.edit_latency)
+    batches.append(engine.flush(handler))
+
+    gaps = [second - first for first, second in zip(edits, edits[1:])]
+    saved = poll_service.get_poll_votes(handler, poll.id)
+    print(f"{clicks} clicks in {elapsed:.1f}s ({clicks / elapsed * 60:.0f}/min) from {args.users} users")
+    print(f"click handler : p50 {_percentile(latencies, 50) * 1e6:.0f} us, "
+          f"p99 {_percentile(latencies, 99) * 1e6:.0f} us, max {max(latencies, default=0) * 1e6:.0f} us")
+    print(f"{len(edits)} edits, min gap {min(gaps, default=0):.2f}s, flush batches {batches}")
+
+    ok = True
+    if saved != poll.votes:
+        print("FAILED : the votes saved do not match the votes in memory")
+        ok = False
+    if gaps and min(gaps) < polls.RENDER_INTERVAL - 0.01:
+        print(f"FAILED : two edits less than {polls.RENDER_INTERVAL}s apart")
+        ok = False
+
+    message.deleted = True
+    await engine.close(handler, poll)
+    closed = poll_service.get_poll(handler, poll.id)
+    if closed is None or not closed.closed or poll.id in engine.polls:
+        print("FAILED : the poll is not closed when its message is deleted")
+        ok = False
+
+    handler.cursor.execute("DELETE FROM josix.PollVote WHERE idMsg = %s;", (poll.id,))
+    handler.cursor.execute("DELETE FROM josix.Poll WHERE idMsg = %s;", (poll.id,))
+    handler.conn.commit()
+    print("OK" if ok else "FAILED")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the poll buttons")
+    parser.add_argument("--rate", type=int, default=6000, help="Clicks per minute")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duration of the test in seconds")
+    parser.add_argument("--users", type=int, default=3000, help="Number of distinct users")
+    parser.add_argument("--choices", type=int, default=3, help=f"Number of choices (max {polls.MAX_CHOICES})")
+    parser.add_argument("--edit-latency", type=float, default=0.2, help="Seconds taken by an edit of the message")
+    parser.add_argument("--render-interval", type=float, default=polls.RENDER_INTERVAL, help="Seconds between two edits")
+    parser.add_argument("--poll-id", type=int, default=1, help="Message id of the test poll, must not exist")
+    args = parser.parse_args()
+
+    polls.RENDER_INTERVAL = args.render_interval
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()